@@ -119,6 +119,31 @@ class EnvironmentContext:
     vector_store_vpc_max_azs: int = 2
     vector_store_cpu_units: int = 2048
     vector_store_memory_limit_mib: int = 4096
+    vector_store_workers_per_task: int = 16
+    # search worker processes per uvicorn worker sharing the mmap'd index, e.g. cpu_units // 1024 with a single
+    # uvicorn worker, 0 searches in the uvicorn workers themselves
+    vector_store_search_processes_per_worker: int = 0
+    vector_store_index_factory: str = 'Flat'
+    vector_store_embedding_cache_path: str = '/tmp/embedding-cache.sqlite'
+    # time the index gets to load before failing readiness checks replaces the task
+    vector_store_load_grace_period_sec: int = 600
+    # concurrent searches wait this long to be embedded and searched together, 0 disables micro-batching
+    vector_store_search_batch_window_ms: int = 5
+    # each uvicorn worker serves this many requests at once and queues as many more for up to a second, the rest
+    # get 429/503 with Retry-After instead of waiting into ALB timeouts
+    vector_store_max_in_flight_per_worker: int = 8
+    vector_store_admission_queue_per_worker: int = 8
+    # average queued requests per worker that adds a task, see VectorStoreStack._autoscale
+    vector_store_scale_out_queue_depth: int = 2
+    # repeated searches of a snapshot are answered from memory for this long, 0 only shares in-flight searches
+    vector_store_search_cache_ttl_sec: int = 60
+    # s3://bucket/prefix with published corpus snapshots, fetched to local disk when tasks start
+    vector_store_snapshot_source: typing.Optional[str] = None
+    # named collections are loaded on demand and evicted least recently used above this, per task (every uvicorn
+    # worker gets its share)
+    vector_store_collections_memory_mib: int = 1024
+    # resident memory of a uvicorn worker or search process besides collections, the mmap'd index pages are shared
+    vector_store_process_memory_mib: int = 150
 
     assertions_workflow_state_machine_name: str = 'assertions-to-evidence-sm'
     human_input_workflow_state_machine_name: str = 'human-input-to-evidence-sm'
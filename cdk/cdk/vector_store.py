@@ -1,11 +1,13 @@
 import typing
 
 import aws_cdk as cdk
+import aws_cdk.aws_applicationautoscaling as appscaling
 import aws_cdk.aws_cloudwatch as cloudwatch
 import aws_cdk.aws_ec2 as ec2
 import aws_cdk.aws_ecr as ecr
 import aws_cdk.aws_ecs as ecs
 import aws_cdk.aws_ecs_patterns as ecs_patterns
+import aws_cdk.aws_iam as iam
 import aws_cdk.aws_logs as logs
 from aws_cdk.aws_ecs import ScalableTaskCount
 
@@ -22,16 +24,68 @@ class VectorStoreStack(cdk.Stack):
         self.sha_ref = self.node.get_context('sha_ref')
         self.openai_secret_key = base_infra_stack.openai_secret_key
 
+        self.emf_namespace = self.env_context.name('vector-store')
+        self._check_memory_budget()
+
         self.vpc = base_infra_stack.vpc.vpc
         self._configure_vpc()
 
         self.cluster = self._cluster()
         self.alb_service, self.service_task_count = self._service()
         self._adjust_policies()
+        self._autoscale()
         self._cloudwatch_dashboard()
 
+    def _check_memory_budget(self):
+        # processes and collections have to fit the task, or it is OOM killed once collections fill their budget
+        # search processes map the same index pages as their uvicorn worker, they only add their own heap
+        processes = self.env_context.vector_store_workers_per_task * (
+            1 + self.env_context.vector_store_search_processes_per_worker
+        )
+        required = (processes * self.env_context.vector_store_process_memory_mib
+                    + self.env_context.vector_store_collections_memory_mib)
+        if required > self.env_context.vector_store_memory_limit_mib:
+            raise ValueError(
+                f'{processes} vector store processes and {self.env_context.vector_store_collections_memory_mib} MiB '
+                f'of collections need {required} MiB, more than the task memory limit of '
+                f'{self.env_context.vector_store_memory_limit_mib} MiB'
+            )
+
     def _adjust_policies(self):
-        pass
+        source = self.env_context.vector_store_snapshot_source
+        if source and source.startswith('s3://'):
+            # tasks fetch snapshots with ranged GETs, see vector_store_faissdb.fetcher
+            bucket, _, prefix = source[len('s3://'):].partition('/')
+            prefix = prefix.strip('/')
+            self.alb_service.task_definition.add_to_task_role_policy(iam.PolicyStatement(
+                actions=['s3:GetObject'],
+                resources=[f'arn:aws:s3:::{bucket}/{prefix}/*' if prefix else f'arn:aws:s3:::{bucket}/*'],
+            ))
+
+    def _queued_requests_metric(self) -> cloudwatch.Metric:
+        # written by every uvicorn worker every few seconds, see vector_store_faissdb.metrics.write_admission_emf
+        return cloudwatch.Metric(
+            namespace=self.emf_namespace,
+            metric_name='QueuedRequests',
+            statistic='Average',
+            period=cdk.Duration.minutes(1),
+            label='Queued Requests per Worker',
+        )
+
+    def _autoscale(self):
+        # requests waiting for admission show saturation right away, CPU utilization lags behind it
+        scale_out = self.env_context.vector_store_scale_out_queue_depth
+        self.service_task_count.scale_on_metric(
+            'queue-depth-scaling',
+            metric=self._queued_requests_metric(),
+            scaling_steps=[
+                appscaling.ScalingInterval(upper=0, change=-1),
+                appscaling.ScalingInterval(lower=scale_out, change=+1),
+                appscaling.ScalingInterval(lower=4 * scale_out, change=+2),
+            ],
+            adjustment_type=appscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+            cooldown=cdk.Duration.minutes(3),
+        )
 
     def _configure_vpc(self) -> ec2.Vpc:
         vpc = self.vpc
@@ -108,6 +162,24 @@ class VectorStoreStack(cdk.Stack):
             ),
             environment={
                 'CORPUS_DB_PATH': '/faissdb-store',
+                'CORPUS_DB_READ_ONLY': '1',
+                'CORPUS_INDEX_FACTORY': self.env_context.vector_store_index_factory,
+                'CORPUS_COLLECTIONS_PATH': '/faissdb-collections',
+                'CORPUS_COLLECTIONS_MEMORY_MB': str(self.env_context.vector_store_collections_memory_mib),
+                'WEB_CONCURRENCY': str(self.env_context.vector_store_workers_per_task),
+                # concurrency comes from workers and executor threads, keep FAISS from oversubscribing the cores
+                'OMP_NUM_THREADS': '1',
+                'SEARCH_BATCH_WINDOW_MS': str(self.env_context.vector_store_search_batch_window_ms),
+                'SEARCH_PROCESSES': str(self.env_context.vector_store_search_processes_per_worker),
+                'SEARCH_CACHE_TTL_SEC': str(self.env_context.vector_store_search_cache_ttl_sec),
+                'ADMISSION_MAX_IN_FLIGHT': str(self.env_context.vector_store_max_in_flight_per_worker),
+                'ADMISSION_MAX_QUEUE': str(self.env_context.vector_store_admission_queue_per_worker),
+                'EMBEDDING_CACHE_PATH': self.env_context.vector_store_embedding_cache_path,
+                # per-request latencies are logged in CloudWatch embedded metric format, see _cloudwatch_dashboard
+                'VECTOR_STORE_EMF': '1',
+                **({'CORPUS_SNAPSHOT_SOURCE': self.env_context.vector_store_snapshot_source}
+                   if self.env_context.vector_store_snapshot_source else {}),
+                'VECTOR_STORE_EMF_NAMESPACE': self.emf_namespace,
                 'ECS_AVAILABLE_LOGGING_DRIVERS': '["json-file","awslogs"]',
             },
             secrets={
@@ -122,11 +194,13 @@ class VectorStoreStack(cdk.Stack):
             task_definition=task_definition,
             enable_execute_command=True,
             idle_timeout=cdk.Duration.minutes(5),
+            health_check_grace_period=cdk.Duration.seconds(self.env_context.vector_store_load_grace_period_sec),
             assign_public_ip=False,
             # public_load_balancer=False,
         )
+        # the container health check is liveness, the load balancer only routes to tasks that loaded the index
         alb_service.target_group.configure_health_check(
-            path='/health',
+            path='/ready',
             interval=cdk.Duration.seconds(30),
             unhealthy_threshold_count=3,
             timeout=cdk.Duration.seconds(10),
@@ -213,3 +287,41 @@ class VectorStoreStack(cdk.Stack):
                 title='Target Request Count',
             ),
         )
+        dashboard.add_widgets(*self._latency_widgets())
+
+    def _service_metric(self, metric_name: str, statistic: str, endpoint: str = '/similarity_search',
+                        label: typing.Optional[str] = None) -> cloudwatch.Metric:
+        return cloudwatch.Metric(
+            namespace=self.emf_namespace,
+            metric_name=metric_name,
+            dimensions_map={'Endpoint': endpoint},
+            statistic=statistic,
+            period=cdk.Duration.minutes(1),
+            label=label or f'{metric_name} {statistic}',
+        )
+
+    def _latency_widgets(self) -> typing.List[cloudwatch.IWidget]:
+        # emitted by the service itself, the ALB only sees the end-to-end latency
+        widgets = [
+            cloudwatch.GraphWidget(
+                left=[self._service_metric(metric_name, statistic) for statistic in ('p50', 'p99')],
+                width=6,
+                title=f'Search {title} Latency (ms)',
+            )
+            for metric_name, title in (
+                ('RequestLatency', 'Request'),
+                ('EmbeddingLatency', 'Embedding'),
+                ('SearchLatency', 'FAISS'),
+                ('SerializationLatency', 'Serialization'),
+            )
+        ]
+        widgets.append(cloudwatch.GraphWidget(
+            left=[
+                self._service_metric('InFlightRequests', 'Maximum', endpoint=endpoint, label=endpoint)
+                for endpoint in ('/similarity_search', '/similarity_search/batch')
+            ],
+            right=[self._queued_requests_metric()],
+            width=24,
+            title='In-flight and Queued Requests',
+        ))
+        return widgets
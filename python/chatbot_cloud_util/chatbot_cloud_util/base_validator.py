@@ -14,3 +14,7 @@ class BaseCorpusContainer(abc.ABC):
     @abc.abstractmethod
     def search(self, query: str, maximum_nearest_neighbors: int):
         pass
+
+    @abc.abstractmethod
+    def search_batch(self, queries: typing.List[str], maximum_nearest_neighbors: int):
+        pass
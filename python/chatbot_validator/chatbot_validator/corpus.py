@@ -5,6 +5,7 @@ from typing import Dict, List, Tuple
 import chatbot_validator.prompts.corpus as prompts
 import pandas as pd
 from chatbot_validator.base import ChainBaseClass
+from chatbot_validator.embeddings import CachedEmbeddings
 from chatbot_validator.exceptions import NoRelevantDocumentsFound
 from chatbot_validator.tools import ALLOWED_CHAT_MODEL_TYPES, search_oa, urlopen_wrapper
 from langchain.chains import LLMChain
@@ -93,7 +94,7 @@ class CorpusCreator:
         return self.df
 
     def _get_embeddings(self):
-        return OpenAIEmbeddings(client=None, openai_api_key=get_openai_api_key())
+        return CachedEmbeddings.from_env(OpenAIEmbeddings(client=None, openai_api_key=get_openai_api_key()))
 
     def set_corpus(self, human_input: str) -> None:
         self.set_dataframe(human_input)
@@ -0,0 +1,225 @@
+import dataclasses
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from loguru import logger
+
+_shared_lru_tier: Optional["LRUEmbeddingTier"] = None
+
+
+@dataclasses.dataclass
+class EmbeddingCacheStats:
+    lru_hits: int = 0
+    disk_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    requests: int = 0  # batched calls sent to the wrapped embeddings
+
+    @property
+    def hits(self) -> int:
+        return self.lru_hits + self.disk_hits + self.redis_hits
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**dataclasses.asdict(self), "hits": self.hits, "hit_ratio": self.hit_ratio}
+
+
+class LRUEmbeddingTier:
+    name = "lru"
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._items:
+                    self._items.move_to_end(key)
+                    found[key] = self._items[key]
+        return found
+
+    def set_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for key, vector in items.items():
+                self._items[key] = vector
+                self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SqliteEmbeddingTier:
+    name = "disk"
+
+    def __init__(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, timeout=30)
+        # WAL lets several worker processes read the cache while one of them writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            # stay well below SQLITE_MAX_VARIABLE_NUMBER
+            for i in range(0, len(keys), 500):
+                chunk = keys[i: i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update({key: np.frombuffer(blob, dtype=np.float32) for key, blob in rows})
+        return found
+
+    def set_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+
+class RedisEmbeddingTier:
+    name = "redis"
+
+    def __init__(self, client: Any, prefix: str = "embedding:", ttl_sec: Optional[int] = None):
+        self._client = client
+        self._prefix = prefix
+        self._ttl_sec = ttl_sec
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = list(keys)
+        values = self._client.mget([self._prefix + key for key in keys])
+        return {key: np.frombuffer(value, dtype=np.float32) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items: Dict[str, np.ndarray]) -> None:
+        pipe = self._client.pipeline(transaction=False)
+        for key, vector in items.items():
+            pipe.set(self._prefix + key, np.asarray(vector, dtype=np.float32).tobytes(), ex=self._ttl_sec)
+        pipe.execute()
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed cache in front of an embeddings model.
+
+    Lookups go through the in-process LRU, then the on-disk store, then Redis; whatever is still missing is sent to
+    the wrapped model in a single batch and written back to every tier.
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 model_name: Optional[str] = None,
+                 lru_size: int = 10_000,
+                 disk_path: Optional[Path] = None,
+                 redis_client: Any = None,
+                 redis_ttl_sec: Optional[int] = None,
+                 lru_tier: Optional[LRUEmbeddingTier] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.stats = EmbeddingCacheStats()
+        self._stats_lock = threading.Lock()
+
+        self.tiers = [lru_tier or LRUEmbeddingTier(lru_size)]
+        if disk_path:
+            self.tiers.append(SqliteEmbeddingTier(disk_path))
+        if redis_client is not None:
+            self.tiers.append(RedisEmbeddingTier(redis_client, ttl_sec=redis_ttl_sec))
+
+    @classmethod
+    def from_env(cls, embeddings: Embeddings, **kwargs) -> "CachedEmbeddings":
+        global _shared_lru_tier
+
+        lru_size = int(os.environ.get("EMBEDDING_CACHE_LRU_SIZE", 10_000))
+        if _shared_lru_tier is None:
+            # every container in the process shares one LRU, so warm lambdas keep their cache between requests
+            _shared_lru_tier = LRUEmbeddingTier(lru_size)
+
+        redis_client = None
+        if os.environ.get("EMBEDDING_CACHE_REDIS_HOST"):
+            from redis import Redis
+
+            redis_client = Redis(
+                os.environ["EMBEDDING_CACHE_REDIS_HOST"],
+                int(os.environ.get("EMBEDDING_CACHE_REDIS_PORT", 6379)),
+            )
+
+        kwargs.setdefault("lru_tier", _shared_lru_tier)
+        kwargs.setdefault("disk_path", os.environ.get("EMBEDDING_CACHE_PATH") or None)
+        kwargs.setdefault("redis_client", redis_client)
+        if os.environ.get("EMBEDDING_CACHE_REDIS_TTL_SEC"):
+            kwargs.setdefault("redis_ttl_sec", int(os.environ["EMBEDDING_CACHE_REDIS_TTL_SEC"]))
+        return cls(embeddings, **kwargs)
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], lambda t: [self.embeddings.embed_query(t[0])])[0]
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        for i, tier in enumerate(self.tiers):
+            missing = [key for key in keys if key not in found]
+            if not missing:
+                break
+            try:
+                hits = tier.get_many(missing)
+            except Exception as e:
+                logger.warning(f"Embedding cache tier {tier.name} lookup failed: {repr(e)}")
+                continue
+            if not hits:
+                continue
+            with self._stats_lock:
+                setattr(self.stats, f"{tier.name}_hits", getattr(self.stats, f"{tier.name}_hits") + len(hits))
+            # promote into the faster tiers
+            self._store(hits, self.tiers[:i])
+            found.update(hits)
+        return found
+
+    def _store(self, items: Dict[str, np.ndarray], tiers: list) -> None:
+        for tier in tiers:
+            try:
+                tier.set_many(items)
+            except Exception as e:
+                logger.warning(f"Embedding cache tier {tier.name} write failed: {repr(e)}")
+
+    def _embed(self, texts: List[str], embed_fn) -> List[List[float]]:
+        keys = [self.key(text) for text in texts]
+        unique = dict(zip(keys, texts))
+        found = self._lookup(list(unique))
+
+        missing = [key for key in unique if key not in found]
+        if missing:
+            vectors = embed_fn([unique[key] for key in missing])
+            computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+            self._store(computed, self.tiers)
+            found.update(computed)
+
+        with self._stats_lock:
+            self.stats.misses += len(missing)
+            self.stats.requests += 1 if missing else 0
+
+        return [found[key].tolist() for key in keys]
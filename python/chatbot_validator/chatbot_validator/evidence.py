@@ -9,6 +9,7 @@ from chatbot_validator.tools import (
     ALLOWED_CHAT_MODEL_TYPES,
     get_batch_metadata_from_oa,
     get_metadata_from_oa,
+    metadata_from_document,
 )
 from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
@@ -93,8 +94,17 @@ class EvidenceCreator:
         size_of_corpus = len(corpus.index_to_docstore_id)
         context = corpus.similarity_search_with_score(assertion, k=min(maximum_nearest_neighbors, size_of_corpus))
         openalex_ids = [c[0].page_content.split(" TITLE")[0].split(("ID: "))[-1] for c in context]
-        metadata = get_batch_metadata_from_oa(openalex_ids)
+        # corpora indexed with bibliographic metadata need no OpenAlex round trip
+        metadata = [metadata_from_document(c[0].metadata) for c in context]
+        work_metadata = {
+            oa_id.replace("https://openalex.org/", ""): m for oa_id, m in zip(openalex_ids, metadata) if m is not None
+        }
+        if not all(metadata):
+            metadata = get_batch_metadata_from_oa(openalex_ids)
         years = [int(m[-1]) for m in metadata]
+        if len(years) != len(context):
+            # OpenAlex did not return every work (or none at all), years cannot be matched to the context
+            years = [0.5 for c in context]
         # Min-max normalize the years
         year_min = min(years)
         year_max = max(years)
@@ -133,7 +143,8 @@ class EvidenceCreator:
             ids_in_text = re.findall(r"W\d+", evidence)
             for work in ids_in_text:
                 old_text = f"{work}"
-                new_text, _ = get_metadata_from_oa(work.replace("[", "").replace("]", "").replace(";", ""))
+                work = work.replace("[", "").replace("]", "").replace(";", "")
+                new_text, _ = work_metadata.get(work) or get_metadata_from_oa(work)
                 evidence = evidence.replace(old_text, new_text)
 
         self.evidence = evidence
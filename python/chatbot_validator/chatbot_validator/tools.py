@@ -35,7 +35,14 @@ def search_oa(search_term: str, max_results: int = 0,
         results = results[:max_results]
 
     fields = ["id", "title", "abstract"] + list(extra_fields or [])
-    return [tuple(work[field] for field in fields) for work in results]
+    return [tuple(_get_field(work, field) for field in fields) for work in results]
+
+
+def _get_field(work: Works, field: str):
+    # fields that are not plain attributes of a work are derived from it
+    if field == "oa_location":
+        return _get_oa_location(work)
+    return work[field]
 
 
 def urlopen_wrapper(url: str, task: str, delay: int = 2, n_retries: int = 5, do_not_fail: bool = False):
@@ -69,16 +76,32 @@ def _make_hyperlink(url: str, text: str) -> str:
     return f"[{text}]({url})"
 
 
+def paper_description(title: str, doi: str, publication_year: str, oa_location: str) -> str:
+    paper_desc = "'" + title + f"' ({publication_year}) ("
+    paper_desc += _make_hyperlink(doi, "DOI")
+    if oa_location not in ("", doi):
+        paper_desc += " - " + _make_hyperlink(oa_location, "Full text") + ""
+    paper_desc += ")"
+    return paper_desc
+
+
+def metadata_from_document(metadata: dict) -> typing.Optional[Tuple[str, int]]:
+    """Same as `get_metadata_from_oa`, from the fields stored with an indexed document, None if they are missing."""
+    if not all(metadata.get(key) for key in ("TITLE", "PUBLICATION_YEAR")) or "DOI" not in metadata:
+        return None
+    publication_year = metadata["PUBLICATION_YEAR"]
+    paper_desc = paper_description(
+        metadata["TITLE"], metadata["DOI"] or None, publication_year, metadata.get("OA_LOCATION", "")
+    )
+    return paper_desc, publication_year
+
+
 def _metadata_extractor(work: Works) -> Tuple[str, int]:
     doi = work["doi"]
     publication_year = str(work["publication_year"])
     oa_location = _get_oa_location(work)
 
-    paper_desc = "'" + work["title"] + f"' ({publication_year}) ("
-    paper_desc += _make_hyperlink(doi, "DOI")
-    if oa_location not in ("", doi):
-        paper_desc += " - " + _make_hyperlink(oa_location, "Full text") + ""
-    paper_desc += ")"
+    paper_desc = paper_description(work["title"], doi, publication_year, oa_location)
 
     return paper_desc, publication_year
 
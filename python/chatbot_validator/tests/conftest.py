@@ -0,0 +1,37 @@
+import hashlib
+import re
+import typing
+
+import numpy as np
+import pytest
+from langchain.embeddings.base import Embeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic offline embeddings that count the calls and texts that reach the model."""
+
+    def __init__(self, size: int = 16):
+        self.size = size
+        self.calls = 0
+        self.embedded_texts = 0
+
+    def _embed(self, text: str) -> typing.List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r'\w+', text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts: typing.List[str]) -> typing.List[typing.List[float]]:
+        self.calls += 1
+        self.embedded_texts += len(texts)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> typing.List[float]:
+        self.calls += 1
+        self.embedded_texts += 1
+        return self._embed(text)
+
+
+@pytest.fixture
+def embeddings():
+    return CountingEmbeddings()
@@ -0,0 +1,44 @@
+import pytest
+from chatbot_validator.embeddings import CachedEmbeddings
+
+
+def test_lru_hits_skip_model(embeddings):
+    cached = CachedEmbeddings(embeddings, model_name='test')
+
+    first = cached.embed_documents(['earth orbit', 'rice whale', 'earth orbit'])
+    second = cached.embed_documents(['rice whale', 'earth orbit'])
+
+    assert embeddings.calls == 1
+    assert embeddings.embedded_texts == 2
+    assert second == [first[1], first[0]]
+    assert cached.stats.misses == 2
+    assert cached.stats.lru_hits == 2
+
+
+def test_only_misses_are_embedded_in_one_batch(embeddings):
+    cached = CachedEmbeddings(embeddings, model_name='test')
+    cached.embed_documents(['a b', 'c d'])
+
+    cached.embed_documents(['a b', 'e f', 'g h'])
+
+    assert embeddings.calls == 2
+    assert embeddings.embedded_texts == 4
+
+
+def test_disk_tier_survives_new_process(embeddings, tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    vector = CachedEmbeddings(embeddings, model_name='test', disk_path=path).embed_query('earth orbit')
+
+    cached = CachedEmbeddings(embeddings, model_name='test', disk_path=path)
+    assert cached.embed_query('earth orbit') == pytest.approx(vector)
+    assert embeddings.calls == 1
+    assert cached.stats.disk_hits == 1
+    assert cached.stats.hit_ratio == 1.0
+
+
+def test_model_name_is_part_of_key(embeddings, tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    CachedEmbeddings(embeddings, model_name='model-a', disk_path=path).embed_query('earth orbit')
+    CachedEmbeddings(embeddings, model_name='model-b', disk_path=path).embed_query('earth orbit')
+
+    assert embeddings.calls == 2
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+from chatbot_validator import evidence as evidence_module
+from chatbot_validator.evidence import EvidenceCreator
+from langchain.docstore.document import Document
+from langchain.llms.fake import FakeListLLM
+
+EVIDENCE = {'Evidence 1': {'ID': 'W1', 'Text': 'The Earth orbits the Sun [W1].'}}
+
+
+class FakeCorpus:
+    """The part of a VectorStore that `EvidenceCreator.set_evidence` uses."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.index_to_docstore_id = {i: str(i) for i in range(len(docs))}
+
+    def similarity_search_with_score(self, query, k=4):
+        return [(doc, float(i)) for i, doc in enumerate(self.docs[:k])]
+
+
+def document(work_id, **metadata):
+    return Document(page_content=f'ID: https://openalex.org/{work_id} TITLE: Orbit. ABSTRACT: ...', metadata=metadata)
+
+
+@pytest.fixture
+def creator(monkeypatch):
+    creator = EvidenceCreator(FakeListLLM(responses=[json.dumps(EVIDENCE)]))
+    creator.contexts = []
+
+    def shorten_context(assertion, context):
+        creator.contexts.append(context)
+        return context
+
+    # counting tokens downloads the tokenizer
+    monkeypatch.setattr(creator, 'shorten_context', shorten_context)
+    return creator
+
+
+def test_metadata_stored_with_documents_skips_openalex(creator, monkeypatch):
+    def fail(*args):
+        raise AssertionError('OpenAlex must not be called')
+
+    monkeypatch.setattr(evidence_module, 'get_batch_metadata_from_oa', fail)
+    monkeypatch.setattr(evidence_module, 'get_metadata_from_oa', fail)
+    corpus = FakeCorpus([
+        document('W1', TITLE='Orbit', PUBLICATION_YEAR='2019', DOI='https://doi.org/10.1/earth'),
+        document('W2', TITLE='Tilt', PUBLICATION_YEAR='2001', DOI=''),
+    ])
+
+    creator.set_evidence('The Earth orbits the Sun.', corpus, get_metadata=True)
+
+    assert len(creator.contexts[0]) == 2
+    assert "'Orbit' (2019) ([DOI](https://doi.org/10.1/earth))" in creator.evidence
+    assert 'W1' not in creator.evidence
+
+
+def test_openalex_returning_no_works_keeps_the_context(creator, monkeypatch):
+    monkeypatch.setattr(evidence_module, 'get_batch_metadata_from_oa', lambda openalex_ids: [])
+    corpus = FakeCorpus([document('W1'), document('W2'), document('W3')])
+
+    creator.set_evidence('The Earth orbits the Sun.', corpus)
+
+    assert [d.page_content for d in creator.contexts[0]] == [d.page_content for d in reversed(corpus.docs)]
+    assert creator.get_evidence() == EVIDENCE
@@ -0,0 +1,41 @@
+from chatbot_validator.tools import metadata_from_document
+
+
+def test_metadata_from_document():
+    metadata = {
+        'TITLE': 'Orbit of the Earth',
+        'PUBLICATION_YEAR': '2019',
+        'DOI': 'https://doi.org/10.1/earth',
+        'OA_LOCATION': 'https://arxiv.org/pdf/1.pdf',
+    }
+
+    description, year = metadata_from_document(metadata)
+
+    assert year == '2019'
+    assert description == (
+        "'Orbit of the Earth' (2019) ([DOI](https://doi.org/10.1/earth) - [Full text](https://arxiv.org/pdf/1.pdf))"
+    )
+
+
+def test_metadata_from_document_skips_full_text_at_doi():
+    metadata = {'TITLE': 'Orbit', 'PUBLICATION_YEAR': '2019', 'DOI': 'https://doi.org/10.1/earth',
+                'OA_LOCATION': 'https://doi.org/10.1/earth'}
+
+    description, _ = metadata_from_document(metadata)
+
+    assert description == "'Orbit' (2019) ([DOI](https://doi.org/10.1/earth))"
+
+
+def test_metadata_from_document_without_doi():
+    description, year = metadata_from_document({'TITLE': 'Orbit', 'PUBLICATION_YEAR': '2019', 'DOI': ''})
+
+    assert year == '2019'
+    assert description == "'Orbit' (2019) ([DOI](None))"
+
+
+def test_metadata_from_document_missing_fields():
+    assert metadata_from_document({}) is None
+    assert metadata_from_document({'work_id': 'W1'}) is None
+    assert metadata_from_document({'TITLE': 'Orbit', 'DOI': ''}) is None
+    assert metadata_from_document({'TITLE': 'Orbit', 'PUBLICATION_YEAR': '', 'DOI': ''}) is None
+    assert metadata_from_document({'TITLE': 'Orbit', 'PUBLICATION_YEAR': '2019'}) is None
@@ -0,0 +1,80 @@
+import hashlib
+import re
+import typing
+
+import numpy as np
+import pytest
+from langchain.chat_models import ChatOpenAI
+from langchain.docstore.document import Document
+from langchain.embeddings.base import Embeddings
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """Deterministic offline embeddings: texts sharing words end up close to each other."""
+
+    def __init__(self, size: int = 64):
+        self.size = size
+        self.calls = 0
+        self.embedded_texts = 0
+
+    def _embed(self, text: str) -> typing.List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r'\w+', text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.size] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: typing.List[str]) -> typing.List[typing.List[float]]:
+        self.calls += 1
+        self.embedded_texts += len(texts)
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> typing.List[float]:
+        self.calls += 1
+        self.embedded_texts += 1
+        return self._embed(text)
+
+
+CORPUS = [
+    ('W1', 'The Earth revolves around the Sun', 'The Earth revolves around the Sun once every year.'),
+    ('W2', 'Orbital period', 'The Earth takes 365.25 days to fully orbit the sun.'),
+    ('W3', 'Axial tilt', 'The Earth has a slightly tilted axis which causes seasons.'),
+    ('W4', 'Planets', 'The Earth is the third planet from the Sun.'),
+    ('W5', 'Whales', 'There are only about 100 individuals of Rice whale remaining.'),
+]
+
+
+@pytest.fixture
+def embeddings():
+    return BagOfWordsEmbeddings()
+
+
+@pytest.fixture
+def docs():
+    return [
+        Document(page_content=f'ID: {i} TITLE: {t}. ABSTRACT: {a}', metadata={})
+        for i, t, a in CORPUS
+    ]
+
+
+@pytest.fixture
+def container_factory(embeddings):
+    """Builds corpus containers that embed with `embeddings` instead of calling OpenAI."""
+    from vector_store_faissdb import CorpusContainer
+
+    def factory(**kwargs):
+        llm = ChatOpenAI(openai_api_key='test', client=None, temperature=0.0)
+        cc = CorpusContainer('test', llm, **kwargs)
+        cc._emb = embeddings
+        return cc
+
+    return factory
+
+
+@pytest.fixture
+def corpus_container(container_factory, embeddings, docs):
+    cc = container_factory()
+    cc._add_docs_to_db(docs, save_to_disk=False)
+    embeddings.calls = 0
+    embeddings.embedded_texts = 0
+    return cc
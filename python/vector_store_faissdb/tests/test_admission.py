@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+from vector_store_faissdb import metrics
+from vector_store_faissdb.admission import AdmissionController, Overloaded
+
+
+def test_sheds_beyond_the_queue_and_after_the_timeout():
+    controller = AdmissionController(1, max_queue=1, queue_timeout_sec=0.05, retry_after_sec=2.5)
+
+    async def hold(sec):
+        async with controller.admit():
+            await asyncio.sleep(sec)
+            return 'served'
+
+    async def run():
+        first = asyncio.ensure_future(hold(0.2))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(hold(0), hold(0), return_exceptions=True)
+        return [await first] + results
+
+    served, timed_out, rejected = asyncio.run(run())
+    assert served == 'served'
+    assert isinstance(timed_out, Overloaded) and timed_out.status_code == 503
+    assert isinstance(rejected, Overloaded) and rejected.status_code == 429
+    assert rejected.headers == {'Retry-After': '3'}
+    assert (controller.in_flight, controller.queued) == (0, 0)
+
+
+def test_queued_requests_get_released_slots_in_order():
+    controller = AdmissionController(1, max_queue=3, queue_timeout_sec=1)
+    order = []
+
+    async def hold(name):
+        async with controller.admit():
+            order.append(name)
+            assert controller.in_flight == 1
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(hold(name) for name in 'abcd'))
+
+    asyncio.run(run())
+    assert order == list('abcd')
+    assert controller.in_flight == 0
+
+
+def test_overloaded_worker_answers_probes_and_sheds_searches(corpus_container, monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setenv('ADMISSION_MAX_IN_FLIGHT', '1')
+    monkeypatch.setenv('ADMISSION_MAX_QUEUE', '0')
+    monkeypatch.setattr(vector_store_faissdb, '_admission_controller', None)
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    client = TestClient(vector_store_faissdb.app)
+
+    assert client.get('/similarity_search', params={'query': 'Rice whale'}).status_code == 200
+    # a request holding the only slot
+    vector_store_faissdb.admission_controller()._admitted = 1
+    res = client.get('/similarity_search', params={'query': 'Rice whale'})
+    assert res.status_code == 429
+    assert res.headers['Retry-After'] == '1'
+    assert client.get('/health').status_code == 200
+
+
+def test_admission_emf_record(capsys, monkeypatch):
+    monkeypatch.setenv('VECTOR_STORE_EMF_NAMESPACE', 'test-vector-store')
+    metrics.write_admission_emf(queued=3, admitted=8)
+
+    record = json.loads(capsys.readouterr().out)
+    assert record['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [[]]
+    assert record['_aws']['CloudWatchMetrics'][0]['Namespace'] == 'test-vector-store'
+    assert (record['QueuedRequests'], record['AdmittedRequests']) == (3, 8)
+
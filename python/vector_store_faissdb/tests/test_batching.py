@@ -0,0 +1,70 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from vector_store_faissdb.batching import SearchBatcher
+
+QUERIES = ['Rice whale', 'Earth orbit', 'tilted axis', 'third planet']
+
+
+def _contents(results):
+    return [(doc.page_content, round(score, 5)) for doc, score in results]
+
+
+def test_concurrent_searches_share_one_batch(corpus_container, embeddings):
+    expected = [_contents(corpus_container.search(q, k)) for q, k in zip(QUERIES, (1, 2, 3, 4))]
+    embeddings.calls = 0
+    batcher = SearchBatcher(window_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(batcher.search(corpus_container, q, k) for q, k in zip(QUERIES, (1, 2, 3, 4))))
+
+    results = asyncio.run(run())
+
+    assert [_contents(r) for r in results] == expected
+    assert embeddings.calls == 1
+
+
+def test_batches_split_by_size_and_parameters(corpus_container, embeddings):
+    batcher = SearchBatcher(window_ms=50, max_batch_size=2)
+
+    async def run():
+        return await asyncio.gather(
+            *(batcher.search(corpus_container, q, 2) for q in QUERIES[:3]),
+            batcher.search(corpus_container, QUERIES[3], 2, year_min=2000),
+        )
+
+    results = asyncio.run(run())
+
+    assert len(results) == 4
+    assert [len(r) for r in results[:3]] == [2, 2, 2]
+    # two full batches of the same parameters, one of the leftover and one with a filter
+    assert embeddings.calls == 3
+
+
+def test_errors_reach_every_caller(corpus_container, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('index unavailable')
+
+    monkeypatch.setattr(corpus_container, 'search_batch', fail)
+    batcher = SearchBatcher(window_ms=10)
+
+    async def run():
+        return await asyncio.gather(*(batcher.search(corpus_container, q, 1) for q in QUERIES), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
+
+
+def test_similarity_search_endpoint_batches(corpus_container, monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setenv('SEARCH_BATCH_WINDOW_MS', '1')
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    monkeypatch.setattr(vector_store_faissdb, '_search_batcher', None)
+
+    res = TestClient(vector_store_faissdb.app).get(
+        '/similarity_search', params={'query': 'Rice whale', 'maximum_nearest_neighbors': 1},
+    )
+
+    assert res.status_code == 200
+    assert res.json()[0]['id'] == 'W5'
+    assert vector_store_faissdb._search_batcher is not None
@@ -0,0 +1,112 @@
+import asyncio
+import types
+
+import pytest
+from vector_store_faissdb.coalescing import QueryCoalescer, normalize
+
+
+def _container(version='v1', read_only=True):
+    return types.SimpleNamespace(local_path=f'/store/{version}', version=version, read_only=read_only)
+
+
+class _Search:
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError('index unavailable')
+        return [f'result {self.calls}']
+
+
+def test_normalize():
+    assert normalize('  The Earth revolves\n around the Sun ') == 'The Earth revolves around the Sun'
+
+
+def test_concurrent_duplicates_share_one_search():
+    coalescer = QueryCoalescer()
+    cc = _container()
+    search = _Search()
+
+    async def run():
+        return await asyncio.gather(
+            coalescer.search(cc, 'Earth orbit', 2, {'mode': 'vector'}, search),
+            coalescer.search(cc, ' Earth  orbit', 2, {'mode': 'vector'}, search),
+            coalescer.search(cc, 'Earth orbit', 3, {'mode': 'vector'}, search),
+            coalescer.search(cc, 'Earth orbit', 2, {'mode': 'lexical'}, search),
+        )
+
+    results = asyncio.run(run())
+    assert results[0] is results[1]
+    assert search.calls == 3
+    # nothing is cached without a TTL
+    asyncio.run(coalescer.search(cc, 'Earth orbit', 2, {'mode': 'vector'}, search))
+    assert search.calls == 4
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    coalescer = QueryCoalescer(ttl_sec=60)
+    cc = _container()
+    search = _Search(fail=True)
+
+    async def run():
+        return await asyncio.gather(*(coalescer.search(cc, 'q', 1, {}, search) for _ in range(3)),
+                                    return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
+    assert search.calls == 1
+    with pytest.raises(RuntimeError):
+        asyncio.run(coalescer.search(cc, 'q', 1, {}, search))
+    assert search.calls == 2
+
+
+def test_cache_expires_and_follows_snapshot_swaps():
+    coalescer = QueryCoalescer(ttl_sec=60, max_entries=2)
+    cc = _container()
+    search = _Search()
+
+    async def run(query='q', container=cc):
+        return await coalescer.search(container, query, 1, {}, search)
+
+    assert asyncio.run(run()) == ['result 1']
+    assert asyncio.run(run()) == ['result 1']
+    # least recently used entries make room
+    asyncio.run(run('a'))
+    asyncio.run(run('b'))
+    assert asyncio.run(run()) == ['result 4']
+
+    cc.local_path, cc.version = '/store/v2', 'v2'
+    assert asyncio.run(run()) == ['result 5']
+    assert all(key[0] == ('/store/v2', 'v2') for key in coalescer._results)
+
+    coalescer.ttl_sec = 0.001
+    assert asyncio.run(run('c')) == ['result 6']
+    asyncio.run(asyncio.sleep(0.01))
+    assert asyncio.run(run('c')) == ['result 7']
+
+    coalescer.ttl_sec = 60
+    writable = _container(version=None, read_only=False)
+    asyncio.run(run(container=writable))
+    asyncio.run(run(container=writable))
+    assert search.calls == 9
+
+
+def test_similarity_search_endpoint_coalesces(corpus_container, embeddings, monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    monkeypatch.setattr(vector_store_faissdb, '_query_coalescer', None)
+
+    async def run():
+        return await asyncio.gather(*(
+            vector_store_faissdb.similarity_search(query, maximum_nearest_neighbors=2, fields='id', accept=None,
+                                                   accept_encoding=None)
+            for query in ('Rice whale', 'Rice  whale', 'Rice whale ')
+        ))
+
+    responses = asyncio.run(run())
+    assert len({r.body for r in responses}) == 1
+    assert embeddings.calls == 1
@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from vector_store_faissdb.collection_cache import (
+    CollectionCache,
+    UnknownCollection,
+    resident_bytes,
+)
+
+
+@pytest.fixture
+def collections_root(tmp_path, container_factory, docs):
+    # one collection per topic of the test corpus
+    for name, topic in (('earth', docs[:4]), ('whales', docs[4:]), ('all', docs)):
+        container_factory(local_path=tmp_path / name)._add_docs_to_db(topic, save_to_disk=True)
+    return tmp_path
+
+
+@pytest.fixture
+def cache_factory(collections_root, container_factory):
+    loads = []
+
+    def load(local_path, version):
+        loads.append(local_path.name)
+        cc = container_factory(local_path=local_path, read_only=True)
+        cc.version = version
+        cc.load()
+        return cc
+
+    def factory(memory_budget_bytes=0):
+        cache = CollectionCache(collections_root, load, memory_budget_bytes)
+        cache.loads = loads
+        return cache
+
+    return factory
+
+
+def test_loads_on_demand_once(cache_factory):
+    cache = cache_factory()
+    assert cache.names() == ['all', 'earth', 'whales']
+    assert cache.loaded() == {}
+
+    threads = [threading.Thread(target=cache.get, args=('earth',)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.loads == ['earth']
+    assert cache.get('whales').size_of_corpus() == 1
+    assert list(cache.loaded()) == ['earth', 'whales']
+    for name in ('unknown', '../earth', '.hidden'):
+        with pytest.raises(UnknownCollection):
+            cache.get(name)
+
+
+def test_evicts_least_recently_used_within_budget(cache_factory):
+    cache = cache_factory()
+    sizes = {name: resident_bytes(cache.get(name)) for name in ('earth', 'whales', 'all')}
+
+    cache = cache_factory(memory_budget_bytes=sizes['earth'] + sizes['whales'])
+    cache.get('earth')
+    cache.get('whales')
+    cache.get('earth')
+    assert list(cache.loaded()) == ['whales', 'earth']
+    # the largest collection goes over the budget on its own and is still served
+    all_works = cache.get('all')
+    assert list(cache.loaded()) == ['all']
+    assert all_works.size_of_corpus() == 5
+    cache.get('whales')
+    assert list(cache.loaded()) == ['whales']
+    assert cache.loads[-4:] == ['earth', 'whales', 'all', 'whales']
+
+
+def test_collection_similarity_search_endpoint(cache_factory, monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setattr(vector_store_faissdb, '_collection_cache', cache_factory())
+    client = TestClient(vector_store_faissdb.app)
+
+    res = client.get('/collections/whales/similarity_search', params={'query': 'Earth', 'maximum_nearest_neighbors': 3})
+    assert res.status_code == 200
+    assert [r['id'] for r in res.json()] == ['W5']
+    res = client.get('/collections/earth/similarity_search', params={'query': 'Rice whale', 'fields': 'id'})
+    assert {r['id'] for r in res.json()} == {'W1', 'W2', 'W3', 'W4'}
+    assert client.get('/collections/plants/similarity_search', params={'query': 'Earth'}).status_code == 404
+    assert client.get('/collections').json() == [
+        {'name': 'all', 'loaded': False, 'resident_bytes': 0},
+        {'name': 'earth', 'loaded': True, 'resident_bytes': vector_store_faissdb.collection_cache().loaded()['earth']},
+        {'name': 'whales', 'loaded': True, 'resident_bytes': vector_store_faissdb.collection_cache().loaded()['whales']},
+    ]
+
+
+def test_memory_budget_is_split_between_workers(monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setattr(vector_store_faissdb, '_collection_cache', None)
+    monkeypatch.setenv('CORPUS_COLLECTIONS_MEMORY_MB', '1024')
+    monkeypatch.setenv('WEB_CONCURRENCY', '16')
+
+    assert vector_store_faissdb.collection_cache().memory_budget_bytes == 64 * 2 ** 20
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from langchain.docstore.document import Document
+from vector_store_faissdb.concurrency import ReadWriteLock
+
+
+def test_readers_run_in_parallel():
+    lock = ReadWriteLock()
+    inside = threading.Barrier(3, timeout=5)
+
+    def reader():
+        with lock.read():
+            # would time out if readers were serialized
+            inside.wait()
+
+    threads = [threading.Thread(target=reader) for _ in range(3)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert not inside.broken
+
+
+def test_writer_is_exclusive_and_not_starved():
+    lock = ReadWriteLock()
+    events = []
+    reader_entered = threading.Event()
+
+    def long_reader():
+        with lock.read():
+            reader_entered.set()
+            time.sleep(0.2)
+            events.append('reader-1-done')
+
+    def writer():
+        with lock.write():
+            events.append('writer')
+
+    def late_reader():
+        with lock.read():
+            events.append('reader-2')
+
+    threads = [threading.Thread(target=long_reader)]
+    threads[0].start()
+    reader_entered.wait()
+    threads.append(threading.Thread(target=writer))
+    threads[1].start()
+    time.sleep(0.05)
+    threads.append(threading.Thread(target=late_reader))
+    threads[2].start()
+    [t.join() for t in threads]
+
+    assert events == ['reader-1-done', 'writer', 'reader-2']
+
+
+def test_search_waits_for_index_mutation(corpus_container, docs):
+    searched = []
+    with corpus_container._db_lock.write():
+        t = threading.Thread(target=lambda: searched.append(corpus_container.search('Earth orbit', 2)))
+        t.start()
+        time.sleep(0.1)
+        assert not searched
+    t.join()
+    assert len(searched[0]) == 2
+
+
+def test_size_counts_searchable_works(corpus_container, docs, monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    revised = [Document(page_content=d.page_content + ' Revised.', metadata={}) for d in docs[:2]]
+    corpus_container.add_documents(revised)
+    corpus_container.delete(['W5'])
+
+    res = TestClient(vector_store_faissdb.app).get('/size')
+
+    assert res.status_code == 200
+    # the replaced versions of W1 and W2 stay in the index as tombstones until a checkpoint compacts them
+    assert (res.json()['size'], res.json()['vectors']) == (4, 7)
+    assert res.json()['index_bytes'] > 0
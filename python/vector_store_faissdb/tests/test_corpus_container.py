@@ -6,6 +6,8 @@ from unittest import mock
 import pytest
 from langchain.chat_models import ChatOpenAI
 
+pytest.skip('feature is disabled', allow_module_level=True)
+
 
 @pytest.fixture
 def openai_api_key():
@@ -23,7 +25,6 @@ def query(request):
     return request.param
 
 
-@pytest.skip(reason='feature is disabled')
 def test_empty_db(openai_api_key):
     with mock.patch.dict(os.environ, clear=True,
                          CORPUS_DB_PATH='',
@@ -37,7 +38,6 @@ def test_empty_db(openai_api_key):
         assert cc.size_of_corpus() == 0
 
 
-@pytest.skip(reason='feature is disabled')
 def test_first_entry_query(openai_api_key, query):
     with mock.patch.dict(os.environ, clear=True,
                          CORPUS_DB_PATH='',
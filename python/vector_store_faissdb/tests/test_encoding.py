@@ -0,0 +1,62 @@
+import gzip
+import json
+
+import msgpack
+import pytest
+import zstandard
+from fastapi.testclient import TestClient
+from vector_store_faissdb.encoding import MSGPACK_MEDIA_TYPE, encode, parse_fields
+
+
+@pytest.fixture
+def client(corpus_container, monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    return TestClient(vector_store_faissdb.app)
+
+
+def test_parse_fields():
+    assert parse_fields(None) == ('id', 'content', 'metadata', 'score')
+    assert parse_fields('id, score') == ('id', 'score')
+    with pytest.raises(ValueError):
+        parse_fields('id,abstract')
+
+
+@pytest.mark.parametrize('accept_encoding,decompress', [
+    ('gzip', gzip.decompress),
+    ('zstd, gzip', lambda body: zstandard.ZstdDecompressor().decompress(body)),
+    ('gzip;q=0', lambda body: body),
+])
+def test_encode_negotiates_format_and_compression(accept_encoding, decompress):
+    payload = [{'id': 'W1', 'content': 'x' * 2_000, 'score': 0.5}]
+
+    res = encode(payload, accept=f'{MSGPACK_MEDIA_TYPE}, application/json;q=0.5', accept_encoding=accept_encoding)
+
+    assert res.media_type == MSGPACK_MEDIA_TYPE
+    assert msgpack.unpackb(decompress(res.body)) == payload
+    assert json.loads(encode(payload).body) == payload
+
+
+def test_similarity_search_msgpack_projection(client):
+    res = client.get(
+        '/similarity_search',
+        params={'query': 'Rice whale', 'maximum_nearest_neighbors': 2, 'fields': 'id,score'},
+        headers={'Accept': MSGPACK_MEDIA_TYPE},
+    )
+
+    assert res.status_code == 200
+    assert res.headers['content-type'] == MSGPACK_MEDIA_TYPE
+    body = msgpack.unpackb(res.content)
+    assert [set(r) for r in body] == [{'id', 'score'}, {'id', 'score'}]
+    assert body[0]['id'] == 'W5'
+
+    # full content is fetched lazily for the works that are actually used
+    res = client.post('/documents', json=[body[0]['id'], 'W404'])
+    assert res.json()[0]['content'].startswith('ID: W5')
+    assert res.json()[1] is None
+
+
+def test_similarity_search_rejects_unknown_fields(client):
+    res = client.get('/similarity_search', params={'query': 'Rice whale', 'fields': 'abstract'})
+    assert res.status_code == 422
@@ -0,0 +1,131 @@
+import shutil
+import threading
+
+import boto3
+import pytest
+from moto import mock_s3
+from vector_store_faissdb import snapshots
+from vector_store_faissdb.fetcher import (
+    ChecksumMismatch,
+    DirectorySource,
+    S3Source,
+    SnapshotFetcher,
+)
+
+
+@pytest.fixture
+def published(tmp_path, container_factory, docs):
+    writer = container_factory(local_path=tmp_path / 'writer')
+    writer._add_docs_to_db(docs, save_to_disk=True)
+    root = tmp_path / 'published'
+    return root, snapshots.publish(root, writer.local_path)
+
+
+def _assert_serves(path, container_factory):
+    cc = container_factory(local_path=path, read_only=True)
+    cc.load()
+    assert cc.size_of_corpus() == 5
+    assert cc.search('Rice whale', 1)[0][0].page_content.startswith('ID: W5')
+
+
+def test_fetch_directory_in_parts(tmp_path, published, container_factory, monkeypatch):
+    root, manifest = published
+    fetcher = SnapshotFetcher(DirectorySource(root), tmp_path / 'cache', workers=4, part_bytes=512)
+
+    path = fetcher.fetch()
+
+    assert path == tmp_path / 'cache' / manifest.path
+    assert snapshots.live_path(tmp_path / 'cache') == (path, manifest.version)
+    for file in snapshots.read_files(manifest.resolve(root)):
+        assert (path / file.name).read_bytes() == (manifest.resolve(root) / file.name).read_bytes()
+    _assert_serves(path, container_factory)
+
+    # cached by version, nothing is downloaded again
+    monkeypatch.setattr(DirectorySource, 'read_range', lambda *args: pytest.fail('downloaded a cached snapshot'))
+    assert fetcher.fetch() == path
+
+
+def test_workers_sharing_a_cache_download_once(tmp_path, published, container_factory, monkeypatch):
+    root, manifest = published
+    reads = []
+    read_range = DirectorySource.read_range
+
+    def counting_read_range(self, key, start, end):
+        reads.append((key, start))
+        return read_range(self, key, start, end)
+
+    monkeypatch.setattr(DirectorySource, 'read_range', counting_read_range)
+    # one fetcher per uvicorn worker, all of them starting at once
+    fetchers = [SnapshotFetcher(DirectorySource(root), tmp_path / 'cache', part_bytes=512) for _ in range(4)]
+    paths = []
+    threads = [threading.Thread(target=lambda f=f: paths.append(f.fetch())) for f in fetchers]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert paths == [manifest.resolve(tmp_path / 'cache')] * 4
+    assert len(reads) == len(set(reads))
+    assert [p.name for p in (tmp_path / 'cache' / 'snapshots').iterdir()] == [manifest.version]
+    _assert_serves(paths[0], container_factory)
+
+
+def test_fetch_keeps_the_newer_manifest(tmp_path, published):
+    root, old = published
+    new = snapshots.publish(root, tmp_path / 'writer')
+    fetcher = SnapshotFetcher(DirectorySource(root), tmp_path / 'cache', part_bytes=512)
+
+    fetcher.fetch(new)
+    # a watcher that read the source before the newer snapshot was published
+    fetcher.fetch(old)
+
+    assert snapshots.read_manifest(tmp_path / 'cache') == new
+
+
+def test_fetch_accepts_a_snapshot_completed_concurrently(tmp_path, published, monkeypatch):
+    root, manifest = published
+    fetcher = SnapshotFetcher(DirectorySource(root), tmp_path / 'cache', part_bytes=512)
+    target = manifest.resolve(tmp_path / 'cache')
+    write_files = snapshots.write_files
+
+    def write_files_and_race(snapshot, files=None):
+        write_files(snapshot, files)
+        # another host sharing the cache renames its copy into place first
+        shutil.copytree(manifest.resolve(root), target)
+
+    monkeypatch.setattr(snapshots, 'write_files', write_files_and_race)
+
+    assert fetcher.fetch() == target
+    assert [p.name for p in target.parent.iterdir()] == [manifest.version]
+
+
+def test_fetch_rejects_corrupt_snapshot(tmp_path, published):
+    root, manifest = published
+    index = manifest.resolve(root) / 'index.faiss'
+    data = bytearray(index.read_bytes())
+    data[-1] ^= 0xFF
+    index.write_bytes(bytes(data))
+
+    with pytest.raises(ChecksumMismatch):
+        SnapshotFetcher(DirectorySource(root), tmp_path / 'cache', part_bytes=512).fetch()
+
+    assert snapshots.read_manifest(tmp_path / 'cache') is None
+    assert list((tmp_path / 'cache' / 'snapshots').iterdir()) == []
+
+
+@mock_s3
+def test_fetch_s3(tmp_path, published, container_factory):
+    root, manifest = published
+    client = boto3.client('s3', region_name='us-east-1')
+    client.create_bucket(Bucket='corpus')
+    for path in root.rglob('*'):
+        if path.is_file():
+            client.upload_file(str(path), 'corpus', f'store/{path.relative_to(root)}')
+
+    source = S3Source('s3://corpus/store', client=client)
+    assert S3Source('s3://corpus/missing', client=client).read_manifest() is None
+    assert source.read_manifest() == manifest
+
+    path = SnapshotFetcher(source, tmp_path / 'cache', workers=4, part_bytes=512).fetch()
+
+    _assert_serves(path, container_factory)
@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain.docstore.document import Document
+from vector_store_faissdb.filters import MetadataColumns, SearchFilters
+from vector_store_faissdb.id_map import work_id
+
+YEARS = {'W1': '1999', 'W2': '2010', 'W3': '2015', 'W4': '', 'W5': '2021'}
+OPEN_ACCESS = {'W2', 'W5'}
+
+
+@pytest.fixture
+def filterable_docs(docs):
+    return [
+        Document(page_content=d.page_content, metadata={
+            'PUBLICATION_YEAR': YEARS[work_id(d)],
+            'OA_LOCATION': f'https://example.org/{work_id(d)}' if work_id(d) in OPEN_ACCESS else '',
+        })
+        for d in docs
+    ]
+
+
+def _ids(results):
+    return sorted(work_id(d) for d, _ in results)
+
+
+def test_metadata_columns_mask(filterable_docs):
+    columns = MetadataColumns.from_docs(filterable_docs)
+    assert columns.mask(SearchFilters()) is None
+    assert list(columns.mask(SearchFilters(year_min=2010))) == [False, True, True, False, True]
+    assert list(columns.mask(SearchFilters(year_max=2010))) == [True, True, False, False, False]
+    assert list(columns.mask(SearchFilters(year_min=2000, is_oa=True))) == [False, True, False, False, True]
+
+
+@pytest.mark.parametrize('index_factory', ['Flat', 'HNSW16'])
+def test_search_filters(container_factory, filterable_docs, index_factory):
+    cc = container_factory(index_factory=index_factory)
+    cc._add_docs_to_db(filterable_docs, save_to_disk=False)
+    query = 'The Earth revolves around the Sun'
+
+    assert _ids(cc.search(query, 10, year_min=2010)) == ['W2', 'W3', 'W5']
+    assert _ids(cc.search(query, 10, year_min=2000, year_max=2015)) == ['W2', 'W3']
+    assert _ids(cc.search(query, 10, is_oa=False)) == ['W1', 'W3', 'W4']
+    assert _ids(cc.search(query, 1, is_oa=True)) == ['W2']
+    assert [_ids(r) for r in cc.search_batch([query, query], 10, year_max=2000)] == [['W1'], ['W1']]
+
+
+def test_read_only_filters_use_saved_columns(tmp_path, container_factory, filterable_docs, monkeypatch):
+    import vector_store_faissdb
+
+    path = tmp_path / 'store'
+    container_factory(local_path=path)._add_docs_to_db(filterable_docs, save_to_disk=True)
+    read_only = container_factory(local_path=path, read_only=True)
+    read_only.load()
+
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: read_only)
+    res = TestClient(vector_store_faissdb.app).get('/similarity_search', params={
+        'query': 'Earth orbit', 'maximum_nearest_neighbors': 5, 'year_min': 2005, 'is_oa': 'true',
+    })
+
+    assert res.status_code == 200
+    assert sorted(r['content'].split()[1] for r in res.json()) == ['W2', 'W5']
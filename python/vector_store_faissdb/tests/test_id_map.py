@@ -0,0 +1,85 @@
+import faiss
+import pytest
+from langchain.docstore.document import Document
+from vector_store_faissdb.benchmarks.index_types import synthetic_corpus
+from vector_store_faissdb.id_map import WorkIdIndex, WorkIdMap, work_id
+from vector_store_faissdb.indexes import build_index, search_index
+
+
+def _revised(doc):
+    return Document(page_content=doc.page_content.replace('ABSTRACT:', 'ABSTRACT: Revised.'), metadata={})
+
+
+def _ids(results):
+    return [work_id(d) for d, _ in results]
+
+
+def test_work_id_map():
+    ids = WorkIdMap(['W1', 'W2', None, 'W1'])
+    assert len(ids) == 3
+    assert list(ids.live) == [False, True, True, True]
+    assert ids.append(['W2', None]) == 1
+    assert ids.delete(['W2', 'W9']) == 1
+    assert list(ids.deleted_rows()) == [0, 1, 4]
+    assert len(ids.compacted()) == len(ids) == 3
+
+
+def test_work_id_index(tmp_path):
+    ids = WorkIdMap(['W10', 'W2', None, 'W10', 'W1'])
+    ids.save(tmp_path)
+
+    index = WorkIdIndex.load(tmp_path)
+    assert [index.row(_id) for _id in ('W1', 'W10', 'W2', 'W3', 'W100')] == [4, 3, 1, None, None]
+    assert WorkIdMap.load(tmp_path, size=5, index=index).row('W10') == 3
+
+
+def test_upsert_and_delete_never_return_duplicates(corpus_container, docs):
+    corpus_container._add_docs_to_db([_revised(docs[1]), docs[1]], save_to_disk=False)
+    corpus_container._add_docs_to_db([_revised(docs[1])], save_to_disk=False)
+
+    results = corpus_container.search('Earth orbit sun days', 10)
+    assert corpus_container.size_of_corpus() == len(docs)
+    assert sorted(_ids(results)) == ['W1', 'W2', 'W3', 'W4', 'W5']
+    assert 'Revised.' in dict(zip(_ids(results), (d.page_content for d, _ in results)))['W2']
+
+    assert corpus_container.delete(['W2', 'W4']) == 2
+    assert corpus_container.size_of_corpus() == 3
+    assert sorted(_ids(corpus_container.search('Earth orbit sun days', 10))) == ['W1', 'W3', 'W5']
+
+
+@pytest.mark.parametrize('index_factory', ['Flat', 'HNSW16'])
+def test_tombstones_survive_reload(tmp_path, container_factory, docs, index_factory):
+    path = tmp_path / 'store'
+    writer = container_factory(local_path=path, index_factory=index_factory, rerank=True)
+    writer._add_docs_to_db(docs, save_to_disk=True)
+    writer._add_docs_to_db([_revised(docs[0])], save_to_disk=True)
+    writer.delete(['W3'], save_to_disk=True)
+
+    restarted = container_factory(local_path=path, index_factory=index_factory, rerank=True)
+    restarted.load()
+    assert restarted.size_of_corpus() == 4
+    restarted.checkpoint()
+    # flat indexes drop the tombstoned rows, graphs keep filtering them
+    expected_rows = 4 if index_factory == 'Flat' else 6
+    assert restarted.memory_footprint()['vectors'] == expected_rows
+
+    read_only = container_factory(local_path=path, index_factory=index_factory, rerank=True, read_only=True)
+    read_only.load()
+    results = read_only.search('The Earth revolves around the Sun', 10)
+    assert sorted(_ids(results)) == ['W1', 'W2', 'W4', 'W5']
+    assert read_only._can_rerank()
+    # ids are resolved through the memory-mapped index, not a list of every work
+    assert read_only._ids._work_ids is None
+    w1, w3, unknown = read_only.documents(['W1', 'W3', 'W9' * 40])
+    assert 'Revised.' in w1.page_content and w3 is None and unknown is None
+
+
+def test_selector_falls_back_to_post_filtering():
+    vectors = synthetic_corpus(1_000, 16)
+    allowed = vectors[:, 0] > 0
+    for factory in ('Flat', 'PQ4x4', 'IVF16,Flat'):
+        index = build_index(factory, vectors)
+        index.add(vectors)
+        _, found = search_index(index, vectors[:10], 5, allowed=allowed)
+        assert (found >= 0).all() and allowed[found].all(), factory
+    assert isinstance(faiss.downcast_index(index), faiss.IndexIVF)
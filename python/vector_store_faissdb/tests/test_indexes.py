@@ -0,0 +1,55 @@
+import faiss
+import pytest
+from vector_store_faissdb.benchmarks.index_types import (
+    IndexConfig,
+    benchmark,
+    synthetic_corpus,
+)
+from vector_store_faissdb.indexes import build_index, search_parameters
+
+
+@pytest.fixture
+def container_factory(container_factory, docs):
+    def factory(**kwargs):
+        cc = container_factory(**kwargs)
+        cc._add_docs_to_db(docs, save_to_disk=False)
+        return cc
+
+    return factory
+
+
+def test_hnsw_container_matches_flat(container_factory):
+    flat = container_factory()
+    hnsw = container_factory(index_factory='HNSW16')
+
+    assert isinstance(faiss.downcast_index(hnsw._db.index), faiss.IndexHNSW)
+    query = 'How long does the Earth orbit take?'
+    expected = [d.page_content for d, _ in flat.search(query, 3)]
+    assert [d.page_content for d, _ in hnsw.search(query, 3, ef_search=64)] == expected
+
+
+def test_ivf_falls_back_to_flat_when_untrainable(container_factory):
+    cc = container_factory(index_factory='IVF64,Flat')
+    assert cc._db.index.is_trained
+    assert faiss.try_extract_index_ivf(cc._db.index) is None
+    assert cc.size_of_corpus() == 5
+
+
+def test_search_parameters():
+    vectors = synthetic_corpus(1_000, 8)
+    ivf = build_index('IVF16,Flat', vectors)
+    hnsw = build_index('HNSW8', vectors)
+
+    assert search_parameters(ivf, nprobe=4).nprobe == 4
+    assert search_parameters(hnsw, ef_search=32).efSearch == 32
+    assert search_parameters(hnsw, nprobe=4) is None
+    assert search_parameters(build_index('Flat', vectors), nprobe=4, ef_search=32) is None
+
+
+def test_benchmark_reports_recall_against_flat():
+    rows = benchmark(2_000, 16, [IndexConfig('HNSW16', 'ef_search', (128,))], k=5, n_queries=20)
+
+    assert [r['index'] for r in rows] == ['Flat', 'HNSW16']
+    assert rows[0]['recall@5'] == 1.0
+    assert 0.0 < rows[1]['recall@5'] <= 1.0
+    assert all(r['p99_ms'] >= r['p50_ms'] for r in rows)
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from langchain.docstore.document import Document
+from vector_store_faissdb.ingestion import DONE, IngestionPipeline
+
+
+def _wait(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def _documents_for(text):
+    return [Document(page_content=f'ID: {text}-{i} TITLE: {text}. ABSTRACT: {text} number {i}', metadata={})
+            for i in range(3)]
+
+
+def test_jobs_are_micro_batched_into_one_embedding_call(corpus_container, embeddings):
+    gate = threading.Event()
+
+    def documents_for(text):
+        gate.wait(5)
+        return _documents_for(text)
+
+    corpus_container.documents_for = documents_for
+    pipeline = IngestionPipeline(corpus_container, search_workers=4, batch_size=64, batch_wait_sec=0.2)
+    try:
+        jobs = [pipeline.submit(['comets', 'asteroids']), pipeline.submit(['nebulae'])]
+        gate.set()
+        [_wait(job) for job in jobs]
+    finally:
+        pipeline.stop()
+
+    assert [job.state for job in jobs] == [DONE, DONE]
+    assert [job.documents_indexed for job in jobs] == [6, 3]
+    assert jobs[0].as_dict()['documents_per_sec'] > 0
+    assert embeddings.calls == 1
+    assert corpus_container.size_of_corpus() == 5 + 9
+    assert corpus_container.search('nebulae number', 1)[0][0].page_content.startswith('ID: nebulae')
+
+
+def test_search_is_served_while_ingesting(corpus_container):
+    release = threading.Event()
+
+    def documents_for(text):
+        release.wait(5)
+        return _documents_for(text)
+
+    corpus_container.documents_for = documents_for
+    pipeline = IngestionPipeline(corpus_container, batch_wait_sec=0.05)
+    try:
+        job = pipeline.submit(['comets'])
+        assert len(corpus_container.search('Earth orbit', 2)) == 2
+        assert job.state != DONE
+        release.set()
+        _wait(job)
+    finally:
+        pipeline.stop()
+    assert job.documents_indexed == 3
+
+
+def test_failed_texts_are_reported(corpus_container):
+    def documents_for(text):
+        raise RuntimeError('OpenAlex is down')
+
+    corpus_container.documents_for = documents_for
+    pipeline = IngestionPipeline(corpus_container, batch_wait_sec=0.05)
+    try:
+        job = _wait(pipeline.submit(['comets']))
+    finally:
+        pipeline.stop()
+    assert job.state == 'failed'
+    assert job.errors == ['OpenAlex is down']
+    assert pipeline.get(job.id) is job
+
+
+def test_job_status_reports_queue_depth(corpus_container, monkeypatch):
+    import vector_store_faissdb
+
+    corpus_container.documents_for = _documents_for
+    # an indexer that does not drain the queue
+    monkeypatch.setattr(IngestionPipeline, '_index_loop', lambda self: None)
+    pipeline = IngestionPipeline(corpus_container, search_workers=1)
+    monkeypatch.setattr(vector_store_faissdb, '_ingestion_pipeline', pipeline)
+    job = pipeline.submit(['comets'])
+    pipeline.stop()
+
+    res = TestClient(vector_store_faissdb.app).get(f'/index/{job.id}')
+    assert res.status_code == 200
+    assert (res.json()['documents_found'], res.json()['queue_depth']) == (3, 3)
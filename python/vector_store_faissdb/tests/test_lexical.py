@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from langchain.docstore.document import Document
+from vector_store_faissdb.lexical import LEGACY_FILE_NAME, LexicalIndex, fuse, tokenize
+
+GENES = [
+    Document(page_content='ID: W6 TITLE: Cytokines. ABSTRACT: IL-6 signalling drives inflammation.', metadata={}),
+    Document(page_content='ID: W7 TITLE: Tumour suppressors. ABSTRACT: BRCA1 mutations raise cancer risk.', metadata={}),
+]
+
+
+def test_tokenize_keeps_identifiers():
+    assert tokenize('The IL-6 level of BRCA1 and C6H12O6') == ['il-6', 'il', '6', 'level', 'brca1', 'c6h12o6']
+
+
+def test_bm25_ranks_and_masks(docs):
+    index = LexicalIndex.from_docs(docs + GENES)
+
+    scores, rows = index.search('BRCA1 mutations', 3)
+    assert rows.tolist() == [6]
+    assert scores[0] > 0
+
+    _, rows = index.search('Earth Sun', 5)
+    assert set(rows.tolist()) == {0, 1, 2, 3}
+    allowed = np.ones(len(index), dtype=bool)
+    allowed[0] = False
+    assert 0 not in index.search('Earth Sun', 5, allowed)[1]
+
+
+def test_save_load_and_compact(tmp_path, docs):
+    index = LexicalIndex.from_docs(docs)
+    index.save(tmp_path)
+    index.append(GENES)
+    expected = index.search('IL-6 Earth', 10)
+
+    assert LexicalIndex.load(tmp_path).search('Earth', 10)[1].tolist() == index.search('Earth', 10)[1].tolist()
+    compacted = index.compacted(np.array([0, 1, 2, 3, 4, 6]))
+    assert compacted.search('BRCA1', 1)[1].tolist() == [5]
+    assert compacted.search('IL-6', 1)[1].tolist() == []
+    index.save(tmp_path)
+    loaded = LexicalIndex.load(tmp_path)
+    np.testing.assert_allclose(loaded.search('IL-6 Earth', 10)[0], expected[0])
+    assert loaded.search('IL-6 Earth', 10)[1].tolist() == expected[1].tolist()
+    # memory-mapped read-only, not copied onto the heap
+    assert not loaded._terms.flags.writeable and not loaded._rows.flags.writeable
+
+
+def test_loads_compressed_postings_of_older_stores(tmp_path, docs):
+    index = LexicalIndex.from_docs(docs + GENES)
+    terms, offsets, rows, tfs = index._merged()
+    # saved in insertion order, as the older format did
+    shuffled = np.random.default_rng(0).permutation(len(terms))
+    counts = np.diff(offsets)[shuffled]
+    postings = np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in shuffled])
+    np.savez(str(tmp_path / LEGACY_FILE_NAME), terms=np.array([t.decode() for t in terms[shuffled]], dtype=str),
+             offsets=np.concatenate([[0], np.cumsum(counts)]), rows=rows[postings], tfs=tfs[postings],
+             lengths=index._lengths)
+
+    loaded = LexicalIndex.load(tmp_path)
+    for query in ('IL-6 Earth', 'BRCA1', 'Sun seasons'):
+        assert loaded.search(query, 10)[1].tolist() == index.search(query, 10)[1].tolist()
+    loaded.save(tmp_path)
+    assert not (tmp_path / LEGACY_FILE_NAME).exists()
+
+
+def test_fuse():
+    a, b, c = (Document(page_content=f'ID: {i} TITLE: x', metadata={}) for i in ('W1', 'W2', 'W3'))
+    dense = [(a, 0.1), (b, 0.5)]
+    lexical = [(c, 9.0), (b, 3.0)]
+
+    assert [d.page_content[4:6] for d, _ in fuse(dense, lexical, 3)] == ['W2', 'W1', 'W3']
+    weighted = fuse(dense, lexical, 2, fusion='weighted', vector_weight=0.9)
+    assert [d.page_content[4:6] for d, _ in weighted] == ['W1', 'W3']
+    with pytest.raises(ValueError):
+        fuse(dense, lexical, 2, fusion='max')
+
+
+def test_hybrid_search_finds_exact_identifiers(tmp_path, container_factory, docs):
+    cc = container_factory(local_path=tmp_path / 'store')
+    cc._add_docs_to_db(docs + GENES, save_to_disk=True)
+
+    results = cc.search('brca1', 2, mode='hybrid')
+    assert results[0][0].page_content.startswith('ID: W7')
+    assert cc.search('brca1', 1, mode='lexical')[0][0].page_content.startswith('ID: W7')
+    assert [len(r) for r in cc.search_batch(['brca1', 'IL-6'], 2, mode='hybrid')] == [2, 2]
+    assert cc.search('brca1', 2, mode='hybrid', year_min=3000) == []
+    with pytest.raises(ValueError):
+        cc.search('brca1', 2, mode='sparse')
+
+    # saved next to the index and served by read-only replicas
+    cc.delete(['W7'], save_to_disk=True)
+    cc.checkpoint()
+    replica = container_factory(local_path=tmp_path / 'store', read_only=True)
+    replica.load()
+    assert replica.search('BRCA1', 2, mode='lexical') == []
+    assert replica.search('IL-6', 1, mode='lexical')[0][0].page_content.startswith('ID: W6')
+
+
+def test_similarity_search_hybrid_endpoint(corpus_container, monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    client = TestClient(vector_store_faissdb.app)
+
+    res = client.get('/similarity_search', params={'query': 'Rice whale', 'maximum_nearest_neighbors': 1,
+                                                  'mode': 'hybrid', 'fusion': 'weighted'})
+    assert res.status_code == 200
+    assert res.json()[0]['id'] == 'W5'
+    res = client.get('/similarity_search', params={'query': 'Rice whale', 'mode': 'sparse'})
+    assert res.status_code == 422
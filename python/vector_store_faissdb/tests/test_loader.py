@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain.chat_models import ChatOpenAI
+from vector_store_faissdb.loader import FAILED, LoadProgress
+
+
+@pytest.fixture
+def saved_path(tmp_path, embeddings, docs):
+    from vector_store_faissdb import CorpusContainer
+
+    path = tmp_path / 'store'
+    cc = CorpusContainer('test', ChatOpenAI(openai_api_key='test', client=None, temperature=0.0), local_path=path)
+    cc._emb = embeddings
+    cc._add_docs_to_db(docs, save_to_disk=True)
+    return path
+
+
+@pytest.fixture
+def service(saved_path, monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setenv('CORPUS_DB_PATH', str(saved_path))
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('CORPUS_DB_READ_ONLY', '1')
+    monkeypatch.setattr(vector_store_faissdb, '_corpus_container', None)
+    monkeypatch.setattr(vector_store_faissdb, '_load_progress', LoadProgress())
+    monkeypatch.setattr(vector_store_faissdb, '_loader', None)
+    return vector_store_faissdb
+
+
+def test_background_load_reports_readiness(service, monkeypatch):
+    release = threading.Event()
+    load = service.CorpusContainer.load
+
+    def slow_load(self, progress=None):
+        release.wait(10)
+        load(self, progress=progress)
+
+    monkeypatch.setattr(service.CorpusContainer, 'load', slow_load)
+
+    with TestClient(service.app) as client:
+        res = client.get('/ready')
+        assert res.status_code == 503
+        assert res.json()['detail']['state'] == 'loading'
+        assert client.get('/health').status_code == 200
+
+        release.set()
+        service._loader.join(10)
+
+        res = client.get('/ready')
+        assert res.status_code == 200
+        assert res.json()['state'] == 'ready'
+        assert res.json()['stages_done'] == ['index', 'metadata', 'lexical_index']
+        assert service._corpus_container.size_of_corpus() == 5
+
+
+def test_ready_retries_failed_load(service, saved_path, monkeypatch):
+    monkeypatch.setenv('VECTOR_STORE_EAGER_LOAD', '0')
+    index = (saved_path / 'index.faiss').read_bytes()
+    (saved_path / 'index.faiss').write_bytes(index[:16])
+
+    with TestClient(service.app) as client:
+        assert service._loader is None
+        assert client.get('/ready').status_code == 503
+        service._loader.join(10)
+        assert service._load_progress.state == FAILED
+        assert service._load_progress.as_dict()['stage'] == 'index'
+
+        (saved_path / 'index.faiss').write_bytes(index)
+        client.get('/ready')
+        service._loader.join(10)
+        assert client.get('/ready').status_code == 200
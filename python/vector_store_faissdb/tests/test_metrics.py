@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from chatbot_validator.embeddings import CachedEmbeddings
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from vector_store_faissdb import metrics
+
+
+@pytest.fixture
+def client(corpus_container, monkeypatch):
+    import vector_store_faissdb
+
+    corpus_container._emb = CachedEmbeddings(corpus_container.emb)
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    monkeypatch.setattr(vector_store_faissdb, '_corpus_container', corpus_container)
+    return TestClient(vector_store_faissdb.app)
+
+
+def _count(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_similarity_search_records_stages(client):
+    before = {s: _count('vector_store_stage_seconds_count', stage=s) for s in metrics.STAGES}
+    requests = _count('vector_store_request_seconds_count', endpoint='/similarity_search')
+
+    res = client.get('/similarity_search', params={'query': 'Rice whale', 'maximum_nearest_neighbors': 2})
+
+    assert res.status_code == 200
+    for s in metrics.STAGES:
+        assert _count('vector_store_stage_seconds_count', stage=s) == before[s] + 1
+    assert _count('vector_store_request_seconds_count', endpoint='/similarity_search') == requests + 1
+
+
+def test_metrics_endpoint(client):
+    client.get('/similarity_search', params={'query': 'Rice whale', 'maximum_nearest_neighbors': 2})
+
+    res = client.get('/metrics')
+
+    assert res.status_code == 200
+    assert res.headers['content-type'].startswith('text/plain')
+    assert 'vector_store_corpus_size 5.0' in res.text
+    assert 'vector_store_in_flight_requests' in res.text
+    assert 'vector_store_embedding_cache_hit_ratio' in res.text
+    assert _count('vector_store_index_bytes') > 0
+
+
+def test_emf_record(client, monkeypatch, capsys):
+    monkeypatch.setenv('VECTOR_STORE_EMF', '1')
+    monkeypatch.setenv('VECTOR_STORE_EMF_NAMESPACE', 'test-vector-store')
+
+    client.get('/similarity_search', params={'query': 'Rice whale', 'maximum_nearest_neighbors': 2})
+    client.get('/health')
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+    assert len(lines) == 1
+    record = lines[0]
+    assert record['_aws']['CloudWatchMetrics'][0]['Namespace'] == 'test-vector-store'
+    assert record['Endpoint'] == '/similarity_search'
+    assert record['InFlightRequests'] == 1
+    assert {'RequestLatency', 'EmbeddingLatency', 'SearchLatency', 'SerializationLatency'} <= set(record)
+
+
+_WORKER = """
+import sys
+from vector_store_faissdb import metrics
+
+metrics.SEARCHES.labels('searched').inc()
+metrics.IN_FLIGHT.inc()
+if sys.argv[1] == 'stopped':
+    metrics.mark_process_dead()
+"""
+_SCRAPE = """
+import sys
+from vector_store_faissdb import metrics
+
+sys.stdout.write(metrics.exposition()[0].decode())
+"""
+
+
+def test_exposition_aggregates_worker_processes(tmp_path):
+    # prometheus_client picks its value storage on import, so workers and the scrape need fresh interpreters
+    env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(tmp_path)}
+    for state in ('running', 'stopped'):
+        subprocess.run([sys.executable, '-c', _WORKER, state], env=env, check=True)
+
+    scrape = subprocess.run([sys.executable, '-c', _SCRAPE], env=env, check=True, capture_output=True, text=True)
+
+    assert 'vector_store_searches_total{outcome="searched"} 2.0' in scrape.stdout
+    assert 'vector_store_in_flight_requests 1.0' in scrape.stdout
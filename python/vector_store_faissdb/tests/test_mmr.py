@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from langchain.docstore.document import Document
+from vector_store_faissdb.id_map import work_id
+from vector_store_faissdb.mmr import mmr
+
+# reprints of W1 that only differ in a word or two
+REPRINTS = [
+    Document(page_content='ID: W8 TITLE: The Earth revolves around the Sun. '
+                          'ABSTRACT: The Earth revolves around the Sun once every year.', metadata={}),
+    Document(page_content='ID: W9 TITLE: The Earth revolves around the Sun (reprint). '
+                          'ABSTRACT: The Earth revolves around the Sun once every year.', metadata={}),
+]
+
+
+def test_mmr_skips_near_duplicates():
+    vectors = np.array([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]], dtype=np.float32)
+    relevance = np.array([1.0, 0.9, 0.5])
+
+    assert mmr(relevance, vectors, 2, lambda_mult=1.0).tolist() == [0, 1]
+    assert mmr(relevance, vectors, 2, lambda_mult=0.5).tolist() == [0, 2]
+    assert mmr(relevance, vectors, 5).tolist() == [0, 2, 1]
+    assert mmr(relevance[:0], vectors[:0], 3).tolist() == []
+
+
+@pytest.mark.parametrize('mode', ['vector', 'hybrid', 'lexical'])
+def test_search_diversifies_without_embedding_again(corpus_container, embeddings, mode):
+    corpus_container._add_docs_to_db(REPRINTS, save_to_disk=False)
+    embeddings.calls = 0
+    query = 'The Earth revolves around the Sun once every year'
+
+    relevant = [work_id(d) for d, _ in corpus_container.search(query, 3, mode=mode)]
+    assert set(relevant) == {'W1', 'W8', 'W9'}
+    diverse = [work_id(d) for d, _ in corpus_container.search(query, 3, mode=mode, mmr_lambda=0.3)]
+    assert diverse[0] in relevant
+    assert len(set(diverse[:2]) & {'W1', 'W8', 'W9'}) == 1
+    assert embeddings.calls == (0 if mode == 'lexical' else 2)
+
+    batch = corpus_container.search_batch([query, 'Rice whale'], 2, mode=mode, mmr_lambda=0.3)
+    assert [len(r) for r in batch] == [2, 1 if mode == 'lexical' else 2]
+    with pytest.raises(ValueError):
+        corpus_container.search(query, 3, mmr_lambda=2)
+
+
+def test_similarity_search_mmr_endpoint(corpus_container, monkeypatch):
+    import vector_store_faissdb
+
+    corpus_container._add_docs_to_db(REPRINTS, save_to_disk=False)
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    client = TestClient(vector_store_faissdb.app)
+
+    params = {'query': 'The Earth revolves around the Sun', 'maximum_nearest_neighbors': 2, 'mmr_lambda': 0.3}
+    res = client.get('/similarity_search', params=params)
+    assert res.status_code == 200
+    assert len({r['id'] for r in res.json()} & {'W1', 'W8', 'W9'}) == 1
+    res = client.post('/similarity_search/batch', json={'queries': [params['query']], 'maximum_nearest_neighbors': 2,
+                                                        'mmr_lambda': 0.3})
+    assert res.status_code == 200
+    assert len({r['id'] for r in res.json()[0]} & {'W1', 'W8', 'W9'}) == 1
+    assert client.get('/similarity_search', params={**params, 'mmr_lambda': -1}).status_code == 422
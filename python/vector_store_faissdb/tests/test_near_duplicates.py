@@ -0,0 +1,117 @@
+import time
+
+from langchain.docstore.document import Document
+from vector_store_faissdb.ingestion import DONE, IngestionPipeline
+from vector_store_faissdb.near_duplicates import (
+    FILE_NAME,
+    NearDuplicateIndex,
+    canonical,
+    signature,
+)
+
+ABSTRACT = (
+    'Rice whales are a critically endangered baleen whale species found only in the Gulf of Mexico. We combined '
+    'passive acoustic monitoring with vessel surveys to estimate that fewer than one hundred individuals remain, '
+    'and we show that vessel strikes and energy exploration threaten the recovery of the population.'
+)
+PUBLISHED = ABSTRACT.replace('We combined', 'Here we combined').replace('one hundred', '100')
+UNRELATED = (
+    'The Earth takes 365.25 days to fully orbit the Sun. We review how the length of the sidereal and the tropical '
+    'year were measured over the centuries and how leap years keep the calendar aligned with the seasons.'
+)
+
+
+def _doc(_id, abstract, title='Rice whales'):
+    return Document(page_content=f'ID: {_id} TITLE: {title}. ABSTRACT: {abstract}', metadata={})
+
+
+def test_versions_of_a_work_cluster_together():
+    signatures = [signature(_doc(i, a).page_content) for i, a in [('P', ABSTRACT), ('U', UNRELATED), ('J', PUBLISHED)]]
+
+    assert canonical(signatures, 0.8) == [0, 1, 0]
+    index = NearDuplicateIndex(threshold=0.8)
+    index.append(signatures[:2])
+    assert index.duplicates([signatures[2]]) == [0]
+    assert index.duplicates([signatures[2]], allowed=[False, True]) == [None]
+    # too short to tell apart from a shared phrase
+    assert signature('ID: W1 TITLE: Planets. ABSTRACT: The Earth is the third planet from the Sun.') is None
+
+
+def test_works_without_a_signature_are_never_candidates():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.append([None, signature(_doc('P', ABSTRACT).page_content), None])
+
+    assert len(index) == 3
+    assert index._rows.tolist() == [1]
+    assert index.duplicates([None, signature(_doc('J', PUBLISHED).page_content)]) == [None, 1]
+    assert index.compacted([1, 2])._rows.tolist() == [0]
+
+
+def test_index_embeds_one_version_of_each_work(container_factory, embeddings, docs, monkeypatch):
+    cc = container_factory()
+    cc._add_docs_to_db(docs + [_doc('W6', ABSTRACT)], save_to_disk=False)
+    embeddings.embedded_texts = 0
+    found = {
+        'whales': [_doc('W7', PUBLISHED), _doc('W8', UNRELATED, 'The year')],
+        'year': [_doc('W9', UNRELATED, 'The year'), _doc('W6', PUBLISHED)],
+    }
+    monkeypatch.setattr(cc, 'documents_for', lambda text: found[text])
+
+    cc.index(['whales', 'year'])
+
+    # the published version W7 of W6 and the correction W9 of W8 are skipped, the re-added W6 replaces its old version
+    assert embeddings.embedded_texts == 2
+    assert cc.documents(['W6', 'W7', 'W8', 'W9']) == [found['year'][1], None, found['whales'][1], None]
+    assert cc.size_of_corpus() == 7
+
+
+def test_ingestion_pipeline_skips_near_duplicates(container_factory, embeddings, docs):
+    cc = container_factory()
+    cc._add_docs_to_db(docs + [_doc('W6', ABSTRACT)], save_to_disk=False)
+    embeddings.embedded_texts = 0
+    found = {'whales': [_doc('W7', PUBLISHED), _doc('W8', UNRELATED)], 'year': [_doc('W9', UNRELATED)]}
+    cc.documents_for = lambda text: found[text]
+
+    pipeline = IngestionPipeline(cc, search_workers=1, batch_wait_sec=0.05)
+    try:
+        job = pipeline.submit(['whales', 'year'])
+        deadline = time.time() + 5
+        while not job.finished and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        pipeline.stop()
+
+    assert (job.state, job.documents_found, job.documents_indexed, job.documents_skipped) == (DONE, 3, 1, 2)
+    assert embeddings.embedded_texts == 1
+    assert cc.documents(['W7', 'W8', 'W9']) == [None, found['whales'][1], None]
+
+
+def test_signatures_are_saved_and_follow_compaction(tmp_path, container_factory, embeddings, docs, monkeypatch):
+    path = tmp_path / 'store'
+    cc = container_factory(local_path=path, checkpoint_every=1)
+    cc._add_docs_to_db(docs + [_doc('W6', ABSTRACT), _doc('W8', UNRELATED)], save_to_disk=True)
+    monkeypatch.setattr(cc, 'documents_for', lambda text: [_doc('W7', PUBLISHED), _doc('W9', 'Whales ' * 30)])
+    cc.index(['whales'], save_to_disk=True)
+    assert (path / FILE_NAME).exists()
+    assert cc.documents(['W7'])[0] is None
+
+    cc.delete(['W1'], save_to_disk=True)
+    cc.checkpoint()
+    assert len(NearDuplicateIndex.load(path)) == cc._db.index.ntotal == 7
+    reloaded = container_factory(local_path=path)
+    reloaded.load()
+    embeddings.embedded_texts = 0
+    monkeypatch.setattr(reloaded, 'documents_for', lambda text: [_doc('W10', UNRELATED), _doc('W11', 'Year ' * 30)])
+
+    reloaded.index(['year'], save_to_disk=True)
+    assert embeddings.embedded_texts == 1
+    reloaded.checkpoint()
+    assert len(NearDuplicateIndex.load(path)) == reloaded._db.index.ntotal
+
+
+def test_disabled(container_factory, embeddings, monkeypatch):
+    cc = container_factory(near_duplicate_threshold=None)
+    monkeypatch.setattr(cc, 'documents_for', lambda text: [_doc('W6', ABSTRACT), _doc('W7', PUBLISHED)])
+
+    cc.index(['whales'])
+    assert embeddings.embedded_texts == 2
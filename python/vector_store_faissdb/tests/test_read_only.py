@@ -0,0 +1,123 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pytest
+from langchain.docstore import InMemoryDocstore
+from langchain.docstore.document import Document
+from vector_store_faissdb.docstore import (
+    DATA_FILE_NAME,
+    OFFSETS_FILE_NAME,
+    MmapDocstore,
+)
+from vector_store_faissdb.indexes import build_index
+
+
+@pytest.fixture
+def saved_path(tmp_path, container_factory, docs):
+    path = tmp_path / 'store'
+    container_factory(local_path=path)._add_docs_to_db(docs, save_to_disk=True)
+    return path
+
+
+@pytest.mark.parametrize('convert_from_pickle', [False, True])
+def test_read_only_search_matches_writable(saved_path, container_factory, convert_from_pickle):
+    if convert_from_pickle:
+        _save_as_pickle(saved_path)
+
+    writable = container_factory(local_path=saved_path)
+    writable.load()
+    read_only = container_factory(local_path=saved_path, read_only=True)
+    read_only.load()
+
+    assert read_only.size_of_corpus() == writable.size_of_corpus()
+    query = 'How long does the Earth orbit take?'
+    expected = writable.search(query, 3)
+    actual = read_only.search(query, 3)
+    assert [d.page_content for d, _ in actual] == [d.page_content for d, _ in expected]
+    assert [d.page_content for d, _ in read_only.search_batch([query], 3)[0]] == [d.page_content for d, _ in expected]
+
+
+def _anonymous_rss_bytes() -> int:
+    # resident memory that is not backed by a file, the heap copies of an index land here
+    for line in Path('/proc/self/status').read_text().splitlines():
+        if line.startswith('RssAnon:'):
+            return int(line.split()[1]) * 1024
+    raise AssertionError('No RssAnon in /proc/self/status')
+
+
+@pytest.mark.skipif(not Path('/proc/self/maps').exists(), reason='needs procfs')
+@pytest.mark.parametrize('factory', ['Flat', 'SQ8'])
+def test_read_only_index_is_file_backed(tmp_path, container_factory, factory):
+    vectors = np.random.default_rng(0).random((40_000, 128), dtype=np.float32)
+    path = tmp_path / 'store'
+    path.mkdir()
+    index = build_index(factory, vectors)
+    index.add(vectors)
+    faiss.write_index(index, str(path / 'index.faiss'))
+    MmapDocstore.write(path, ((str(i), Document(page_content=f'ID: W{i}')) for i in range(len(vectors))))
+    cc = container_factory(local_path=path, read_only=True)
+
+    before = _anonymous_rss_bytes()
+    db = cc._load_mmap(path)
+    grown = _anonymous_rss_bytes() - before
+
+    # the codes are served from the page cache that all workers share, not copied to each worker's heap
+    assert str(path / 'index.faiss') in Path('/proc/self/maps').read_text()
+    assert grown < (path / 'index.faiss').stat().st_size / 4
+    assert db.index.search(vectors[:1], 1)[1][0][0] == 0
+
+
+def test_workers_convert_a_pickled_docstore_once(saved_path, container_factory):
+    _save_as_pickle(saved_path)
+
+    def load(_):
+        cc = container_factory(local_path=saved_path, read_only=True)
+        cc.load()
+        return cc.size_of_corpus()
+
+    # uvicorn workers of a read-only store all load it at startup, a failed load raises here
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        sizes = list(pool.map(load, range(12)))
+
+    assert sizes == [5] * 12
+    assert sorted(p.name for p in saved_path.iterdir() if p.name.startswith('.docstore')) == ['.docstore.lock']
+
+
+def _save_as_pickle(path):
+    # the layout FAISS.save_local wrote before stores kept their documents in the docstore files
+    docs = MmapDocstore(path)
+    ids = {i: f'uuid-{i}' for i in range(len(docs))}
+    with open(path / 'index.pkl', 'wb') as f:
+        pickle.dump((InMemoryDocstore({ids[i]: docs.row(i) for i in ids}), ids), f)
+    (path / DATA_FILE_NAME).unlink()
+    (path / OFFSETS_FILE_NAME).unlink()
+
+
+def test_writable_store_keeps_saved_documents_on_disk(saved_path, container_factory, docs):
+    cc = container_factory(local_path=saved_path)
+    cc.load()
+    assert not (saved_path / 'index.pkl').exists()
+    assert len(cc._db.docstore._pending) == 0
+
+    cc.add_documents(docs[:1], save_to_disk=True)
+    cc.delete(['W3'], save_to_disk=True)
+    cc.checkpoint()
+    assert len(cc._db.docstore._pending) == 0
+    assert [doc is not None for doc in cc.documents(['W1', 'W3', 'W5'])] == [True, False, True]
+
+    reloaded = container_factory(local_path=saved_path)
+    reloaded.load()
+    assert reloaded.size_of_corpus() == 4
+    assert [d.page_content for d, _ in reloaded.search('Rice whale', 4)] == [
+        d.page_content for d, _ in cc.search('Rice whale', 4)
+    ]
+
+
+def test_read_only_rejects_indexing(saved_path, container_factory):
+    cc = container_factory(local_path=saved_path, read_only=True)
+    cc.load()
+    with pytest.raises(RuntimeError):
+        cc.index(['The Earth revolves around the Sun.'])
@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+def test_search_batch_matches_single_search(corpus_container):
+    queries = ['How long does the Earth orbit take?', 'Rice whale population']
+
+    batched = corpus_container.search_batch(queries, maximum_nearest_neighbors=3)
+
+    assert len(batched) == len(queries)
+    for query, results in zip(queries, batched):
+        single = corpus_container.search(query, 3)
+        assert [d.page_content for d, _ in results] == [d.page_content for d, _ in single]
+        assert [s for _, s in results] == pytest.approx([s for _, s in single])
+
+
+def test_search_batch_embeds_once(corpus_container, embeddings):
+    corpus_container.search_batch(['a', 'b', 'c'], maximum_nearest_neighbors=2)
+    assert embeddings.calls == 1
+    assert embeddings.embedded_texts == 3
+
+
+def test_search_batch_empty(corpus_container):
+    assert corpus_container.search_batch([]) == []
+
+
+def test_similarity_search_batch_endpoint(corpus_container, monkeypatch):
+    import vector_store_faissdb
+
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    client = TestClient(vector_store_faissdb.app)
+
+    res = client.post('/similarity_search/batch', json={
+        'queries': ['Earth orbit', 'Rice whale'],
+        'maximum_nearest_neighbors': 2,
+    })
+
+    assert res.status_code == 200
+    body = res.json()
+    assert len(body) == 2
+    assert all(len(results) == 2 for results in body)
+    assert 'W5' in body[1][0]['content']
+
+
+def test_bibliographic_metadata_is_returned_with_results(corpus_container, monkeypatch):
+    import pandas as pd
+    import vector_store_faissdb
+
+    corpus_container.chain = lambda _: pd.DataFrame([{
+        'openalex_id': 'https://openalex.org/W42',
+        'title': 'Comet orbits',
+        'abstract': 'Comets orbit the Sun on long elliptical paths.',
+        'publication_year': 2019,
+        'doi': None,
+        'oa_location': 'https://arxiv.org/pdf/42',
+    }])
+    corpus_container.index(['comets'])
+
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: corpus_container)
+    res = TestClient(vector_store_faissdb.app).get(
+        '/similarity_search', params={'query': 'Comets elliptical', 'maximum_nearest_neighbors': 1},
+    )
+
+    assert res.json()[0]['metadata'] == {
+        'OPENALEX_ID': 'https://openalex.org/W42',
+        'TITLE': 'Comet orbits',
+        'PUBLICATION_YEAR': '2019',
+        'DOI': '',
+        'OA_LOCATION': 'https://arxiv.org/pdf/42',
+    }
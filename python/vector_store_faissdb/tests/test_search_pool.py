@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+
+import pytest
+from langchain.chat_models import ChatOpenAI
+from langchain.docstore.document import Document
+from tests.conftest import BagOfWordsEmbeddings
+from vector_store_faissdb import _pooled_search, snapshots
+from vector_store_faissdb.search_pool import SearchPool
+
+WHALES = Document(page_content='ID: W6 TITLE: Whales. ABSTRACT: Blue whales are the largest animals.', metadata={})
+
+
+def _container(local_path, read_only):
+    from vector_store_faissdb import CorpusContainer
+
+    cc = CorpusContainer('test', ChatOpenAI(openai_api_key='test', client=None), local_path=local_path,
+                         read_only=read_only)
+    cc._emb = BagOfWordsEmbeddings()
+    return cc
+
+
+# module-level, the pool pickles it by reference
+def open_read_only(local_path, version):
+    cc = _container(local_path, read_only=True)
+    cc.version = version
+    cc.load()
+    return cc
+
+
+# module-level, runs in a worker process
+def mapped_files(cc):
+    return Path('/proc/self/maps').read_text()
+
+
+def _ids(encoded):
+    return [r['id'] for r in json.loads(encoded.body)]
+
+
+@pytest.fixture
+def snapshot_root(tmp_path, docs):
+    writer = _container(tmp_path / 'store', read_only=False)
+    writer._add_docs_to_db(docs, save_to_disk=True)
+    snapshots.publish(tmp_path / 'root', tmp_path / 'store', version='v1')
+    writer._add_docs_to_db([WHALES], save_to_disk=True)
+    writer.checkpoint()
+    return tmp_path
+
+
+def test_workers_search_and_follow_swaps(snapshot_root):
+    root = snapshot_root / 'root'
+    front_end = open_read_only(*snapshots.live_path(root))
+    pool = SearchPool(2, open_read_only, front_end.local_path, front_end.version)
+    try:
+        args = ('whales', 2, {'mode': 'lexical'}, ('id',), None, None)
+        results = [pool.submit(_pooled_search, front_end, *args) for _ in range(4)]
+        assert [_ids(r.result()) for r in results] == [['W5']] * 4
+
+        manifest = snapshots.publish(root, snapshot_root / 'store', version='v2')
+        front_end.load_snapshot(manifest.resolve(root), manifest.version)
+        results = [pool.submit(_pooled_search, front_end, *args) for _ in range(4)]
+        assert [sorted(_ids(r.result())) for r in results] == [['W5', 'W6']] * 4
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.skipif(not Path('/proc/self/maps').exists(), reason='needs procfs')
+def test_workers_map_the_index_files(snapshot_root):
+    front_end = open_read_only(*snapshots.live_path(snapshot_root / 'root'))
+    pool = SearchPool(1, open_read_only, front_end.local_path, front_end.version)
+    try:
+        mapped = pool.submit(mapped_files, front_end).result()
+    finally:
+        pool.shutdown()
+
+    # shared through the page cache instead of copied to the heap of every worker
+    for name in ('index.faiss', 'docstore.data', 'lexical_rows.npy'):
+        assert str(front_end.local_path / name) in mapped
@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+from langchain.docstore.document import Document
+from vector_store_faissdb import snapshots
+
+
+@pytest.fixture
+def writer(tmp_path, container_factory, docs):
+    cc = container_factory(local_path=tmp_path / 'writer')
+    cc._add_docs_to_db(docs, save_to_disk=True)
+    return cc
+
+
+def test_publish_and_prune(tmp_path, writer):
+    root = tmp_path / 'root'
+    assert snapshots.live_path(root) == (root, None)
+
+    versions = [snapshots.publish(root, writer.local_path, version=f'v{i}', keep=2).version for i in range(3)]
+
+    path, version = snapshots.live_path(root)
+    assert (version, path) == ('v2', root / 'snapshots' / 'v2')
+    assert (path / 'index.faiss').exists()
+    assert sorted(p.name for p in (root / 'snapshots').iterdir()) == versions[1:]
+    with pytest.raises(FileExistsError):
+        snapshots.publish(root, writer.local_path, version='v2')
+
+
+def test_watcher_swaps_new_snapshot(tmp_path, writer, container_factory):
+    root = tmp_path / 'root'
+    first = snapshots.publish(root, writer.local_path)
+    replica = container_factory(local_path=first.resolve(root), read_only=True)
+    replica.version = first.version
+    replica.load()
+
+    def swap(manifest):
+        replica.load_snapshot(manifest.resolve(root), manifest.version)
+
+    watcher = snapshots.SnapshotWatcher(root, lambda: replica.version, swap)
+    assert not watcher.check()
+
+    writer.add_documents([Document(page_content='ID: W6 TITLE: Moons. ABSTRACT: The Moon orbits the Earth.')],
+                         save_to_disk=True)
+    writer.checkpoint()
+    second = snapshots.publish(root, writer.local_path)
+
+    assert watcher.check()
+    assert replica.version == second.version
+    assert replica.size_of_corpus() == 6
+    assert replica.search('Moon orbits', 1)[0][0].page_content.startswith('ID: W6')
+
+    # a broken snapshot keeps the live one and is not retried
+    broken = snapshots.publish(root, writer.local_path)
+    (broken.resolve(root) / 'index.faiss').write_bytes(b'')
+    assert not watcher.check()
+    assert replica.version == second.version
+    assert watcher._failed_version == broken.version
+
+
+def test_version_endpoint(tmp_path, writer, container_factory, monkeypatch):
+    import vector_store_faissdb
+
+    root = tmp_path / 'root'
+    manifest = snapshots.publish(root, writer.local_path)
+    replica = container_factory(local_path=manifest.resolve(root), read_only=True)
+    replica.version = manifest.version
+    monkeypatch.setattr(vector_store_faissdb, 'corpus_container', lambda: replica)
+
+    res = TestClient(vector_store_faissdb.app).get('/version')
+
+    assert res.json() == {'version': manifest.version, 'path': str(manifest.resolve(root))}
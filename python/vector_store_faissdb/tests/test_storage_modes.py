@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from vector_store_faissdb.exact_vectors import ExactVectors
+
+
+@pytest.mark.parametrize('index_factory', ['SQfp16', 'SQ8'])
+def test_reranked_compressed_index_matches_flat(tmp_path, container_factory, docs, index_factory):
+    flat = container_factory()
+    flat._add_docs_to_db(docs, save_to_disk=False)
+    path = tmp_path / 'store'
+    container_factory(local_path=path, index_factory=index_factory, rerank=True)._add_docs_to_db(
+        docs, save_to_disk=True,
+    )
+
+    compressed = container_factory(local_path=path, read_only=True, rerank=True)
+    compressed.load()
+
+    assert compressed._can_rerank()
+    query = 'How long does the Earth orbit take?'
+    expected = flat.search(query, 3)
+    actual = compressed.search(query, 3)
+    assert [d.page_content for d, _ in actual] == [d.page_content for d, _ in expected]
+    assert [s for _, s in actual] == pytest.approx([s for _, s in expected], abs=1e-5)
+    assert compressed.memory_footprint()['index_bytes'] < flat.memory_footprint()['index_bytes']
+
+
+def test_rerank_is_disabled_without_exact_vectors(tmp_path, container_factory, docs):
+    path = tmp_path / 'store'
+    container_factory(local_path=path, index_factory='SQ8')._add_docs_to_db(docs, save_to_disk=True)
+
+    cc = container_factory(local_path=path, rerank=True)
+    cc.load()
+
+    assert not cc._can_rerank()
+    assert len(cc.search('Earth orbit', 2)) == 2
+
+
+def test_exact_vectors_flush_appends(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((6, 4)).astype(np.float32)
+    exact = ExactVectors(4)
+    exact.append(vectors[:4])
+    exact.flush(tmp_path)
+    exact.append(vectors[4:])
+
+    assert len(exact) == 6
+    np.testing.assert_array_equal(exact.rows(np.array([5, 0, 3])), vectors[[5, 0, 3]])
+
+    exact.flush(tmp_path)
+    np.testing.assert_array_equal(ExactVectors(4, tmp_path).rows(np.arange(6)), vectors)
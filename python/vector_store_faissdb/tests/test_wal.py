@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+import pytest
+from vector_store_faissdb import wal
+from vector_store_faissdb.wal import COMMITTED_DIR_NAME, FILE_NAME, STAGING_DIR_NAME
+
+
+def _contents(cc, query='Earth orbit', k=10):
+    return sorted(d.page_content for d, _ in cc.search(query, k))
+
+
+def test_saves_append_to_the_log_and_replay_on_load(tmp_path, container_factory, docs):
+    path = tmp_path / 'store'
+    writer = container_factory(local_path=path)
+    writer._add_docs_to_db(docs[:2], save_to_disk=True)
+    checkpointed = (path / 'index.faiss').stat().st_mtime_ns
+
+    writer._add_docs_to_db(docs[2:4], save_to_disk=True)
+    writer._add_docs_to_db(docs[4:], save_to_disk=True)
+    assert (path / 'index.faiss').stat().st_mtime_ns == checkpointed
+    assert (path / FILE_NAME).stat().st_size > 0
+
+    # a crash here loses nothing, the reloaded container replays the log
+    restarted = container_factory(local_path=path)
+    restarted.load()
+    assert restarted.size_of_corpus() == len(docs)
+    assert _contents(restarted) == _contents(writer)
+
+
+def test_checkpoint_compacts_the_log(tmp_path, container_factory, docs):
+    path = tmp_path / 'store'
+    writer = container_factory(local_path=path, checkpoint_every=3)
+    writer._add_docs_to_db(docs[:2], save_to_disk=True)
+    writer._add_docs_to_db(docs[2:3], save_to_disk=True)
+    assert (path / FILE_NAME).stat().st_size > 0
+    # the log would reach `checkpoint_every` documents
+    writer._add_docs_to_db(docs[3:], save_to_disk=True)
+    assert (path / FILE_NAME).stat().st_size == 0
+
+    read_only = container_factory(local_path=path, read_only=True)
+    read_only.load()
+    assert read_only.size_of_corpus() == len(docs)
+
+
+def test_replay_skips_checkpointed_records_and_torn_tail(tmp_path, container_factory, docs):
+    path = tmp_path / 'store'
+    writer = container_factory(local_path=path)
+    writer._add_docs_to_db(docs[:2], save_to_disk=True)
+    writer._add_docs_to_db(docs[2:4], save_to_disk=True)
+    logged = (path / FILE_NAME).read_bytes()
+    # crash after the checkpoint was written but before the log was reset, with a torn append at the end
+    writer.checkpoint()
+    writer._add_docs_to_db(docs[4:], save_to_disk=True)
+    (path / FILE_NAME).write_bytes(logged + (path / FILE_NAME).read_bytes()[:-10])
+
+    restarted = container_factory(local_path=path)
+    restarted.load()
+    assert restarted.size_of_corpus() == 4
+    assert (path / FILE_NAME).stat().st_size == len(logged)
+
+
+def _crash(*args):
+    raise KeyboardInterrupt('crashed')
+
+
+def test_crash_before_the_checkpoint_is_committed(tmp_path, container_factory, docs, embeddings, monkeypatch):
+    path = tmp_path / 'store'
+    writer = container_factory(local_path=path, rerank=True)
+    writer._add_docs_to_db(docs[:2], save_to_disk=True)
+    writer._add_docs_to_db(docs[2:4], save_to_disk=True)
+    monkeypatch.setattr(wal, 'commit', _crash)
+    with pytest.raises(KeyboardInterrupt):
+        writer.checkpoint()
+    monkeypatch.undo()
+    # and a torn append to the exact vectors, they are flushed in place
+    with open(path / 'vectors.f32', 'ab') as f:
+        f.write(b'torn')
+
+    # the previous checkpoint is untouched, the log still holds what the crashed one would have saved
+    restarted = container_factory(local_path=path, rerank=True)
+    restarted.load()
+    assert restarted.size_of_corpus() == 4
+    assert restarted._can_rerank()
+    vectors = embeddings.embed_documents([d.page_content for d in docs[:4]])
+    assert np.allclose(restarted._exact.rows(np.arange(4)), vectors)
+    assert not (path / STAGING_DIR_NAME).exists()
+
+
+def test_crash_while_moving_a_committed_checkpoint_in_place(tmp_path, container_factory, docs, monkeypatch):
+    path = tmp_path / 'store'
+    writer = container_factory(local_path=path)
+    writer._add_docs_to_db(docs[:2], save_to_disk=True)
+    writer._add_docs_to_db(docs[2:4], save_to_disk=True)
+    writer.delete(['W1'], save_to_disk=True)
+
+    def move_index_and_crash(store):
+        os.replace(store / COMMITTED_DIR_NAME / 'index.faiss', store / 'index.faiss')
+        _crash()
+
+    monkeypatch.setattr(wal, 'recover', move_index_and_crash)
+    with pytest.raises(KeyboardInterrupt):
+        writer.checkpoint()
+    monkeypatch.undo()
+    assert (path / FILE_NAME).stat().st_size > 0
+
+    restarted = container_factory(local_path=path)
+    restarted.load()
+    assert not (path / COMMITTED_DIR_NAME).exists()
+    assert restarted.size_of_corpus() == 3
+    assert restarted.documents(['W1']) == [None]
+    assert _contents(restarted) == _contents(writer)
@@ -1,15 +1,90 @@
+import asyncio
+import contextlib
 import os
+import threading
 import typing
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from langchain.chat_models import ChatOpenAI
 from loguru import logger
 from pydantic import BaseModel
+from vector_store_faissdb import metrics, snapshots
+from vector_store_faissdb.admission import EXEMPT_PATHS, AdmissionController, Overloaded
+from vector_store_faissdb.batching import SearchBatcher
+from vector_store_faissdb.coalescing import QueryCoalescer
+from vector_store_faissdb.collection_cache import CollectionCache, UnknownCollection
+from vector_store_faissdb.concurrency import run_blocking
 from vector_store_faissdb.corpus_container import CorpusContainer
+from vector_store_faissdb.encoding import Encoded, encode, encode_body, parse_fields
+from vector_store_faissdb.fetcher import SnapshotFetcher, source_for
+from vector_store_faissdb.id_map import work_id
+from vector_store_faissdb.indexes import FLAT_INDEX_FACTORY
+from vector_store_faissdb.ingestion import IngestionPipeline
+from vector_store_faissdb.lexical import FUSIONS, RRF, SEARCH_MODES, VECTOR
+from vector_store_faissdb.loader import LoadProgress, load_in_background
+from vector_store_faissdb.search_pool import SearchPool
 
-app = FastAPI()
 _corpus_container: CorpusContainer = None
+_corpus_container_lock = threading.Lock()
+_ingestion_pipeline: IngestionPipeline = None
+_ingestion_pipeline_lock = threading.Lock()
+_load_progress = LoadProgress()
+_loader: threading.Thread = None
+_loader_lock = threading.Lock()
+_snapshot_watcher: snapshots.SnapshotWatcher = None
+_snapshot_fetcher: SnapshotFetcher = None
+_search_batcher: SearchBatcher = None
+_query_coalescer: QueryCoalescer = None
+_admission_controller: AdmissionController = None
+_collection_cache: CollectionCache = None
+_collection_cache_lock = threading.Lock()
+_search_pool: SearchPool = None
+_search_pool_lock = threading.Lock()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_: FastAPI):
+    # loading in the background keeps deployments from waiting on the index, /ready tells when it is done
+    if os.environ.get('VECTOR_STORE_EAGER_LOAD', '1') == '1':
+        start_loading()
+    watcher = snapshot_watcher()
+    reporter = asyncio.ensure_future(_report_admission()) if admission_controller() and metrics.emf_enabled() else None
+    yield
+    if reporter:
+        reporter.cancel()
+    if watcher:
+        await run_blocking(watcher.stop)
+    if _search_pool:
+        await run_blocking(_search_pool.shutdown)
+    # drains queued ingestion and compacts the write-ahead log so the next start does not have to replay it
+    if _ingestion_pipeline:
+        await run_blocking(_ingestion_pipeline.stop)
+    metrics.mark_process_dead()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware('http')
+async def admit_requests(request: Request, call_next):
+    controller = admission_controller()
+    if controller is None or request.url.path in EXEMPT_PATHS:
+        return await call_next(request)
+    try:
+        async with controller.admit():
+            return await call_next(request)
+    except Overloaded as e:
+        return JSONResponse(status_code=e.status_code, content={'detail': e.detail}, headers=e.headers)
+
+
+# added last so it wraps admission control and also times the shed requests
+@app.middleware('http')
+async def track_requests(request: Request, call_next):
+    # labelled by route template so /index/{job_id} stays one series
+    with metrics.request(lambda: getattr(request.scope.get('route'), 'path', 'unmatched')):
+        return await call_next(request)
 
 
 class InitializationException(Exception):
@@ -20,27 +95,223 @@ def corpus_container() -> CorpusContainer:
     global _corpus_container
 
     store_path = Path(os.environ['CORPUS_DB_PATH'])
-    openai_api_key = os.environ['OPENAI_API_KEY']
+    # read-only containers mmap the index so all uvicorn workers share the same pages
+    read_only = os.environ.get('CORPUS_DB_READ_ONLY', '1') == '1'
 
-    if not _corpus_container:
+    if _corpus_container:
+        return _corpus_container
+
+    with _corpus_container_lock:
+        if _corpus_container:
+            return _corpus_container
 
         logger.info(f'Initializing corpus container with FaissDB at: {str(store_path)}')
         try:
-            # _llm = llm(os.environ['LLM_NAME'])
-            _llm = ChatOpenAI(openai_api_key=os.environ['OPENAI_API_KEY'], client=None, temperature=0.0, )
-            _corpus_container = CorpusContainer(
-                openai_api_key=openai_api_key,
-                llm=_llm,
-                local_path=store_path,
-            )
+            _load_progress.start()
+            fetcher = snapshot_fetcher()
+            if fetcher:
+                _load_progress.enter('fetch')
+                fetcher.fetch()
+            # replicas serve the snapshot the manifest points at, writers own the store directory itself
+            local_path, version = snapshots.live_path(store_path) if read_only else (store_path, None)
+            cc = new_corpus_container(local_path, read_only)
+            cc.version = version
+            if cc.is_saved:
+                cc.load(progress=_load_progress.enter)
+            _corpus_container = cc
+            _load_progress.succeed()
         except Exception as e:
+            _load_progress.fail(e)
             raise InitializationException(str(e))
 
     return _corpus_container
 
 
-# Eager load - we do not want this in production, deployment will be delayed or even stuck
-# corpus_container()
+def new_corpus_container(local_path: Path, read_only: bool) -> CorpusContainer:
+    # _llm = llm(os.environ['LLM_NAME'])
+    _llm = ChatOpenAI(openai_api_key=os.environ['OPENAI_API_KEY'], client=None, temperature=0.0, )
+    return CorpusContainer(
+        openai_api_key=os.environ['OPENAI_API_KEY'],
+        llm=_llm,
+        local_path=local_path,
+        read_only=read_only,
+        index_factory=os.environ.get('CORPUS_INDEX_FACTORY', FLAT_INDEX_FACTORY),
+        nprobe=int(os.environ.get('CORPUS_NPROBE', 0)) or None,
+        ef_search=int(os.environ.get('CORPUS_EF_SEARCH', 0)) or None,
+        rerank=os.environ.get('CORPUS_RERANK', '0') == '1',
+        rerank_factor=int(os.environ.get('CORPUS_RERANK_FACTOR', 4)),
+        checkpoint_every=int(os.environ.get('CORPUS_CHECKPOINT_EVERY', 10_000)),
+        # 0 indexes near-duplicate abstracts too
+        near_duplicate_threshold=float(os.environ.get('CORPUS_NEAR_DUPLICATE_THRESHOLD', 0.8)) or None,
+    )
+
+
+def collection_cache() -> CollectionCache:
+    """Named read-only corpora under CORPUS_COLLECTIONS_PATH, kept within CORPUS_COLLECTIONS_MEMORY_MB per task."""
+    global _collection_cache
+
+    if _collection_cache is None:
+        with _collection_cache_lock:
+            if _collection_cache is None:
+                _collection_cache = CollectionCache(
+                    Path(os.environ.get('CORPUS_COLLECTIONS_PATH', '/faissdb-collections')),
+                    load=_open_read_only,
+                    # every uvicorn worker keeps its own collections, each gets its share of the task's budget
+                    memory_budget_bytes=int(os.environ.get('CORPUS_COLLECTIONS_MEMORY_MB', 0)) * 2 ** 20
+                    // max(1, int(os.environ.get('WEB_CONCURRENCY', 1))),
+                )
+    return _collection_cache
+
+
+def _open_read_only(local_path: Path, version: typing.Optional[str]) -> CorpusContainer:
+    cc = new_corpus_container(local_path, read_only=True)
+    cc.version = version
+    cc.load()
+    return cc
+
+
+def ingestion_pipeline() -> IngestionPipeline:
+    global _ingestion_pipeline
+
+    if _ingestion_pipeline:
+        return _ingestion_pipeline
+
+    cc = corpus_container()
+    with _ingestion_pipeline_lock:
+        if not _ingestion_pipeline:
+            _ingestion_pipeline = IngestionPipeline(
+                cc,
+                search_workers=int(os.environ.get('INGESTION_SEARCH_WORKERS', 4)),
+                batch_size=int(os.environ.get('INGESTION_BATCH_SIZE', 256)),
+                batch_wait_sec=float(os.environ.get('INGESTION_BATCH_WAIT_SEC', 0.5)),
+                save_to_disk=os.environ.get('INGESTION_SAVE_TO_DISK', '1') == '1',
+            )
+    return _ingestion_pipeline
+
+
+def snapshot_fetcher() -> typing.Optional[SnapshotFetcher]:
+    """Copies snapshots from CORPUS_SNAPSHOT_SOURCE (s3://bucket/prefix or a directory) to CORPUS_DB_PATH."""
+    global _snapshot_fetcher
+
+    source = os.environ.get('CORPUS_SNAPSHOT_SOURCE')
+    if not source or os.environ.get('CORPUS_DB_READ_ONLY', '1') != '1':
+        return None
+
+    if _snapshot_fetcher is None:
+        _snapshot_fetcher = SnapshotFetcher(
+            source_for(source, endpoint_url=os.environ.get('CORPUS_SNAPSHOT_ENDPOINT_URL')),
+            Path(os.environ['CORPUS_DB_PATH']),
+            workers=int(os.environ.get('CORPUS_SNAPSHOT_FETCH_WORKERS', 16)),
+            part_bytes=int(os.environ.get('CORPUS_SNAPSHOT_PART_MB', 32)) * 2 ** 20,
+        )
+    return _snapshot_fetcher
+
+
+def snapshot_watcher() -> typing.Optional[snapshots.SnapshotWatcher]:
+    global _snapshot_watcher
+
+    poll_sec = float(os.environ.get('CORPUS_SNAPSHOT_POLL_SEC', 30))
+    if 'CORPUS_DB_PATH' not in os.environ or os.environ.get('CORPUS_DB_READ_ONLY', '1') != '1' or poll_sec <= 0:
+        return None
+
+    def swap(manifest: snapshots.Manifest):
+        # until the container is loaded there is nothing to swap, its initial load reads the manifest itself
+        if _corpus_container:
+            path = fetcher.fetch(manifest) if fetcher else manifest.resolve(store_path)
+            _corpus_container.load_snapshot(path, manifest.version)
+
+    store_path = Path(os.environ['CORPUS_DB_PATH'])
+    fetcher = snapshot_fetcher()
+    _snapshot_watcher = snapshots.SnapshotWatcher(
+        store_path,
+        current_version=lambda: _corpus_container.version if _corpus_container else None,
+        swap=swap,
+        interval_sec=poll_sec,
+        source=fetcher.source if fetcher else None,
+    )
+    _snapshot_watcher.start()
+    return _snapshot_watcher
+
+
+def search_batcher() -> typing.Optional[SearchBatcher]:
+    """Micro-batches concurrent /similarity_search calls when SEARCH_BATCH_WINDOW_MS is set."""
+    global _search_batcher
+
+    window_ms = float(os.environ.get('SEARCH_BATCH_WINDOW_MS', 0))
+    if window_ms <= 0:
+        return None
+    # only ever called from the event loop, no lock needed
+    if _search_batcher is None:
+        _search_batcher = SearchBatcher(
+            window_ms=window_ms,
+            max_batch_size=int(os.environ.get('SEARCH_BATCH_MAX_SIZE', 32)),
+        )
+    return _search_batcher
+
+
+def search_pool(cc: CorpusContainer) -> typing.Optional[SearchPool]:
+    """Runs searches of the read-only corpus in SEARCH_PROCESSES worker processes when set."""
+    global _search_pool
+
+    processes = int(os.environ.get('SEARCH_PROCESSES', 0))
+    if processes <= 0 or not cc.read_only or not cc.is_saved:
+        return None
+    if _search_pool is None:
+        with _search_pool_lock:
+            if _search_pool is None:
+                _search_pool = SearchPool(processes, _open_read_only, cc.local_path, cc.version)
+    return _search_pool
+
+
+def query_coalescer() -> QueryCoalescer:
+    """Shares searches between identical concurrent requests, and their results for SEARCH_CACHE_TTL_SEC if set."""
+    global _query_coalescer
+
+    # only ever called from the event loop, no lock needed
+    if _query_coalescer is None:
+        _query_coalescer = QueryCoalescer(
+            ttl_sec=float(os.environ.get('SEARCH_CACHE_TTL_SEC', 0)),
+            max_entries=int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', 1_024)),
+        )
+    return _query_coalescer
+
+
+def admission_controller() -> typing.Optional[AdmissionController]:
+    """Limits each uvicorn worker to ADMISSION_MAX_IN_FLIGHT requests when set, see `admission`."""
+    global _admission_controller
+
+    max_in_flight = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 0))
+    if max_in_flight <= 0:
+        return None
+    # only ever called from the event loop, no lock needed
+    if _admission_controller is None:
+        _admission_controller = AdmissionController(
+            max_in_flight,
+            max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', max_in_flight)),
+            queue_timeout_sec=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_MS', 1_000)) / 1_000,
+            retry_after_sec=float(os.environ.get('ADMISSION_RETRY_AFTER_SEC', 1)),
+        )
+    return _admission_controller
+
+
+async def _report_admission():
+    # queue depth reacts to bursts within seconds, CPU utilization only once tasks are already saturated
+    interval_sec = float(os.environ.get('ADMISSION_REPORT_SEC', 10))
+    while True:
+        controller = admission_controller()
+        metrics.write_admission_emf(controller.queued, controller.in_flight)
+        await asyncio.sleep(interval_sec)
+
+
+def start_loading():
+    global _loader
+
+    with _loader_lock:
+        if _load_progress.ready or (_loader and _loader.is_alive()):
+            return
+        # looked up on every call so tests can replace the container
+        _loader = load_in_background(lambda: corpus_container())
+
 
 class Status(BaseModel):
     status_code: int
@@ -48,38 +319,187 @@ class Status(BaseModel):
 
 
 class CorpusSize(BaseModel):
+    # searchable works, rows of replaced and deleted works are only counted in `vectors` until they are compacted
     size: int
+    vectors: int = 0
+    index_bytes: int = 0
+    bytes_per_vector: float = 0.0
 
 
 class SearchResult(BaseModel):
-    content: str
-    metadata: typing.Dict[str, str]
-    score: float
+    # `fields=` projections drop the fields that were not asked for
+    id: typing.Optional[str] = None
+    content: typing.Optional[str] = None
+    metadata: typing.Optional[typing.Dict[str, str]] = None
+    score: typing.Optional[float] = None
+
+
+class BatchSearchRequest(BaseModel):
+    queries: typing.List[str]
+    fields: typing.Optional[str] = None
+    maximum_nearest_neighbors: int = 20
+    nprobe: typing.Optional[int] = None
+    ef_search: typing.Optional[int] = None
+    year_min: typing.Optional[int] = None
+    year_max: typing.Optional[int] = None
+    is_oa: typing.Optional[bool] = None
+    mode: str = VECTOR
+    fusion: str = RRF
+    vector_weight: float = 0.5
+    mmr_lambda: typing.Optional[float] = None
+
+
+class SnapshotVersion(BaseModel):
+    version: typing.Optional[str] = None
+    path: typing.Optional[str] = None
+
+
+class IngestionJobStatus(BaseModel):
+    job_id: str
+    state: str
+    texts: int
+    texts_processed: int
+    documents_found: int
+    documents_indexed: int
+    documents_skipped: int = 0
+    documents_per_sec: float
+    errors: typing.List[str]
+    created_at: float
+    started_at: typing.Optional[float] = None
+    finished_at: typing.Optional[float] = None
+    # documents of all jobs waiting to be embedded and indexed
+    queue_depth: int = 0
 
 
 status = Status(status_code=200, detail='ok')
 
 
+def _check_search_mode(mode: str, fusion: str, mmr_lambda: typing.Optional[float] = None):
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=422, detail=f'Unknown search mode {mode}, expected one of {SEARCH_MODES}')
+    if fusion not in FUSIONS:
+        raise HTTPException(status_code=422, detail=f'Unknown fusion {fusion}, expected one of {FUSIONS}')
+    if mmr_lambda is not None and not 0 <= mmr_lambda <= 1:
+        raise HTTPException(status_code=422, detail=f'mmr_lambda must be between 0 and 1, got {mmr_lambda}')
+
+
+def _search_result(doc, score: typing.Optional[float], fields: typing.Tuple[str, ...]) -> dict:
+    result = SearchResult(id=work_id(doc), content=doc.page_content, metadata=doc.metadata, score=score)
+    return result.dict(include=set(fields))
+
+
 @app.get("/health")
 async def health():
+    """Liveness: answers while the index is still loading, see /ready."""
     global status
     if status.status_code == 200:
         return status
     raise HTTPException(**status.dict())
 
 
-@app.post("/index")
+@app.get("/ready")
+async def ready():
+    """Readiness: 503 with the loading progress until the corpus container can serve searches."""
+    if _corpus_container:
+        return _load_progress.as_dict()
+    # a failed load, or one that never started, is retried so a transient error does not keep the task out
+    start_loading()
+    raise HTTPException(status_code=503, detail=_load_progress.as_dict())
+
+
+@app.get("/version")
+async def version():
+    """The snapshot being served, null for stores that are not versioned."""
+    global status
+    try:
+        cc = await run_blocking(corpus_container)
+        return SnapshotVersion(version=cc.version, path=str(cc.local_path) if cc.local_path else None)
+    except InitializationException as e:
+        logger.exception('Unable to initialize corpus container')
+        status = Status(status_code=500, detail=str(e))
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # corpus gauges are sampled on scrape, before the container is loaded they stay at zero
+    if _corpus_container:
+        cc = _corpus_container
+        footprint = await run_blocking(cc.memory_footprint)
+        metrics.update_corpus(footprint, cc.size_of_corpus(), cc.emb.stats.as_dict())
+    content, media_type = await run_blocking(metrics.exposition)
+    return Response(content=content, media_type=media_type)
+
+
+@app.get("/embedding_cache")
+async def embedding_cache():
+    try:
+        cc = await run_blocking(corpus_container)
+        return cc.emb.stats.as_dict()
+    except Exception as e:
+        logger.exception('Unable to read embedding cache stats')
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/index", status_code=202, response_model=IngestionJobStatus)
 async def index(texts: typing.List[str]):
-    # TODO: maybe expose indexing through API as well
-    pass
+    global status
+    try:
+        cc = await run_blocking(corpus_container)
+        if cc.read_only:
+            raise HTTPException(status_code=409, detail='Corpus container is opened in read-only mode')
+        pipeline = await run_blocking(ingestion_pipeline)
+        job = pipeline.submit(texts)
+        logger.info(f'Queued ingestion job {job.id} with {len(texts)} texts')
+        return IngestionJobStatus(**job.as_dict(), queue_depth=pipeline.queue_depth())
+    except HTTPException:
+        raise
+    except InitializationException as e:
+        logger.exception('Unable to initialize corpus container')
+        status = Status(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.exception('Unable to queue ingestion job')
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/index/delete")
+async def delete(work_ids: typing.List[str]):
+    global status
+    try:
+        cc = await run_blocking(corpus_container)
+        if cc.read_only:
+            raise HTTPException(status_code=409, detail='Corpus container is opened in read-only mode')
+        deleted = await run_blocking(cc.delete, work_ids, save_to_disk=True)
+        return {'deleted': deleted}
+    except HTTPException:
+        raise
+    except InitializationException as e:
+        logger.exception('Unable to initialize corpus container')
+        status = Status(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.exception('Unable to delete works from corpus container')
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/index/{job_id}", response_model=IngestionJobStatus)
+async def index_job(job_id: str):
+    job = _ingestion_pipeline.get(job_id) if _ingestion_pipeline else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f'Unknown ingestion job: {job_id}')
+    return IngestionJobStatus(**job.as_dict(), queue_depth=_ingestion_pipeline.queue_depth())
 
 
 @app.get("/size")
 async def size():
     global status
     try:
-        cc = corpus_container()
-        return CorpusSize(size=cc.size_of_corpus())
+        cc = await run_blocking(corpus_container)
+        footprint = await run_blocking(cc.memory_footprint)
+        return CorpusSize(
+            size=await run_blocking(cc.size_of_corpus),
+            vectors=footprint['vectors'],
+            index_bytes=footprint['index_bytes'],
+            bytes_per_vector=footprint['bytes_per_vector'],
+        )
     except InitializationException as e:
         logger.exception('Unable to initialize corpus container')
         status = Status(status_code=500, detail=str(e))
@@ -89,16 +509,167 @@ async def size():
 
 
 @app.get("/similarity_search")
-async def similarity_search(query: str, maximum_nearest_neighbors: int = 20):
+async def similarity_search(query: str, maximum_nearest_neighbors: int = 20, nprobe: typing.Optional[int] = None,
+                            ef_search: typing.Optional[int] = None, year_min: typing.Optional[int] = None,
+                            year_max: typing.Optional[int] = None, is_oa: typing.Optional[bool] = None,
+                            mode: str = VECTOR, fusion: str = RRF, vector_weight: float = 0.5,
+                            mmr_lambda: typing.Optional[float] = None, fields: typing.Optional[str] = None,
+                            accept: typing.Optional[str] = Header(None),
+                            accept_encoding: typing.Optional[str] = Header(None)):
+    """`mode=hybrid` fuses vector and BM25 ranks, `fusion` is `rrf` or `weighted` (by `vector_weight`).
+
+    `mmr_lambda` diversifies the results by maximal marginal relevance, 1 ranks by relevance only.
+    """
+    global status
+    _check_search_mode(mode, fusion, mmr_lambda)
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        cc = await run_blocking(corpus_container)
+        params = dict(nprobe=nprobe, ef_search=ef_search, year_min=year_min, year_max=year_max, is_oa=is_oa,
+                      mode=mode, fusion=fusion, vector_weight=vector_weight, mmr_lambda=mmr_lambda)
+        pool = search_pool(cc)
+        if pool:
+            encoded = await query_coalescer().search(
+                cc, query, maximum_nearest_neighbors, params,
+                lambda: pool.run(_pooled_search, cc, query, maximum_nearest_neighbors, params, projection, accept,
+                                 accept_encoding),
+                # workers return encoded bodies, only requests asking for the same encoding can share them
+                variant=(projection, accept, accept_encoding),
+            )
+            return encoded.response()
+        return await _similarity_search(cc, query, maximum_nearest_neighbors, params, projection, accept,
+                                        accept_encoding)
+    except InitializationException as e:
+        logger.exception('Unable to initialize corpus container')
+        status = Status(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.exception('Unable to query through corpus container')
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/collections")
+async def list_collections():
+    cache = collection_cache()
+    loaded = cache.loaded()
+    names = await run_blocking(cache.names)
+    return [{'name': name, 'loaded': name in loaded, 'resident_bytes': loaded.get(name, 0)} for name in names]
+
+
+@app.get("/collections/{name}/similarity_search")
+async def collection_similarity_search(name: str, query: str, maximum_nearest_neighbors: int = 20,
+                                       nprobe: typing.Optional[int] = None, ef_search: typing.Optional[int] = None,
+                                       year_min: typing.Optional[int] = None, year_max: typing.Optional[int] = None,
+                                       is_oa: typing.Optional[bool] = None, mode: str = VECTOR, fusion: str = RRF,
+                                       vector_weight: float = 0.5, mmr_lambda: typing.Optional[float] = None,
+                                       fields: typing.Optional[str] = None,
+                                       accept: typing.Optional[str] = Header(None),
+                                       accept_encoding: typing.Optional[str] = Header(None)):
+    """Same as /similarity_search over the collection `name`, loaded on first use."""
+    _check_search_mode(mode, fusion, mmr_lambda)
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        cc = await run_blocking(collection_cache().get, name)
+    except UnknownCollection:
+        raise HTTPException(status_code=404, detail=f'Unknown collection {name}')
+    except Exception as e:
+        # one broken collection leaves the service and the other collections healthy
+        logger.exception(f'Unable to load collection {name}')
+        raise HTTPException(status_code=500, detail=str(e))
+    try:
+        params = dict(nprobe=nprobe, ef_search=ef_search, year_min=year_min, year_max=year_max, is_oa=is_oa,
+                      mode=mode, fusion=fusion, vector_weight=vector_weight, mmr_lambda=mmr_lambda)
+        return await _similarity_search(cc, query, maximum_nearest_neighbors, params, projection, accept,
+                                        accept_encoding)
+    except Exception as e:
+        logger.exception(f'Unable to query collection {name}')
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _similarity_search(cc: CorpusContainer, query: str, k: int, params: dict,
+                             projection: typing.Tuple[str, ...], accept: typing.Optional[str],
+                             accept_encoding: typing.Optional[str]):
+    logger.debug(f'Querying for: {query}')
+
+    async def search():
+        batcher = search_batcher()
+        if batcher:
+            return await batcher.search(cc, query, k, **params)
+        return await run_blocking(cc.search, query, k, **params)
+
+    context = await query_coalescer().search(cc, query, k, params, search)
+    results = [_search_result(doc, score, projection) for doc, score in context]
+    return await run_blocking(encode, results, accept, accept_encoding)
+
+
+def _pooled_search(cc: CorpusContainer, query: str, k: int, params: dict, projection: typing.Tuple[str, ...],
+                   accept: typing.Optional[str], accept_encoding: typing.Optional[str]) -> Encoded:
+    # runs in a search worker process, only the encoded body travels back to the front end
+    results = [_search_result(doc, score, projection) for doc, score in cc.search(query, k, **params)]
+    return encode_body(results, accept, accept_encoding)
+
+
+def _pooled_search_batch(cc: CorpusContainer, queries: typing.List[str], k: int, params: dict,
+                         projection: typing.Tuple[str, ...], accept: typing.Optional[str],
+                         accept_encoding: typing.Optional[str]) -> Encoded:
+    contexts = cc.search_batch(queries, k, **params)
+    results = [[_search_result(doc, score, projection) for doc, score in context] for context in contexts]
+    return encode_body(results, accept, accept_encoding)
+
+
+@app.post("/similarity_search/batch")
+async def similarity_search_batch(request: BatchSearchRequest, accept: typing.Optional[str] = Header(None),
+                                  accept_encoding: typing.Optional[str] = Header(None)):
     global status
+    _check_search_mode(request.mode, request.fusion, request.mmr_lambda)
+    try:
+        projection = parse_fields(request.fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     try:
-        cc = corpus_container()
-        logger.debug(f'Querying for: {query}')
-        context = cc.search(query, min(maximum_nearest_neighbors, cc.size_of_corpus()))
-        return [SearchResult(content=c[0].page_content, metadata=c[0].metadata, score=c[1]) for c in context]
+        cc = await run_blocking(corpus_container)
+        logger.debug(f'Querying for a batch of {len(request.queries)} queries')
+        params = dict(nprobe=request.nprobe, ef_search=request.ef_search, year_min=request.year_min,
+                      year_max=request.year_max, is_oa=request.is_oa, mode=request.mode, fusion=request.fusion,
+                      vector_weight=request.vector_weight, mmr_lambda=request.mmr_lambda)
+        pool = search_pool(cc)
+        if pool:
+            encoded = await pool.run(_pooled_search_batch, cc, request.queries, request.maximum_nearest_neighbors,
+                                     params, projection, accept, accept_encoding)
+            return encoded.response()
+        contexts = await run_blocking(cc.search_batch, request.queries, request.maximum_nearest_neighbors, **params)
+        results = [[_search_result(doc, score, projection) for doc, score in context] for context in contexts]
+        return await run_blocking(encode, results, accept, accept_encoding)
     except InitializationException as e:
         logger.exception('Unable to initialize corpus container')
         status = Status(status_code=500, detail=str(e))
     except Exception as e:
         logger.exception('Unable to query through corpus container')
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/documents")
+async def documents(work_ids: typing.List[str], fields: typing.Optional[str] = None,
+                    accept: typing.Optional[str] = Header(None), accept_encoding: typing.Optional[str] = Header(None)):
+    """Full documents for works found through a projected search, null for works that are not indexed."""
+    global status
+    try:
+        projection = tuple(f for f in parse_fields(fields) if f != 'score')
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        cc = await run_blocking(corpus_container)
+        docs = await run_blocking(cc.documents, work_ids)
+        results = [None if doc is None else _search_result(doc, None, projection) for doc in docs]
+        return await run_blocking(encode, results, accept, accept_encoding)
+    except InitializationException as e:
+        logger.exception('Unable to initialize corpus container')
+        status = Status(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.exception('Unable to read documents from corpus container')
+        raise HTTPException(status_code=500, detail=str(e))
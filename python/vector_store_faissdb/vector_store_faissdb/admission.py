@@ -0,0 +1,93 @@
+import asyncio
+import collections
+import contextlib
+import math
+import typing
+
+from vector_store_faissdb import metrics
+
+QUEUE_FULL = 'queue_full'
+QUEUE_TIMEOUT = 'queue_timeout'
+# probes and scrapes must get through an overloaded worker
+EXEMPT_PATHS = ('/health', '/ready', '/metrics')
+
+
+class Overloaded(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after_sec: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after_sec = retry_after_sec
+
+    @property
+    def headers(self) -> typing.Dict[str, str]:
+        return {'Retry-After': str(max(1, math.ceil(self.retry_after_sec)))}
+
+
+class AdmissionController:
+    """Serves up to `max_in_flight` requests at a time, queues up to `max_queue` more for `queue_timeout_sec`.
+
+    Requests beyond the queue are shed right away with 429, queued requests that do not get a slot in time with 503,
+    both with a Retry-After. Slots go to queued requests first come, first served.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int = 0, queue_timeout_sec: float = 1.0,
+                 retry_after_sec: float = 1.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout_sec = queue_timeout_sec
+        self.retry_after_sec = retry_after_sec
+        # only touched from the event loop, no locks needed
+        self._admitted = 0
+        self._waiters: typing.Deque[asyncio.Future] = collections.deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._admitted
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @contextlib.asynccontextmanager
+    async def admit(self):
+        await self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self):
+        if self._admitted < self.max_in_flight and not self._waiters:
+            self._admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            metrics.SHED_REQUESTS.labels(QUEUE_FULL).inc()
+            raise Overloaded(429, 'Too many requests, retry later', self.retry_after_sec)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        metrics.QUEUED.inc()
+        try:
+            # a released slot is handed over to the waiter, `_admitted` already counts it
+            await asyncio.wait_for(waiter, self.queue_timeout_sec)
+        except asyncio.TimeoutError:
+            metrics.SHED_REQUESTS.labels(QUEUE_TIMEOUT).inc()
+            raise Overloaded(503, 'Service overloaded, retry later', self.retry_after_sec)
+        except asyncio.CancelledError:
+            # the client went away right after it was handed a slot, pass the slot on
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+        finally:
+            metrics.QUEUED.dec()
+            with contextlib.suppress(ValueError):
+                self._waiters.remove(waiter)
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._admitted -= 1
@@ -0,0 +1,65 @@
+import asyncio
+import typing
+
+from vector_store_faissdb import metrics
+from vector_store_faissdb.concurrency import run_blocking
+
+
+class _Batch:
+    def __init__(self):
+        self.queries: typing.List[str] = []
+        self.ks: typing.List[int] = []
+        self.futures: typing.List[asyncio.Future] = []
+        self.timer: typing.Optional[asyncio.TimerHandle] = None
+
+
+class SearchBatcher:
+    """Collects concurrent searches for up to `window_ms` or `max_batch_size` queries and runs them as one batch.
+
+    Searches are only batched with others that use the same container and search parameters, the batch searches for
+    the largest `k` asked for and every caller gets its own top `k` back.
+    """
+
+    def __init__(self, window_ms: float = 5.0, max_batch_size: int = 32):
+        self.window_sec = window_ms / 1_000
+        self.max_batch_size = max_batch_size
+        self._pending: typing.Dict[tuple, _Batch] = {}
+
+    async def search(self, container, query: str, k: int, **params):
+        loop = asyncio.get_running_loop()
+        key = (id(container), tuple(sorted(params.items())))
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _Batch()
+            batch.timer = loop.call_later(self.window_sec, self._flush, key, batch, container, params)
+
+        future = loop.create_future()
+        batch.queries.append(query)
+        batch.ks.append(k)
+        batch.futures.append(future)
+        if len(batch.queries) >= self.max_batch_size:
+            self._flush(key, batch, container, params)
+        return await future
+
+    def _flush(self, key: tuple, batch: _Batch, container, params: dict):
+        # the timer of a batch that already went out on size must not flush its successor
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        batch.timer.cancel()
+        asyncio.ensure_future(self._run(batch, container, params))
+
+    @staticmethod
+    async def _run(batch: _Batch, container, params: dict):
+        metrics.SEARCH_BATCH_SIZE.observe(len(batch.queries))
+        try:
+            results = await run_blocking(container.search_batch, batch.queries, max(batch.ks), **params)
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, k, result in zip(batch.futures, batch.ks, results):
+            # callers that went away cancelled their future
+            if not future.done():
+                future.set_result(result[:k])
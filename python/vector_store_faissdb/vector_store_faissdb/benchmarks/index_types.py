@@ -0,0 +1,128 @@
+"""Recall@k and latency of approximate index types against the exact flat index on synthetic corpora.
+
+    python -m vector_store_faissdb.benchmarks.index_types --sizes 10000 100000 1000000 --dim 1536
+
+A 1M x 1536 corpus needs ~6 GB for the vectors alone, use a smaller --dim to sweep large sizes on a laptop.
+"""
+import argparse
+import math
+import time
+import typing
+
+import numpy as np
+from vector_store_faissdb.indexes import FLAT_INDEX_FACTORY, build_index, search_index
+
+
+class IndexConfig(typing.NamedTuple):
+    # `{nlist}` is replaced with ~4 * sqrt(corpus size)
+    factory: str
+    param: typing.Optional[str] = None
+    values: typing.Tuple[int, ...] = (None,)
+
+
+DEFAULT_CONFIGS = (
+    IndexConfig('IVF{nlist},Flat', 'nprobe', (1, 8, 32, 128)),
+    IndexConfig('HNSW32', 'ef_search', (16, 64, 256)),
+)
+
+
+def synthetic_corpus(size: int, dim: int, n_clusters: int = 1_000, seed: int = 0,
+                     chunk_size: int = 100_000) -> np.ndarray:
+    """Unit-norm vectors drawn around random topic centroids, which is closer to text embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    vectors = np.empty((size, dim), dtype=np.float32)
+    for start in range(0, size, chunk_size):
+        end = min(start + chunk_size, size)
+        assignment = rng.integers(0, n_clusters, end - start)
+        vectors[start:end] = centroids[assignment] + rng.standard_normal((end - start, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def synthetic_queries(corpus: np.ndarray, n_queries: int, noise: float = 0.05, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.choice(len(corpus), n_queries, replace=False)].copy()
+    queries += noise * rng.standard_normal(queries.shape, dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries
+
+
+def recall_at_k(approximate: np.ndarray, exact: np.ndarray) -> float:
+    k = exact.shape[1]
+    return float(np.mean([len(set(a) & set(e)) / k for a, e in zip(approximate, exact)]))
+
+
+def latencies_ms(index, queries: np.ndarray, k: int, **params) -> np.ndarray:
+    # one query at a time, this is how /similarity_search hits the index
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search_index(index, query[None, :], k, **params)
+        timings.append((time.perf_counter() - start) * 1_000)
+    return np.array(timings)
+
+
+def benchmark(size: int, dim: int, configs: typing.Sequence[IndexConfig], k: int = 20,
+              n_queries: int = 200) -> typing.List[dict]:
+    corpus = synthetic_corpus(size, dim)
+    queries = synthetic_queries(corpus, n_queries)
+    nlist = max(1, int(4 * math.sqrt(size)))
+
+    rows = []
+    exact = None
+    for config in (IndexConfig(FLAT_INDEX_FACTORY),) + tuple(configs):
+        factory = config.factory.format(nlist=nlist)
+        start = time.perf_counter()
+        index = build_index(factory, corpus)
+        index.add(corpus)
+        build_sec = time.perf_counter() - start
+
+        for value in config.values:
+            params = {config.param: value} if config.param else {}
+            _, found = search_index(index, queries, k, **params)
+            if exact is None:
+                exact = found
+            timings = latencies_ms(index, queries, k, **params)
+            rows.append({
+                'size': size,
+                'index': factory,
+                'params': ', '.join(f'{p}={v}' for p, v in params.items()) or '-',
+                f'recall@{k}': recall_at_k(found, exact),
+                'p50_ms': float(np.percentile(timings, 50)),
+                'p99_ms': float(np.percentile(timings, 99)),
+                'build_sec': build_sec,
+            })
+    return rows
+
+
+def print_rows(rows: typing.List[dict]):
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(_fmt(r[c])) for r in rows)) for c in columns}
+    print('  '.join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print('  '.join(_fmt(row[c]).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value) -> str:
+    return f'{value:.3f}' if isinstance(value, float) else str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for size in args.sizes:
+        rows.extend(benchmark(size, args.dim, DEFAULT_CONFIGS, k=args.k, n_queries=args.queries))
+    print_rows(rows)
+
+
+if __name__ == '__main__':
+    main()
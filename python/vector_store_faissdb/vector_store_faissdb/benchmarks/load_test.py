@@ -0,0 +1,92 @@
+"""Closed-loop load test of a running vector store: QPS and latency per concurrency level.
+
+    uvicorn vector_store_faissdb:app --port 8000 --workers 4
+    python -m vector_store_faissdb.benchmarks.load_test --url http://localhost:8000 --concurrency 1 2 4 8 16 32
+
+Run it against tasks with different `vector_store_cpu_units` (or local `--workers`) to see QPS scale with cores.
+"""
+import argparse
+import json
+import threading
+import time
+import typing
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from vector_store_faissdb.benchmarks.index_types import print_rows
+
+DEFAULT_QUERIES = (
+    'The Earth revolves around the Sun.',
+    'The Earth takes 365.25 days to fully orbit the sun.',
+    'The Earth has a slightly tilted axis.',
+    'The Earth is the third planet from the Sun.',
+    "There are only about 100 individuals of Rice's whale remaining.",
+)
+
+
+def _search(url: str, query: str, k: int, timeout: float) -> float:
+    params = urllib.parse.urlencode({'query': query, 'maximum_nearest_neighbors': k})
+    start = time.perf_counter()
+    with urllib.request.urlopen(f'{url}/similarity_search?{params}', timeout=timeout) as res:  # nosec B310
+        json.loads(res.read())
+    return time.perf_counter() - start
+
+
+def run_level(url: str, queries: typing.Sequence[str], concurrency: int, duration_sec: float, k: int = 20,
+              timeout: float = 60) -> dict:
+    deadline = time.perf_counter() + duration_sec
+    latencies: typing.List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client(n: int):
+        nonlocal errors
+        i = n
+        while time.perf_counter() < deadline:
+            try:
+                latency = _search(url, queries[i % len(queries)], k, timeout)
+                with lock:
+                    latencies.append(latency)
+            except Exception:
+                with lock:
+                    errors += 1
+            i += concurrency
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    timings = np.array(latencies or [0.0]) * 1_000
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'qps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p99_ms': float(np.percentile(timings, 99)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per concurrency level')
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--queries-file', help='one query per line, defaults to a few built-in assertions')
+    args = parser.parse_args(argv)
+
+    queries = DEFAULT_QUERIES
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    url = args.url.rstrip('/')
+    print_rows([run_level(url, queries, c, args.duration, k=args.k) for c in args.concurrency])
+
+
+if __name__ == '__main__':
+    main()
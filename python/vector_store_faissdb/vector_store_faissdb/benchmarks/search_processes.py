@@ -0,0 +1,130 @@
+"""Search throughput of one process with executor threads against search worker processes sharing an mmap'd index.
+
+    python -m vector_store_faissdb.benchmarks.search_processes --size 100000 --cpu-units 1024 2048 4096
+
+Every `--cpu-units` value is a `vector_store_cpu_units` setting of the Fargate task (1024 units per vCPU) and gets one
+search worker process per vCPU, i.e. SEARCH_PROCESSES. Queries are embedded offline by hashing their words, which
+keeps OpenAI out of the measurement but, like parsing an embedding response, still runs Python under the GIL.
+"""
+import argparse
+import hashlib
+import re
+import tempfile
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.embeddings.base import Embeddings
+from vector_store_faissdb.benchmarks.index_types import print_rows
+from vector_store_faissdb.id_map import WORK_ID_KEY
+from vector_store_faissdb.search_pool import SearchPool
+
+_DIM = 384
+_WORDS = re.compile(r'\w+')
+
+
+class HashingEmbeddings(Embeddings):
+    def _embed(self, text: str) -> typing.List[float]:
+        vector = np.zeros(_DIM, dtype=np.float32)
+        for word in _WORDS.findall(text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % _DIM] += 1.0
+        return (vector / max(np.linalg.norm(vector), 1e-12)).tolist()
+
+    def embed_documents(self, texts: typing.List[str]) -> typing.List[typing.List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> typing.List[float]:
+        return self._embed(text)
+
+
+def _container(local_path: typing.Optional[Path], read_only: bool):
+    from langchain.chat_models import ChatOpenAI
+    from vector_store_faissdb.corpus_container import CorpusContainer
+
+    cc = CorpusContainer('benchmark', ChatOpenAI(openai_api_key='benchmark', client=None), local_path=local_path,
+                         read_only=read_only)
+    cc._emb = HashingEmbeddings()
+    return cc
+
+
+def open_read_only(local_path: Path, version: typing.Optional[str]):
+    cc = _container(local_path, read_only=True)
+    cc.version = version
+    cc.load()
+    return cc
+
+
+def search(cc, query: str, k: int) -> int:
+    # what /similarity_search does besides HTTP: embed, search, look the documents up and serialize them
+    from vector_store_faissdb import _pooled_search
+
+    return len(_pooled_search(cc, query, k, {}, ('id', 'content', 'metadata', 'score'), None, None).body)
+
+
+def synthetic_docs(size: int, vocabulary: int = 20_000, words: int = 150, seed: int = 0) -> typing.List[Document]:
+    rng = np.random.default_rng(seed)
+    return [
+        Document(page_content=f'ID: W{i} TITLE: work {i}. ABSTRACT: '
+                              + ' '.join(f'w{w}' for w in rng.integers(0, vocabulary, words)),
+                 metadata={WORK_ID_KEY: f'W{i}'})
+        for i in range(size)
+    ]
+
+
+def synthetic_queries(n: int, vocabulary: int = 20_000, words: int = 12, seed: int = 1) -> typing.List[str]:
+    rng = np.random.default_rng(seed)
+    return [' '.join(f'w{w}' for w in rng.integers(0, vocabulary, words)) for _ in range(n)]
+
+
+def _throughput(run: typing.Callable[[str], typing.Any], queries: typing.Sequence[str], concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(run, queries))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def benchmark(store: Path, cpu_units: typing.Sequence[int], n_queries: int = 2_000, k: int = 20,
+              concurrency: int = 32) -> typing.List[dict]:
+    queries = synthetic_queries(n_queries)
+    front_end = open_read_only(store, None)
+
+    rows = [{
+        'mode': 'threads',
+        'processes': 1,
+        'qps': _throughput(lambda q: search(front_end, q, k), queries, concurrency),
+    }]
+    for units in cpu_units:
+        processes = max(1, units // 1024)
+        pool = SearchPool(processes, open_read_only, store)
+        try:
+            # workers open the index on start, keep that out of the measurement
+            list(pool.submit(search, front_end, q, k).result() for q in queries[:processes * 4])
+            qps = _throughput(lambda q: pool.submit(search, front_end, q, k).result(), queries, concurrency)
+        finally:
+            pool.shutdown()
+        rows.append({'mode': f'{units} cpu units', 'processes': processes, 'qps': qps})
+    for row in rows:
+        row['speedup'] = row['qps'] / rows[0]['qps']
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=100_000, help='documents in the synthetic corpus')
+    parser.add_argument('--cpu-units', type=int, nargs='+', default=[1024, 2048, 4096, 8192])
+    parser.add_argument('--queries', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--k', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Path(tmp) / 'store'
+        _container(store, read_only=False)._add_docs_to_db(synthetic_docs(args.size), save_to_disk=True)
+        print_rows(benchmark(store, args.cpu_units, n_queries=args.queries, k=args.k, concurrency=args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Memory footprint and recall loss of compressed vector storage modes, with and without exact re-ranking.
+
+    python -m vector_store_faissdb.benchmarks.storage_modes --sizes 100000 --dim 1536
+"""
+import argparse
+import time
+import typing
+
+import numpy as np
+from vector_store_faissdb.benchmarks.index_types import (
+    latencies_ms,
+    print_rows,
+    recall_at_k,
+    synthetic_corpus,
+    synthetic_queries,
+)
+from vector_store_faissdb.exact_vectors import ExactVectors
+from vector_store_faissdb.indexes import build_index, index_memory_bytes, search_index
+
+
+def storage_modes(dim: int) -> typing.Dict[str, str]:
+    # PQ with one byte per 16 dimensions, i.e. 96 bytes for a 1536-dim OpenAI vector
+    return {
+        'float32': 'Flat',
+        'fp16': 'SQfp16',
+        'sq8': 'SQ8',
+        'pq': f'PQ{max(1, dim // 16)}x8',
+    }
+
+
+class _Reranked:
+    """Search adapter that over-fetches from the compressed index and re-ranks with exact vectors."""
+
+    def __init__(self, index, exact: ExactVectors, factor: int):
+        self.index = index
+        self.exact = exact
+        self.factor = factor
+
+    def search(self, vectors: np.ndarray, k: int):
+        _, candidates = self.index.search(vectors, min(k * self.factor, self.index.ntotal))
+        scores, indices = zip(*(self.exact.rerank(v, c, k) for v, c in zip(vectors, candidates)))
+        return np.stack(scores), np.stack(indices)
+
+
+def benchmark(size: int, dim: int, k: int = 20, n_queries: int = 200, rerank_factor: int = 4) -> typing.List[dict]:
+    corpus = synthetic_corpus(size, dim)
+    queries = synthetic_queries(corpus, n_queries)
+    exact_vectors = ExactVectors(dim)
+    exact_vectors.append(corpus)
+
+    rows = []
+    exact = None
+    for mode, factory in storage_modes(dim).items():
+        start = time.perf_counter()
+        index = build_index(factory, corpus)
+        index.add(corpus)
+        build_sec = time.perf_counter() - start
+        index_bytes = index_memory_bytes(index)
+
+        for rerank in ((False,) if mode == 'float32' else (False, True)):
+            searcher = _Reranked(index, exact_vectors, rerank_factor) if rerank else index
+            _, found = search_index(searcher, queries, k)
+            if exact is None:
+                exact = found
+            recall = recall_at_k(found, exact)
+            timings = latencies_ms(searcher, queries, k)
+            rows.append({
+                'size': size,
+                'mode': mode,
+                'rerank': rerank,
+                'bytes/vector': index_bytes / size,
+                'index_mb': index_bytes / 2 ** 20,
+                f'recall@{k}': recall,
+                'recall_loss': 1.0 - recall,
+                'p50_ms': float(np.percentile(timings, 50)),
+                'p99_ms': float(np.percentile(timings, 99)),
+                'build_sec': build_sec,
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--k', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--rerank-factor', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    rows = []
+    for size in args.sizes:
+        rows.extend(benchmark(size, args.dim, k=args.k, n_queries=args.queries, rerank_factor=args.rerank_factor))
+    print_rows(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+import re
+import time
+import typing
+import unicodedata
+from collections import OrderedDict
+
+from vector_store_faissdb import metrics
+
+SEARCHED = 'searched'
+COALESCED = 'coalesced'
+CACHED = 'cached'
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(query: str) -> str:
+    # the same assertion copied from different places differs in whitespace and unicode forms, not in words
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', query)).strip()
+
+
+class QueryCoalescer:
+    """Single-flight searches: concurrent identical searches wait for the first one instead of searching again.
+
+    Searches are identical when their normalized query, `k`, parameters and `variant` (e.g. the response encoding)
+    match on the same snapshot of the same store. Results of read-only containers are also kept for `ttl_sec` (0 keeps
+    none), up to `max_entries`. Entries are keyed by the snapshot, those of a container's previous snapshot are dropped
+    as soon as a search sees that it swapped in a new one.
+    """
+
+    def __init__(self, ttl_sec: float = 0.0, max_entries: int = 1_024):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        # only touched from the event loop, no locks needed
+        self._in_flight: typing.Dict[tuple, asyncio.Future] = {}
+        self._results: 'OrderedDict[tuple, typing.Tuple[float, typing.Any]]' = OrderedDict()
+        # snapshot each container served at its last search
+        self._snapshots: typing.Dict[int, tuple] = {}
+
+    async def search(self, container, query: str, k: int, params: dict,
+                     compute: typing.Callable[[], typing.Awaitable], variant: tuple = ()):
+        snapshot = (str(container.local_path), container.version)
+        key = (snapshot, normalize(query), k, tuple(sorted(params.items())), variant)
+        cacheable = self.ttl_sec > 0 and container.read_only
+
+        if cacheable:
+            self._invalidate(id(container), snapshot)
+            entry = self._results.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._results.move_to_end(key)
+                metrics.SEARCHES.labels(CACHED).inc()
+                return entry[1]
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            metrics.SEARCHES.labels(COALESCED).inc()
+            # shielded, a waiter that goes away must not cancel the search for the others
+            return await asyncio.shield(future)
+
+        metrics.SEARCHES.labels(SEARCHED).inc()
+        future = self._in_flight[key] = asyncio.ensure_future(compute())
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._in_flight.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        if cacheable:
+            self._results[key] = (time.monotonic() + self.ttl_sec, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
+
+    def _invalidate(self, container_id: int, snapshot: tuple):
+        previous = self._snapshots.get(container_id)
+        self._snapshots[container_id] = snapshot
+        if previous is not None and previous != snapshot:
+            for key in [key for key in self._results if key[0] == previous]:
+                del self._results[key]
@@ -0,0 +1,99 @@
+import re
+import threading
+import typing
+from collections import OrderedDict
+from pathlib import Path
+
+from loguru import logger
+from vector_store_faissdb import snapshots
+
+# collection names are directory names under the collections root, nothing that could escape it
+_NAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.-]{0,127}')
+
+
+class UnknownCollection(KeyError):
+    pass
+
+
+def resident_bytes(container) -> int:
+    footprint = container.memory_footprint()
+    return footprint['index_bytes'] + footprint['exact_vectors_bytes'] + footprint['lexical_index_bytes']
+
+
+class CollectionCache:
+    """Read-only corpus containers of the stores under `root`, loaded on first use and evicted least recently used
+    first once their indexes take more than `memory_budget_bytes` (0 for no budget).
+
+    Each `<root>/<name>` is a saved store or a snapshot root (see `snapshots`). The collection being loaded is never
+    evicted, so a single collection larger than the budget is still served. Searches already holding an evicted
+    container finish on it, it is freed with its last reference.
+    """
+
+    def __init__(self, root: Path, load: typing.Callable[[Path, typing.Optional[str]], typing.Any],
+                 memory_budget_bytes: int = 0):
+        self.root = Path(root)
+        self.memory_budget_bytes = memory_budget_bytes
+        self._load = load
+        self._lock = threading.Lock()
+        self._loaded: 'OrderedDict[str, typing.Tuple[typing.Any, int]]' = OrderedDict()
+        # one load per collection at a time, different collections load concurrently
+        self._loading: typing.Dict[str, threading.Lock] = {}
+
+    def names(self) -> typing.List[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir() and _NAME.fullmatch(p.name))
+
+    def loaded(self) -> typing.Dict[str, int]:
+        """Resident bytes of the loaded collections, least recently used first."""
+        with self._lock:
+            return {name: size for name, (_, size) in self._loaded.items()}
+
+    def get(self, name: str):
+        container = self._hit(name)
+        if container is not None:
+            return container
+
+        if not _NAME.fullmatch(name) or not (self.root / name).is_dir():
+            raise UnknownCollection(name)
+        with self._lock:
+            loading = self._loading.setdefault(name, threading.Lock())
+        with loading:
+            # loaded by a concurrent request while this one waited
+            container = self._hit(name)
+            if container is not None:
+                return container
+
+            local_path, version = snapshots.live_path(self.root / name)
+            logger.info(f'Loading collection {name} from {str(local_path)}')
+            container = self._load(local_path, version)
+            size = resident_bytes(container)
+            with self._lock:
+                self._loaded[name] = (container, size)
+                self._evict(keep=name)
+        return container
+
+    def evict(self, name: str) -> bool:
+        with self._lock:
+            return self._loaded.pop(name, None) is not None
+
+    def _hit(self, name: str):
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is None:
+                return None
+            self._loaded.move_to_end(name)
+            return entry[0]
+
+    def _evict(self, keep: str):
+        if not self.memory_budget_bytes:
+            return
+        total = sum(size for _, size in self._loaded.values())
+        for name in list(self._loaded):
+            if total <= self.memory_budget_bytes:
+                break
+            if name == keep:
+                continue
+            _, size = self._loaded.pop(name)
+            total -= size
+            logger.info(f'Evicted collection {name} ({size / 2 ** 20:.0f} MiB) to stay within the memory budget')
@@ -0,0 +1,71 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+_executor: ThreadPoolExecutor = None
+_executor_lock = threading.Lock()
+
+
+class ReadWriteLock:
+    """Many concurrent readers or one writer; waiting writers block new readers so index updates are not starved."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextlib.contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = int(os.environ.get('VECTOR_STORE_EXECUTOR_WORKERS', 0)) or min(32, os.cpu_count() + 4)
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='vector-store')
+    return _executor
+
+
+async def run_blocking(fn: typing.Callable, *args, **kwargs):
+    """Runs blocking embedding/FAISS code on the bounded executor so the event loop keeps serving other requests."""
+    loop = asyncio.get_running_loop()
+    # like asyncio.to_thread, the call sees the request's context (e.g. its metrics)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor(), functools.partial(context.run, fn, *args, **kwargs))
@@ -1,53 +1,176 @@
+import contextvars
+import fcntl
+import pickle
 import threading
 import typing
 from pathlib import Path
 
+import numpy as np
 from chatbot_cloud_util.base_validator import BaseCorpusContainer
 from chatbot_validator.corpus import CorpusChain
+from chatbot_validator.embeddings import CachedEmbeddings
 from chatbot_validator.exceptions import NoRelevantDocumentsFound, ValidatorError
 from langchain.chat_models.base import BaseChatModel
 from langchain.docstore.document import Document
 from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.vectorstores import FAISS
+from langchain.vectorstores.faiss import dependable_faiss_import
 from loguru import logger
+from vector_store_faissdb import metrics, near_duplicates, wal
+from vector_store_faissdb.concurrency import ReadWriteLock
+from vector_store_faissdb.docstore import LOCK_FILE_NAME as DOCSTORE_LOCK_FILE_NAME
+from vector_store_faissdb.docstore import MmapDocstore, RowDocstore, RowIds
+from vector_store_faissdb.exact_vectors import ExactVectors
+from vector_store_faissdb.filters import MetadataColumns, SearchFilters
+from vector_store_faissdb.id_map import (
+    WORK_ID_KEY,
+    WorkIdIndex,
+    WorkIdMap,
+    unique_works,
+    work_id,
+)
+from vector_store_faissdb.indexes import (
+    FLAT_INDEX_FACTORY,
+    build_index,
+    index_memory_bytes,
+    search_index,
+)
+from vector_store_faissdb.lexical import (
+    FUSIONS,
+    HYBRID,
+    HYBRID_CANDIDATES_FACTOR,
+    LEGACY_FILE_NAME,
+    LEXICAL,
+    RRF,
+    SEARCH_MODES,
+    VECTOR,
+    LexicalIndex,
+)
+from vector_store_faissdb.lexical import executor as lexical_executor
+from vector_store_faissdb.lexical import fuse
+from vector_store_faissdb.mmr import MMR_FETCH_FACTOR, mmr, relevance_of
+from vector_store_faissdb.near_duplicates import (
+    NearDuplicateIndex,
+    canonical,
+    signature,
+)
+from vector_store_faissdb.wal import DELETE, WriteAheadLog
+
+SearchResults = typing.List[typing.Tuple[Document, float]]
 
 
 class CorpusContainer(BaseCorpusContainer):
-    # extra_oa_fields = ('doi',)
-    extra_oa_fields = ()
+    # stored with every document, so search results carry what evidence generation needs without asking OpenAlex
+    extra_oa_fields = ('publication_year', 'doi', 'oa_location')
 
-    def __init__(self, openai_api_key: str, llm: BaseChatModel, local_path: Path = None, **kwargs):
+    def __init__(self, openai_api_key: str, llm: BaseChatModel, local_path: Path = None, read_only: bool = False,
+                 index_factory: str = FLAT_INDEX_FACTORY, nprobe: int = None, ef_search: int = None,
+                 rerank: bool = False, rerank_factor: int = 4, checkpoint_every: int = 10_000,
+                 near_duplicate_threshold: typing.Optional[float] = 0.8, **kwargs):
         self.chain = CorpusChain(llm=llm, extra_oa_fields=self.extra_oa_fields)
         self._local_path = local_path
-        self._emb = OpenAIEmbeddings(client=None, openai_api_key=openai_api_key)
+        self._read_only = read_only
+        self._index_factory = index_factory
+        # defaults for approximate indexes, overridable per search
+        self._nprobe = nprobe
+        self._ef_search = ef_search
+        # compressed indexes (SQ8, SQfp16, PQ) can re-rank their candidates with the exact vectors kept on disk
+        self._rerank = rerank
+        self._rerank_factor = rerank_factor
+        self._exact: typing.Optional[ExactVectors] = None
+        self._ids: typing.Optional[WorkIdMap] = None
+        self._columns: typing.Optional[MetadataColumns] = None
+        # BM25 postings for lexical and hybrid searches, built next to the vectors at ingest
+        self._lexical: typing.Optional[LexicalIndex] = None
+        # MinHash signatures of the indexed abstracts, built on the first add and kept in step with the rows after
+        self._near_duplicate_threshold = near_duplicate_threshold
+        self._near_duplicates: typing.Optional[NearDuplicateIndex] = None
+        self._near_duplicates_lock = threading.Lock()
+        # saves append to the write-ahead log, the full index is only rewritten every `checkpoint_every` documents
+        self._checkpoint_every = checkpoint_every
+        self._wal = WriteAheadLog(local_path) if local_path else None
+        if local_path and not read_only:
+            # a checkpoint interrupted by a crash is finished or dropped before anything reads the store
+            wal.recover(local_path)
+        self._emb = CachedEmbeddings.from_env(OpenAIEmbeddings(client=None, openai_api_key=openai_api_key))
         self._db = None
-        self._db_lock = threading.Lock()
+        # snapshot served by read-only containers, None for stores that are not versioned
+        self.version: typing.Optional[str] = None
+        # searches share the index, only loading and adding documents are exclusive
+        self._db_lock = ReadWriteLock()
 
     @property
     def emb(self):
         return self._emb
 
+    @property
+    def read_only(self):
+        return self._read_only
+
+    @property
+    def local_path(self) -> typing.Optional[Path]:
+        return self._local_path
+
+    @property
+    def is_saved(self):
+        return bool(self._local_path) and (self._local_path / 'index.faiss').exists()
+
+    def load(self, progress: typing.Optional[typing.Callable[[str], None]] = None):
+        """Loads the saved index, `progress` is called with the name of each stage as it starts."""
+        assert self._local_path
+
+        db, exact, ids, columns, lexical = self._load_db(progress)
+        with self._db_lock.write():
+            self._db, self._exact, self._ids, self._columns, self._lexical = db, exact, ids, columns, lexical
+            self._near_duplicates = None
+
+    def load_snapshot(self, local_path: Path, version: str,
+                      progress: typing.Optional[typing.Callable[[str], None]] = None):
+        """Loads another immutable snapshot next to the live one and swaps it in once in-flight searches finished."""
+        if not self._read_only:
+            raise RuntimeError('Only read-only corpus containers can swap snapshots')
+
+        db, exact, ids, columns, lexical = self._load_db(progress, local_path)
+        with self._db_lock.write():
+            self._db, self._exact, self._ids, self._columns, self._lexical = db, exact, ids, columns, lexical
+            self._local_path, self.version = local_path, version
+        logger.info(f'Serving corpus snapshot {version} from {str(local_path)}')
+
+    def checkpoint(self):
+        """Compacts the write-ahead log into a full save of the index."""
+        assert self._local_path
+        if self._read_only:
+            raise RuntimeError('Corpus container is opened in read-only mode')
+
+        with self._db_lock.write():
+            # deletes alone are worth a checkpoint too, replicas only see checkpointed tombstones
+            if self._db and self._wal.records:
+                self._checkpoint()
+
+    def memory_footprint(self) -> typing.Dict[str, typing.Any]:
+        with self._db_lock.read():
+            index = self._db.index if self._db else None
+            vectors = index.ntotal if index is not None else 0
+            index_bytes = index_memory_bytes(index) if index is not None else 0
+            exact_vectors_bytes = len(self._exact) * self._exact.dim * 4 if self._exact else 0
+            lexical_index_bytes = self._lexical.memory_bytes() if self._lexical else 0
+        return {
+            'vectors': vectors,
+            'index_bytes': index_bytes,
+            'bytes_per_vector': index_bytes / vectors if vectors else 0.0,
+            'exact_vectors_bytes': exact_vectors_bytes,
+            'lexical_index_bytes': lexical_index_bytes,
+        }
+
     def index(self, texts: typing.List[str], save_to_disk: bool = False):
         assert not save_to_disk or self._local_path
+        if self._read_only:
+            raise RuntimeError('Corpus container is opened in read-only mode')
 
         docs = []
         for text in texts:
             try:
-                df = self.chain({'human_input': text})
-                for _, row in df.iterrows():
-                    abstract = row['abstract']
-                    abstract = abstract[:15_000] if len(abstract) > 15_000 else abstract
-                    doc = Document(
-                        page_content=' '.join(
-                            [
-                                f'ID: {str(row["openalex_id"])}',
-                                f'TITLE: {str(row["title"])}.',
-                                f'ABSTRACT: {str(abstract)}'
-                            ]
-                        ),
-                        metadata={f.upper(): str(row[f]) for f in self.extra_oa_fields},
-                    )
-                    docs.append(doc)
+                docs.extend(self.documents_for(text))
             except ValidatorError:
                 logger.warning(f'No documents found for search term: {text[:100]}')
 
@@ -56,37 +179,509 @@ class CorpusContainer(BaseCorpusContainer):
 
         self._add_docs_to_db(docs, save_to_disk)
 
+    def _skip_near_duplicates(self, docs: typing.List[Document]) -> typing.List[Document]:
+        """Keeps one work per cluster of near-identical abstracts (preprint and published version, corrections).
+
+        Works that duplicate an indexed one are skipped. Within `docs`, re-added works (which replace their previous
+        version) are kept first, then the first one in OpenAlex relevance order.
+        """
+        if not self._near_duplicate_threshold:
+            return docs
+
+        signatures = [signature(d.page_content) for d in docs]
+        with self._db_lock.read():
+            upserts = [self._db is not None and work_id(d) in self._ids for d in docs]
+            # re-added works come first, so they stay the canonical version of their cluster
+            order = sorted(range(len(docs)), key=lambda i: not upserts[i])
+            representatives = canonical([signatures[i] for i in order], self._near_duplicate_threshold)
+            duplicates = {order[i] for i, r in enumerate(representatives) if r != i}
+            if self._db is not None:
+                with self._near_duplicates_lock:
+                    candidates = [None if upsert else s for s, upsert in zip(signatures, upserts)]
+                    rows = self._synced_near_duplicates().duplicates(candidates, self._ids.live)
+                duplicates.update(i for i, row in enumerate(rows) if row is not None)
+
+        kept = [d for i, d in enumerate(docs) if i not in duplicates]
+        if len(kept) < len(docs):
+            metrics.SKIPPED_NEAR_DUPLICATES.inc(len(docs) - len(kept))
+            logger.info(f'Skipped {len(docs) - len(kept)} near-duplicate works of {len(docs)}')
+        return kept
+
+    def _synced_near_duplicates(self) -> NearDuplicateIndex:
+        """Signatures of every row of the index, loaded or computed for the rows added since they were last synced."""
+        ntotal = self._db.index.ntotal
+        if self._near_duplicates is None and self.is_saved:
+            self._near_duplicates = NearDuplicateIndex.load(self._local_path, self._near_duplicate_threshold)
+        if self._near_duplicates is None or len(self._near_duplicates) > ntotal:
+            self._near_duplicates = NearDuplicateIndex(threshold=self._near_duplicate_threshold)
+        if len(self._near_duplicates) < ntotal:
+            rows = range(len(self._near_duplicates), ntotal)
+            if len(rows) > 10_000:
+                logger.info(f'Computing MinHash signatures of {len(rows)} indexed documents')
+            self._near_duplicates.append([signature(self._document(row).page_content) for row in rows])
+        return self._near_duplicates
+
+    def documents_for(self, text: str) -> typing.List[Document]:
+        docs = []
+        df = self.chain({'human_input': text})
+        for _, row in df.iterrows():
+            abstract = row['abstract']
+            abstract = abstract[:15_000] if len(abstract) > 15_000 else abstract
+            doc = Document(
+                page_content=' '.join(
+                    [
+                        f'ID: {str(row["openalex_id"])}',
+                        f'TITLE: {str(row["title"])}.',
+                        f'ABSTRACT: {str(abstract)}'
+                    ]
+                ),
+                metadata={
+                    WORK_ID_KEY: str(row['openalex_id']),
+                    'TITLE': str(row['title']),
+                    **{f.upper(): self._metadata_value(row.get(f)) for f in self.extra_oa_fields},
+                },
+            )
+            docs.append(doc)
+        return docs
+
+    @staticmethod
+    def _metadata_value(value) -> str:
+        # missing values come back from pandas as None or NaN
+        if value is None or value != value:
+            return ''
+        return str(value)
+
+    def add_documents(self, docs: typing.List[Document], save_to_disk: bool = False) -> typing.List[Document]:
+        """Indexes `docs`, returns those that were not skipped as near-duplicates or repeats of another one."""
+        assert not save_to_disk or self._local_path
+        if self._read_only:
+            raise RuntimeError('Corpus container is opened in read-only mode')
+
+        return self._add_docs_to_db(docs, save_to_disk)
+
+    def delete(self, work_ids: typing.List[str], save_to_disk: bool = False) -> int:
+        """Removes works from search results, their rows are dropped from the index on the next checkpoint."""
+        assert not save_to_disk or self._local_path
+        if self._read_only:
+            raise RuntimeError('Corpus container is opened in read-only mode')
+
+        with self._db_lock.write():
+            if save_to_disk and not self._db and self.is_saved:
+                self._db, self._exact, self._ids, self._columns, self._lexical = self._load_db()
+                self._near_duplicates = None
+            if not self._db:
+                return 0
+            deleted = self._ids.delete(work_ids)
+            if save_to_disk and deleted:
+                self._wal.delete(work_ids)
+        return deleted
+
+    def documents(self, work_ids: typing.List[str]) -> typing.List[typing.Optional[Document]]:
+        """Current version of each work, None for works that are not indexed."""
+        with self._db_lock.read():
+            if not self._db:
+                return [None for _ in work_ids]
+            rows = [self._ids.row(_id) for _id in work_ids]
+            return [
+                None if row is None else self._db.docstore.search(self._db.index_to_docstore_id[row])
+                for row in rows
+            ]
+
     def size_of_corpus(self):
-        self._db_lock.acquire()
+        with self._db_lock.read():
+            return self._size_of_corpus()
+
+    def search(self, query: str, maximum_nearest_neighbors: int = 20, nprobe: int = None,
+               ef_search: int = None, year_min: int = None, year_max: int = None,
+               is_oa: bool = None, mode: str = VECTOR, fusion: str = RRF,
+               vector_weight: float = 0.5, mmr_lambda: float = None) -> SearchResults:
+        """Vector search returns L2 distances (lower is better), lexical search BM25 scores and hybrid search fused
+        scores (higher is better).
+
+        With `mmr_lambda` the results are re-ordered by maximal marginal relevance, from 1 (relevance only) to 0
+        (diversity only), scores stay the ones of the search.
+        """
+        if min(maximum_nearest_neighbors, self.size_of_corpus()) <= 0:
+            return []
+
+        return self._search(
+            [query], lambda: [self.emb.embed_query(query)], maximum_nearest_neighbors, nprobe, ef_search,
+            SearchFilters(year_min, year_max, is_oa), mode, fusion, vector_weight, mmr_lambda,
+        )[0]
+
+    def search_batch(self, queries: typing.List[str], maximum_nearest_neighbors: int = 20, nprobe: int = None,
+                     ef_search: int = None, year_min: int = None, year_max: int = None,
+                     is_oa: bool = None, mode: str = VECTOR, fusion: str = RRF,
+                     vector_weight: float = 0.5, mmr_lambda: float = None) -> typing.List[SearchResults]:
+        if not queries:
+            return []
+
+        if min(maximum_nearest_neighbors, self.size_of_corpus()) <= 0:
+            return [[] for _ in queries]
+
+        # one embedding request for the whole batch and one multi-query search over the index
+        return self._search(
+            queries, lambda: self.emb.embed_documents(list(queries)), maximum_nearest_neighbors, nprobe, ef_search,
+            SearchFilters(year_min, year_max, is_oa), mode, fusion, vector_weight, mmr_lambda,
+        )
+
+    def _search(self, queries: typing.List[str], embed: typing.Callable[[], typing.List[typing.List[float]]], k: int,
+                nprobe: typing.Optional[int], ef_search: typing.Optional[int], filters: SearchFilters, mode: str,
+                fusion: str, vector_weight: float,
+                mmr_lambda: typing.Optional[float] = None) -> typing.List[SearchResults]:
+        if mode not in SEARCH_MODES:
+            raise ValueError(f'Unknown search mode {mode}, expected one of {", ".join(SEARCH_MODES)}')
+        if mode == HYBRID and fusion not in FUSIONS:
+            raise ValueError(f'Unknown fusion {fusion}, expected one of {", ".join(FUSIONS)}')
+        if mmr_lambda is not None and not 0 <= mmr_lambda <= 1:
+            raise ValueError(f'mmr_lambda must be between 0 and 1, got {mmr_lambda}')
+
+        # MMR picks the `k` results among a larger pool of candidates
+        fetch = k * MMR_FETCH_FACTOR if mmr_lambda is not None else k
+        if mode == LEXICAL:
+            results = self._search_lexical(queries, fetch, filters)
+        else:
+            results = self._search_dense(queries, embed, fetch, nprobe, ef_search, filters, mode, fusion, vector_weight)
+        if mmr_lambda is None:
+            return results
+        return self._diversify(results, k, mmr_lambda, distances=mode == VECTOR)
+
+    def _search_dense(self, queries: typing.List[str], embed: typing.Callable[[], typing.List[typing.List[float]]],
+                      k: int, nprobe: typing.Optional[int], ef_search: typing.Optional[int], filters: SearchFilters,
+                      mode: str, fusion: str, vector_weight: float) -> typing.List[SearchResults]:
+        lexical = None
+        candidates = k * HYBRID_CANDIDATES_FACTOR if mode == HYBRID else k
+        if mode == HYBRID:
+            # BM25 scores the queries while they are embedded, which is most of the vector leg's latency
+            lexical = lexical_executor().submit(
+                contextvars.copy_context().run, self._search_lexical, queries, candidates, filters,
+            )
+        with metrics.stage('embedding'):
+            vectors = np.array(embed(), dtype=np.float32)
+        dense = self._search_by_vectors(vectors, candidates, nprobe=nprobe, ef_search=ef_search, filters=filters)
+        if lexical is None:
+            return dense
+        return [fuse(d, lx, k, fusion=fusion, vector_weight=vector_weight) for d, lx in zip(dense, lexical.result())]
+
+    def _diversify(self, results: typing.List[SearchResults], k: int, lambda_mult: float,
+                   distances: bool) -> typing.List[SearchResults]:
+        """Re-orders each query's candidates by MMR over their indexed vectors, the queries are not embedded again."""
+        with metrics.stage('mmr'), self._db_lock.read():
+            diversified = []
+            for candidates in results:
+                # works replaced or deleted since the search have no current row and drop out
+                rows = [self._ids.row(work_id(doc)) for doc, _ in candidates]
+                candidates = [c for c, row in zip(candidates, rows) if row is not None]
+                vectors = self._vectors(np.array([row for row in rows if row is not None], dtype=np.int64))
+                if vectors is None:
+                    diversified.append(candidates[:k])
+                    continue
+                picked = mmr(relevance_of(candidates, distances), vectors, k, lambda_mult)
+                diversified.append([candidates[i] for i in picked])
+            return diversified
+
+    def _vectors(self, rows: np.ndarray) -> typing.Optional[np.ndarray]:
+        if not len(rows):
+            return np.empty((0, self._db.index.d), dtype=np.float32)
+        if self._can_rerank():
+            return self._exact.rows(rows)
         try:
-            return len(self._db.index_to_docstore_id) if self._db else 0
-        finally:
-            self._db_lock.release()
+            # exact for flat and HNSW indexes, the decoded approximation for compressed ones
+            return self._db.index.reconstruct_batch(rows)
+        except RuntimeError:
+            # IVF indexes without a direct map cannot look vectors up by row
+            logger.warning('Index cannot reconstruct vectors, results are not diversified')
+            return None
+
+    def _search_lexical(self, queries: typing.List[str], k: int, filters: SearchFilters) -> typing.List[SearchResults]:
+        with metrics.stage('lexical'), self._db_lock.read():
+            allowed = self._allowed_rows(filters)
+            results = []
+            for query in queries:
+                scores, rows = self._lexical.search(query, k, allowed)
+                results.append([(self._document(row), float(score)) for score, row in zip(scores, rows)])
+            return results
+
+    def _document(self, row: int) -> Document:
+        _id = self._db.index_to_docstore_id[row]
+        doc = self._db.docstore.search(_id)
+        if not isinstance(doc, Document):
+            raise ValueError(f'Could not find document for id {_id}, got {doc}')
+        return doc
+
+    def _size_of_corpus(self):
+        # number of works, replaced and deleted rows wait in the index for the next compaction
+        return len(self._ids) if self._db else 0
+
+    def _search_by_vectors(self, vectors: np.ndarray, k: int, nprobe: int = None, ef_search: int = None,
+                           filters: SearchFilters = None) -> typing.List[SearchResults]:
+        # embedding happens before this point, the read lock only covers the index and docstore
+        with metrics.stage('search'), self._db_lock.read():
+            k = min(k, self._size_of_corpus())
+            if k <= 0:
+                return [[] for _ in vectors]
+            return self._search_by_vectors_unlocked(vectors, k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+
+    def _allowed_rows(self, filters: SearchFilters = None) -> typing.Optional[np.ndarray]:
+        allowed = self._ids.live if self._ids.has_deleted else None
+        mask = self._columns.mask(filters)
+        if mask is None:
+            return allowed
+        return mask if allowed is None else mask & allowed
+
+    def _search_by_vectors_unlocked(self, vectors: np.ndarray, k: int, nprobe: int = None, ef_search: int = None,
+                                    filters: SearchFilters = None) -> typing.List[SearchResults]:
+        if self._db._normalize_L2:
+            dependable_faiss_import().normalize_L2(vectors)
 
-    def search(self, query: str, maximum_nearest_neighbors: int = 20):
-        return self._db.similarity_search_with_score(query, k=min(maximum_nearest_neighbors, self.size_of_corpus()))
+        rerank = self._can_rerank()
+        scores, indices = search_index(
+            self._db.index, vectors,
+            min(k * self._rerank_factor, self._db.index.ntotal) if rerank else k,
+            nprobe=nprobe or self._nprobe,
+            ef_search=ef_search or self._ef_search,
+            allowed=self._allowed_rows(filters),
+        )
+        if rerank:
+            scores, indices = zip(*(self._exact.rerank(v, c, k) for v, c in zip(vectors, indices)))
 
-    def _add_docs_to_db(self, docs, save_to_disk):
+        results = []
+        for row_scores, row_indices in zip(scores, indices):
+            row = []
+            for score, i in zip(row_scores, row_indices):
+                if i == -1:
+                    # not enough documents in the index
+                    continue
+                row.append((self._document(i), float(score)))
+            results.append(row)
+        return results
+
+    def _add_docs_to_db(self, docs, save_to_disk) -> typing.List[Document]:
         if save_to_disk and not self._local_path.exists():
             self._local_path.mkdir(parents=True, exist_ok=False)
+        if save_to_disk and self.is_saved:
+            # the saved works are loaded first, incoming ones are checked against them
+            with self._db_lock.write():
+                if not self._db:
+                    self._db, self._exact, self._ids, self._columns, self._lexical = self._load_db()
+                    self._near_duplicates = None
 
-        self._db_lock.acquire()
-        try:
-            try:
-                if save_to_disk and not self._db:
-                    next(self._local_path.iterdir())
-                    self._db = FAISS.load_local(str(self._local_path), self.emb)
-                elif not self._db:
-                    raise StopIteration
+        # a work found through several search terms is embedded and indexed once
+        docs = self._skip_near_duplicates(unique_works(docs))
+        if not docs:
+            return docs
+        # embedding is the slow part and does not touch the index, so it stays outside the exclusive section
+        text_embeddings = self._embed_docs(docs)
 
-                self._db.add_documents(docs, embedding=self.emb)
-            except StopIteration:
-                self._db = FAISS.from_documents(docs, self.emb)
+        with self._db_lock.write():
+            if self._db:
+                self._append(self._db, self._exact, self._ids, self._columns, self._lexical, text_embeddings, docs)
+            else:
+                self._db = self._new_db(text_embeddings, docs)
 
             if save_to_disk:
-                self._save()
-        finally:
-            self._db_lock.release()
+                self._save(text_embeddings, docs)
+        return docs
+
+    @staticmethod
+    def _append(db: FAISS, exact: typing.Optional[ExactVectors], ids: WorkIdMap, columns: MetadataColumns,
+                lexical: LexicalIndex, text_embeddings, docs):
+        if exact is not None and len(exact) == db.index.ntotal:
+            exact.append(np.array([e for _, e in text_embeddings], dtype=np.float32))
+        db.add_embeddings(text_embeddings, metadatas=[d.metadata for d in docs])
+        # the previous versions of re-added works stay in the index as tombstoned rows
+        ids.append([work_id(d) for d in docs])
+        columns.append(docs)
+        lexical.append(docs)
+
+    def _embed_docs(self, docs) -> typing.List[typing.Tuple[str, typing.List[float]]]:
+        texts = [d.page_content for d in docs]
+        return list(zip(texts, self.emb.embed_documents(texts)))
+
+    def _new_db(self, text_embeddings, docs) -> FAISS:
+        vectors = np.array([e for _, e in text_embeddings], dtype=np.float32)
+        # approximate indexes are trained once, on the documents of the first build
+        index = build_index(self._index_factory, vectors)
+        db = FAISS(self.emb.embed_query, index, RowDocstore(), RowIds(0))
+        db.add_embeddings(text_embeddings, metadatas=[d.metadata for d in docs])
+        self._ids = WorkIdMap([work_id(d) for d in docs])
+        self._columns = MetadataColumns.from_docs(docs)
+        self._lexical = LexicalIndex.from_docs(docs)
+        self._near_duplicates = None
+        if self._rerank:
+            self._exact = ExactVectors(index.d)
+            self._exact.append(vectors)
+        return db
+
+    def _can_rerank(self) -> bool:
+        return self._exact is not None and len(self._exact) == self._db.index.ntotal
+
+    def _load_db(self, progress: typing.Optional[typing.Callable[[str], None]] = None,
+                 local_path: typing.Optional[Path] = None) -> typing.Tuple[
+            FAISS, typing.Optional[ExactVectors], WorkIdMap, MetadataColumns, LexicalIndex]:
+        progress = progress or (lambda stage: None)
+        local_path = local_path or self._local_path
+        progress('index')
+        db = self._load_mmap(local_path) if self._read_only else self._load_writable(local_path)
+        exact = None
+        if self._rerank:
+            progress('exact_vectors')
+            if not self._read_only:
+                # rows flushed by a checkpoint that crashed before it was committed, the log still holds them
+                ExactVectors.truncate(local_path, db.index.d, db.index.ntotal)
+            if ExactVectors.exists(local_path):
+                exact = ExactVectors(db.index.d, local_path)
+            else:
+                logger.warning(f'No exact vectors saved at {str(local_path)}, re-ranking is disabled')
+
+        progress('metadata')
+        # saved next to the index, so loading does not decode every document
+        columns = MetadataColumns.load(local_path)
+        if columns is None or len(columns) != db.index.ntotal:
+            docs = self._iter_docs(db.docstore, db.index_to_docstore_id)
+            columns = MetadataColumns.from_docs(doc for _, doc in docs)
+        if self._read_only and WorkIdIndex.exists(local_path):
+            # ids are resolved through the memory-mapped index, serving workers do not each hold every id
+            ids = WorkIdMap.load(local_path, size=db.index.ntotal, index=WorkIdIndex.load(local_path))
+        else:
+            work_ids = WorkIdMap.load_work_ids(local_path)
+            if work_ids is None or len(work_ids) != db.index.ntotal:
+                # stores saved before the ids were kept next to the index
+                work_ids = [work_id(doc) for _, doc in self._iter_docs(db.docstore, db.index_to_docstore_id)]
+            ids = WorkIdMap.load(local_path, work_ids)
+        if self._read_only and WriteAheadLog.exists(local_path):
+            logger.warning(f'Write-ahead log at {str(local_path)} is ignored until the next checkpoint')
+
+        progress('lexical_index')
+        lexical = LexicalIndex.load(local_path)
+        if lexical is None or len(lexical) != db.index.ntotal:
+            # stores saved before the lexical index was built at ingest
+            lexical = LexicalIndex.from_docs(doc for _, doc in self._iter_docs(db.docstore, db.index_to_docstore_id))
+
+        if not self._read_only:
+            progress('write_ahead_log')
+            self._replay_wal(db, exact, ids, columns, lexical)
+        return db, exact, ids, columns, lexical
+
+    def _replay_wal(self, db: FAISS, exact: typing.Optional[ExactVectors], ids: WorkIdMap,
+                    columns: MetadataColumns, lexical: LexicalIndex):
+        replayed = 0
+        for record in self._wal.replay():
+            if record.op == DELETE:
+                ids.delete(record.work_ids)
+            else:
+                texts = [d.page_content for d in record.docs]
+                self._append(db, exact, ids, columns, lexical, list(zip(texts, record.vectors)), record.docs)
+            replayed += 1
+        if replayed:
+            logger.info(f'Replayed {replayed} write-ahead log records at {str(self._local_path)}')
+
+    def _save(self, text_embeddings, docs):
+        if not self.is_saved or self._wal.rows + len(docs) >= self._checkpoint_every:
+            self._checkpoint()
+        else:
+            self._wal.append(np.array([e for _, e in text_embeddings], dtype=np.float32), docs)
+
+    def _checkpoint(self):
+        """Writes a full save of the index to a staging directory and commits it at once, see `wal.commit`."""
+        faiss = dependable_faiss_import()
+
+        if self._near_duplicates is not None:
+            # the rows added since `index` last looked, so the signatures are saved and compacted along the rows
+            self._synced_near_duplicates()
+        staging = wal.staging_dir(self._local_path)
+        self._compact(staging)
+        faiss.write_index(self._db.index, str(staging / 'index.faiss'))
+        self._db.docstore.write(staging)
+        if self._exact is not None:
+            # appended in place, loading cuts off the rows of a flush that was not committed
+            self._exact.flush(self._local_path)
+        self._ids.save(staging)
+        self._columns.save(staging)
+        self._lexical.save(staging)
+        if self._near_duplicates is not None:
+            self._near_duplicates.save(staging)
+        self._wal.write_checkpoint(staging)
+        wal.commit(self._local_path)
+        # the pickled docstore and compressed postings of stores saved before are superseded by the committed files
+        for name in ('index.pkl', LEGACY_FILE_NAME):
+            (self._local_path / name).unlink(missing_ok=True)
+        self._wal.reset()
+
+    def _compact(self, staging: Path):
+        """Drops tombstoned rows from indexes that store their codes contiguously (flat, SQ, PQ).
+
+        Graph and inverted-list indexes cannot renumber their rows, they keep filtering the tombstones at search time.
+        """
+        faiss = dependable_faiss_import()
+
+        if not self._ids.has_deleted or not isinstance(faiss.downcast_index(self._db.index), faiss.IndexFlatCodes):
+            return
+        keep = np.flatnonzero(self._ids.live)
+        self._db.index.remove_ids(self._ids.deleted_rows().astype(np.int64))
+        self._db.docstore = self._db.docstore.compacted(keep)
+        self._db.index_to_docstore_id = RowIds(len(keep))
+        if self._exact is not None and len(self._exact) == len(self._ids.live):
+            self._exact.compact(keep, staging)
+        elif self._exact is not None:
+            logger.warning('Exact vectors are out of sync with the index, re-ranking is disabled')
+            self._exact = None
+        logger.info(f'Compacted {len(self._ids.deleted_rows())} replaced or deleted rows out of the index')
+        if self._near_duplicates is not None and len(self._near_duplicates) == len(self._ids.live):
+            self._near_duplicates = self._near_duplicates.compacted(keep)
+        else:
+            # saved signatures are of the rows before renumbering, they are computed again when needed
+            self._near_duplicates = None
+            (self._local_path / near_duplicates.FILE_NAME).unlink(missing_ok=True)
+        self._ids = self._ids.compacted()
+        self._columns = self._columns.compacted(keep)
+        self._lexical = self._lexical.compacted(keep)
+
+    def _load_writable(self, local_path: Path) -> FAISS:
+        faiss = dependable_faiss_import()
+
+        if not MmapDocstore.exists(local_path):
+            self._convert_pickled_docstore(local_path)
+        index = faiss.read_index(str(local_path / 'index.faiss'))
+        # saved documents are read from the file when searches return them, only new ones are kept on the heap
+        docstore = RowDocstore(local_path)
+        if index.ntotal != len(docstore):
+            raise ValueError(f'Index has {index.ntotal} vectors but docstore has {len(docstore)} documents')
+
+        return FAISS(self.emb.embed_query, index, docstore, RowIds(len(docstore)))
+
+    def _load_mmap(self, local_path: Path) -> FAISS:
+        faiss = dependable_faiss_import()
+
+        if not MmapDocstore.exists(local_path):
+            self._convert_pickled_docstore(local_path)
+
+        # pages are mapped from the file instead of being copied to the heap, so workers share the page cache;
+        # IO_FLAG_MMAP alone only maps inverted lists, flat, SQ and PQ codes and HNSW storage need IO_FLAG_MMAP_IFC
+        index = faiss.read_index(
+            str(local_path / 'index.faiss'),
+            faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY,
+        )
+        docstore = MmapDocstore(local_path)
+        if index.ntotal != len(docstore):
+            raise ValueError(f'Index has {index.ntotal} vectors but docstore has {len(docstore)} documents')
+
+        return FAISS(self.emb.embed_query, index, docstore, RowIds(len(docstore)))
+
+    def _convert_pickled_docstore(self, local_path: Path):
+        # stores saved by FAISS.save_local, with LangChain's InMemoryDocstore pickled next to the index
+        with open(local_path / DOCSTORE_LOCK_FILE_NAME, 'a') as lock:
+            # all uvicorn workers load the store at once, one converts it while the others wait and then read it
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            if MmapDocstore.exists(local_path):
+                return
+            logger.info(f'Converting pickled docstore at {str(local_path)} to the mmap format')
+            with open(local_path / 'index.pkl', 'rb') as f:
+                docstore, index_to_docstore_id = pickle.load(f)  # nosec B301 - written by save_local
+            MmapDocstore.write(local_path, self._iter_docs(docstore, index_to_docstore_id))
 
-    def _save(self):
-        self._db.save_local(self._local_path)
+    @staticmethod
+    def _iter_docs(docstore, index_to_docstore_id):
+        for i in range(len(index_to_docstore_id)):
+            _id = index_to_docstore_id[i]
+            yield _id, docstore.search(_id)
@@ -0,0 +1,169 @@
+import contextlib
+import json
+import mmap
+import os
+import tempfile
+import typing
+from pathlib import Path
+
+import numpy as np
+from langchain.docstore.base import AddableMixin, Docstore
+from langchain.docstore.document import Document
+
+DATA_FILE_NAME = 'docstore.data'
+OFFSETS_FILE_NAME = 'docstore.offsets.npy'
+# held while a pickled docstore is converted, see CorpusContainer._convert_pickled_docstore
+LOCK_FILE_NAME = '.docstore.lock'
+
+
+class RowIds(typing.Mapping[int, str]):
+    """`index_to_docstore_id` replacement for row-addressed docstores: FAISS row `i` is stored under id `str(i)`."""
+
+    def __init__(self, size: int):
+        self._size = size
+
+    def __getitem__(self, i: int) -> str:
+        i = int(i)
+        if not 0 <= i < self._size:
+            raise KeyError(i)
+        return str(i)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> typing.Iterator[int]:
+        return iter(range(self._size))
+
+    def update(self, rows: typing.Mapping[int, str]):
+        # FAISS.add_embeddings registers the rows it appended, they always follow the existing ones
+        if rows:
+            self._size = max(self._size, max(rows) + 1)
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore kept in an offset-indexed file and served through mmap.
+
+    Records are stored in FAISS row order, so worker processes share the page cache and a lookup only decodes the
+    requested documents.
+    """
+
+    def __init__(self, path: Path):
+        self._offsets = np.load(str(path / OFFSETS_FILE_NAME), mmap_mode='r')
+        with open(path / DATA_FILE_NAME, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] else b''
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        return (path / DATA_FILE_NAME).exists() and (path / OFFSETS_FILE_NAME).exists()
+
+    @staticmethod
+    def encode(_id: str, doc: Document) -> bytes:
+        return json.dumps({'id': _id, 'page_content': doc.page_content, 'metadata': doc.metadata}).encode('utf-8')
+
+    @classmethod
+    def write(cls, path: Path, docs: typing.Iterable[typing.Tuple[str, Document]]):
+        cls.write_records(path, (cls.encode(_id, doc) for _id, doc in docs))
+
+    @staticmethod
+    def write_records(path: Path, records: typing.Iterable[bytes]):
+        offsets = [0]
+        # unique names, writers in other processes never write to or rename each other's files
+        data_fd, tmp_data = tempfile.mkstemp(prefix=f'.{DATA_FILE_NAME}.', suffix='.tmp', dir=path)
+        offsets_fd, tmp_offsets = tempfile.mkstemp(prefix=f'.{OFFSETS_FILE_NAME}.', suffix='.tmp', dir=path)
+        try:
+            with open(data_fd, 'wb') as f:
+                for record in records:
+                    offsets.append(offsets[-1] + f.write(record))
+            with open(offsets_fd, 'wb') as f:
+                np.save(f, np.array(offsets, dtype=np.int64))
+            # readers in other workers must never observe half-written files
+            os.replace(tmp_data, path / DATA_FILE_NAME)
+            os.replace(tmp_offsets, path / OFFSETS_FILE_NAME)
+        except BaseException:
+            for tmp in (tmp_data, tmp_offsets):
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(tmp)
+            raise
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def record(self, i: int) -> bytes:
+        return self._data[int(self._offsets[i]): int(self._offsets[i + 1])]
+
+    def row(self, i: int) -> Document:
+        record = json.loads(self.record(i))
+        return Document(page_content=record['page_content'], metadata=record['metadata'])
+
+    def search(self, search: str) -> typing.Union[str, Document]:
+        try:
+            i = int(search)
+        except ValueError:
+            return f'ID {search} not found.'
+        if not 0 <= i < len(self):
+            return f'ID {search} not found.'
+        return self.row(i)
+
+
+class RowDocstore(Docstore, AddableMixin):
+    """Writable docstore in FAISS row order: the saved documents stay in the mmap'd file, only documents added since
+    the last `write` are held as objects.
+
+    Replaces LangChain's pickled `InMemoryDocstore`, which keeps every document on the heap. Like `MmapDocstore`,
+    row `i` is stored under id `str(i)`, whatever ids `add` is given.
+    """
+
+    def __init__(self, path: typing.Optional[Path] = None):
+        self._saved = MmapDocstore(path) if path is not None and MmapDocstore.exists(path) else None
+        # rows of the saved file this docstore serves, all of them in order when None
+        self._saved_rows: typing.Optional[np.ndarray] = None
+        self._pending: typing.List[Document] = []
+
+    def __len__(self) -> int:
+        return self._saved_count() + len(self._pending)
+
+    def add(self, texts: typing.Dict[str, Document]):
+        self._pending.extend(texts.values())
+
+    def row(self, i: int) -> Document:
+        saved = self._saved_count()
+        if i >= saved:
+            return self._pending[i - saved]
+        return self._saved.row(self._saved_row(i))
+
+    def search(self, search: str) -> typing.Union[str, Document]:
+        try:
+            i = int(search)
+        except ValueError:
+            return f'ID {search} not found.'
+        if not 0 <= i < len(self):
+            return f'ID {search} not found.'
+        return self.row(i)
+
+    def compacted(self, keep: np.ndarray) -> 'RowDocstore':
+        """The kept rows, renumbered, without reading the saved documents."""
+        saved = self._saved_count()
+        compacted = RowDocstore()
+        compacted._saved = self._saved
+        compacted._saved_rows = np.array([self._saved_row(i) for i in keep[keep < saved]], dtype=np.int64)
+        compacted._pending = [self._pending[i - saved] for i in keep[keep >= saved]]
+        return compacted
+
+    def write(self, path: Path):
+        """Saves all rows and serves the saved ones from the new file, saved records are copied without decoding."""
+        saved = self._saved_count()
+        records = (
+            self._saved.record(self._saved_row(i)) if i < saved
+            else MmapDocstore.encode(str(i), self._pending[i - saved])
+            for i in range(len(self))
+        )
+        MmapDocstore.write_records(path, records)
+        self._saved, self._saved_rows, self._pending = MmapDocstore(path), None, []
+
+    def _saved_count(self) -> int:
+        if self._saved is None:
+            return 0
+        return len(self._saved) if self._saved_rows is None else len(self._saved_rows)
+
+    def _saved_row(self, i: int) -> int:
+        return i if self._saved_rows is None else int(self._saved_rows[i])
@@ -0,0 +1,68 @@
+import gzip
+import json
+import typing
+
+import msgpack
+import zstandard
+from fastapi import Response
+from vector_store_faissdb import metrics
+
+JSON_MEDIA_TYPE = 'application/json'
+MSGPACK_MEDIA_TYPE = 'application/x-msgpack'
+RESULT_FIELDS = ('id', 'content', 'metadata', 'score')
+# small bodies are not worth the compression latency
+MIN_COMPRESSED_BYTES = 1_024
+
+
+def parse_fields(fields: typing.Optional[str]) -> typing.Tuple[str, ...]:
+    """`fields=id,score,metadata` projection of search results, all fields when not given."""
+    if not fields:
+        return RESULT_FIELDS
+    projected = tuple(f.strip() for f in fields.split(',') if f.strip())
+    unknown = set(projected) - set(RESULT_FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown result fields: {", ".join(sorted(unknown))}')
+    return projected
+
+
+class Encoded(typing.NamedTuple):
+    """A serialized body, picklable unlike the response, for bodies encoded in search worker processes."""
+    body: bytes
+    media_type: str
+    headers: typing.Dict[str, str]
+
+    def response(self) -> Response:
+        return Response(content=self.body, media_type=self.media_type, headers=self.headers)
+
+
+def encode(payload: typing.Any, accept: typing.Optional[str] = None,
+           accept_encoding: typing.Optional[str] = None) -> Response:
+    """Serializes a response body as JSON or msgpack and compresses it with zstd or gzip, as the client accepts."""
+    with metrics.stage('serialization'):
+        return encode_body(payload, accept, accept_encoding).response()
+
+
+def encode_body(payload: typing.Any, accept: typing.Optional[str] = None,
+                accept_encoding: typing.Optional[str] = None) -> Encoded:
+    if _accepts(accept, MSGPACK_MEDIA_TYPE):
+        media_type, body = MSGPACK_MEDIA_TYPE, msgpack.packb(payload, use_bin_type=True)
+    else:
+        media_type, body = JSON_MEDIA_TYPE, json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    headers = {'Vary': 'Accept, Accept-Encoding'}
+    if len(body) >= MIN_COMPRESSED_BYTES:
+        if _accepts(accept_encoding, 'zstd'):
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+            headers['Content-Encoding'] = 'zstd'
+        elif _accepts(accept_encoding, 'gzip'):
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+    return Encoded(body, media_type, headers)
+
+
+def _accepts(header: typing.Optional[str], value: str) -> bool:
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip().lower() == value and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            return True
+    return False
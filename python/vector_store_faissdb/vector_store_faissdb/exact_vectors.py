@@ -0,0 +1,84 @@
+import os
+import typing
+from pathlib import Path
+
+import numpy as np
+
+FILE_NAME = 'vectors.f32'
+
+
+class ExactVectors:
+    """Uncompressed float32 copies of the indexed vectors, in FAISS row order.
+
+    Saved vectors live in a raw file that is memory-mapped, so re-ranking against a compressed index only pages in the
+    candidate rows; vectors added since the last save are kept in memory until `flush`.
+    """
+
+    def __init__(self, dim: int, path: typing.Optional[Path] = None):
+        self.dim = dim
+        self._mapped = np.empty((0, dim), dtype=np.float32)
+        self._pending = np.empty((0, dim), dtype=np.float32)
+        if path is not None and (path / FILE_NAME).exists() and (path / FILE_NAME).stat().st_size:
+            self._map(path)
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        return (path / FILE_NAME).exists()
+
+    def __len__(self) -> int:
+        return len(self._mapped) + len(self._pending)
+
+    def append(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        self._pending = np.concatenate([self._pending, vectors])
+
+    def flush(self, path: Path):
+        if not len(self._pending):
+            return
+        # append-only, so a save costs O(new vectors)
+        with open(path / FILE_NAME, 'ab') as f:
+            f.write(np.ascontiguousarray(self._pending).tobytes())
+        self._pending = np.empty((0, self.dim), dtype=np.float32)
+        self._map(path)
+
+    def compact(self, keep: np.ndarray, path: Path):
+        """Rewrites the saved file with only the `keep` rows, in order."""
+        rows = self.rows(keep)
+        tmp = path / f'{FILE_NAME}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(np.ascontiguousarray(rows).tobytes())
+        # replacing the file keeps the old mapping valid for searches that still hold it
+        os.replace(tmp, path / FILE_NAME)
+        self._pending = np.empty((0, self.dim), dtype=np.float32)
+        if len(rows):
+            self._map(path)
+        else:
+            self._mapped = np.empty((0, self.dim), dtype=np.float32)
+
+    @staticmethod
+    def truncate(path: Path, dim: int, size: int):
+        """Cuts the saved file down to its first `size` rows."""
+        if ExactVectors.exists(path) and (path / FILE_NAME).stat().st_size > size * dim * 4:
+            with open(path / FILE_NAME, 'r+b') as f:
+                f.truncate(size * dim * 4)
+
+    def rows(self, ids: np.ndarray) -> np.ndarray:
+        if not len(self._pending):
+            return np.asarray(self._mapped[ids])
+        mapped = ids < len(self._mapped)
+        rows = np.empty((len(ids), self.dim), dtype=np.float32)
+        rows[mapped] = self._mapped[ids[mapped]]
+        rows[~mapped] = self._pending[ids[~mapped] - len(self._mapped)]
+        return rows
+
+    def rerank(self, query: np.ndarray, candidates: np.ndarray, k: int) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """Exact squared L2 distances (the metric FAISS reports) of the candidate rows, best `k` first."""
+        candidates = candidates[candidates >= 0]
+        if not len(candidates):
+            return np.empty(0, dtype=np.float32), candidates
+        distances = ((self.rows(candidates) - query) ** 2).sum(axis=1)
+        order = np.argsort(distances)[:k]
+        return distances[order], candidates[order]
+
+    def _map(self, path: Path):
+        self._mapped = np.memmap(path / FILE_NAME, dtype=np.float32, mode='r').reshape(-1, self.dim)
@@ -0,0 +1,180 @@
+"""Copies published snapshots (see `snapshots`) from object storage or a directory to local disk.
+
+Every file is split in parts that are downloaded with concurrent ranged reads and written in place, then checked
+against the sizes and checksums published in files.json. Fetched snapshots are cached under the local root by version,
+which becomes a snapshot root itself: the local manifest only points at a snapshot once it is complete. The uvicorn
+workers of a task share the cache, a lock file lets one of them download while the others wait and find it cached.
+"""
+import contextlib
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+from loguru import logger
+from vector_store_faissdb import snapshots
+
+DEFAULT_PART_BYTES = 32 * 2 ** 20
+DEFAULT_WORKERS = 16
+LOCK_FILE_NAME = '.lock'
+
+
+class ChecksumMismatch(ValueError):
+    pass
+
+
+class DirectorySource:
+    """A snapshot root on a local or network file system."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def read_manifest(self) -> typing.Optional[snapshots.Manifest]:
+        return snapshots.read_manifest(self.root)
+
+    def files(self, manifest: snapshots.Manifest) -> typing.List[snapshots.SnapshotFile]:
+        return snapshots.read_files(manifest.resolve(self.root))
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        with open(self.root / key, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+
+
+class S3Source:
+    """A snapshot root under an S3 (or S3-compatible, set `endpoint_url`) prefix, e.g. s3://bucket/corpus."""
+
+    def __init__(self, url: str, client: typing.Any = None, endpoint_url: typing.Optional[str] = None):
+        parsed = urlparse(url)
+        self.bucket = parsed.netloc
+        self.prefix = parsed.path.strip('/')
+        if client is None:
+            import boto3
+
+            client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.client = client
+
+    def read_manifest(self) -> typing.Optional[snapshots.Manifest]:
+        try:
+            return snapshots.Manifest(**self._read_json(snapshots.MANIFEST_FILE_NAME))
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def files(self, manifest: snapshots.Manifest) -> typing.List[snapshots.SnapshotFile]:
+        return [snapshots.SnapshotFile(**f) for f in self._read_json(f'{manifest.path}/{snapshots.FILES_FILE_NAME}')]
+
+    def read_range(self, key: str, start: int, end: int) -> bytes:
+        res = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=f'bytes={start}-{end - 1}')
+        return res['Body'].read()
+
+    def _key(self, key: str) -> str:
+        return f'{self.prefix}/{key}' if self.prefix else key
+
+    def _read_json(self, key: str):
+        return json.loads(self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body'].read())
+
+
+def source_for(location: str, endpoint_url: typing.Optional[str] = None):
+    if location.startswith('s3://'):
+        return S3Source(location, endpoint_url=endpoint_url)
+    return DirectorySource(Path(location))
+
+
+class SnapshotFetcher:
+    def __init__(self, source, cache_root: Path, workers: int = DEFAULT_WORKERS,
+                 part_bytes: int = DEFAULT_PART_BYTES, keep: int = 2):
+        self.source = source
+        self.cache_root = Path(cache_root)
+        self.workers = workers
+        self.part_bytes = part_bytes
+        self.keep = keep
+
+    def fetch(self, manifest: typing.Optional[snapshots.Manifest] = None) -> typing.Optional[Path]:
+        """Fetches the snapshot of `manifest`, the source's current one by default, and returns its local path."""
+        manifest = manifest or self.source.read_manifest()
+        if manifest is None:
+            return None
+
+        target = manifest.resolve(self.cache_root)
+        with self._locked():
+            if not target.exists():
+                self._download(manifest, target)
+            else:
+                logger.info(f'Corpus snapshot {manifest.version} is cached at {str(target)}')
+
+            # a worker that read the source before a newer snapshot was fetched must not point the cache back
+            current = snapshots.read_manifest(self.cache_root)
+            if current is None or current.created_at <= manifest.created_at:
+                snapshots.write_manifest(self.cache_root, manifest)
+            snapshots.prune(self.cache_root, self.keep)
+        return target
+
+    @contextlib.contextmanager
+    def _locked(self):
+        self.cache_root.mkdir(parents=True, exist_ok=True)
+        # released when the file is closed, also if the worker dies while fetching
+        with open(self.cache_root / LOCK_FILE_NAME, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield
+
+    def _download(self, manifest: snapshots.Manifest, target: Path):
+        files = self.source.files(manifest)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # left behind by a fetch that crashed, fetches holding the lock never overlap
+        for stale in target.parent.glob(f'.{target.name}.*.tmp'):
+            shutil.rmtree(stale, ignore_errors=True)
+        tmp = Path(tempfile.mkdtemp(prefix=f'.{target.name}.', suffix='.tmp', dir=target.parent))
+
+        parts = []
+        for file in files:
+            # sized up front so parts can be written in any order
+            with open(tmp / file.name, 'wb') as f:
+                f.truncate(file.size)
+            parts.extend(
+                (file, start, min(start + self.part_bytes, file.size))
+                for start in range(0, file.size, self.part_bytes)
+            )
+
+        total = sum(f.size for f in files)
+        logger.info(f'Fetching corpus snapshot {manifest.version}: {len(files)} files, {total / 2 ** 20:.0f} MiB '
+                    f'in {len(parts)} parts')
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='snapshot-fetch') as pool:
+                list(pool.map(lambda part: self._fetch_part(manifest, tmp, *part), parts))
+                list(pool.map(lambda file: self._verify(tmp, file), files))
+            snapshots.write_files(tmp, files)
+            try:
+                os.replace(tmp, target)
+            except OSError:
+                # completed by a fetch outside the lock, snapshots are only renamed into place once verified
+                if not target.exists():
+                    raise
+                shutil.rmtree(tmp, ignore_errors=True)
+                logger.info(f'Corpus snapshot {manifest.version} was fetched to {str(target)} concurrently')
+                return
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        logger.info(f'Fetched corpus snapshot {manifest.version} to {str(target)}')
+
+    def _fetch_part(self, manifest: snapshots.Manifest, tmp: Path, file: snapshots.SnapshotFile, start: int,
+                    end: int):
+        data = self.source.read_range(f'{manifest.path}/{file.name}', start, end)
+        if len(data) != end - start:
+            raise ChecksumMismatch(f'Expected {end - start} bytes of {file.name} at {start}, got {len(data)}')
+        fd = os.open(tmp / file.name, os.O_WRONLY)
+        try:
+            os.pwrite(fd, data, start)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _verify(tmp: Path, file: snapshots.SnapshotFile):
+        actual = snapshots.sha256(tmp / file.name)
+        if actual != file.sha256:
+            raise ChecksumMismatch(f'Checksum mismatch for {file.name}: expected {file.sha256}, got {actual}')
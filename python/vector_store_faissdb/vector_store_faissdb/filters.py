@@ -0,0 +1,78 @@
+import os
+import typing
+from pathlib import Path
+
+import numpy as np
+from langchain.docstore.document import Document
+
+FILE_NAME = 'metadata_columns.npz'
+# rows whose publication year is unknown never match a year filter
+UNKNOWN_YEAR = 0
+
+
+class SearchFilters(typing.NamedTuple):
+    year_min: typing.Optional[int] = None
+    year_max: typing.Optional[int] = None
+    is_oa: typing.Optional[bool] = None
+
+    @property
+    def empty(self) -> bool:
+        return self.year_min is None and self.year_max is None and self.is_oa is None
+
+
+class MetadataColumns:
+    """Filterable document metadata as numpy columns in FAISS row order.
+
+    A filter becomes one vectorized comparison per column, the resulting row mask is handed to FAISS as an id selector.
+    """
+
+    def __init__(self, years: typing.Optional[np.ndarray] = None, is_oa: typing.Optional[np.ndarray] = None):
+        self.years = np.asarray(years if years is not None else [], dtype=np.int32)
+        self.is_oa = np.asarray(is_oa if is_oa is not None else [], dtype=bool)
+
+    @classmethod
+    def from_docs(cls, docs: typing.Iterable[Document]) -> 'MetadataColumns':
+        columns = cls()
+        columns.append(list(docs))
+        return columns
+
+    @classmethod
+    def load(cls, path: Path) -> typing.Optional['MetadataColumns']:
+        if not (path / FILE_NAME).exists():
+            return None
+        with np.load(str(path / FILE_NAME)) as columns:
+            return cls(columns['years'], columns['is_oa'])
+
+    def save(self, path: Path):
+        tmp = path / f'{FILE_NAME}.tmp.npz'
+        np.savez(str(tmp), years=self.years, is_oa=self.is_oa)
+        os.replace(tmp, path / FILE_NAME)
+
+    def __len__(self) -> int:
+        return len(self.years)
+
+    def append(self, docs: typing.Sequence[Document]):
+        self.years = np.concatenate([self.years, np.array([_year(d) for d in docs], dtype=np.int32)])
+        self.is_oa = np.concatenate([self.is_oa, np.array([bool(d.metadata.get('OA_LOCATION')) for d in docs])])
+
+    def compacted(self, keep: np.ndarray) -> 'MetadataColumns':
+        return MetadataColumns(self.years[keep], self.is_oa[keep])
+
+    def mask(self, filters: SearchFilters) -> typing.Optional[np.ndarray]:
+        if filters is None or filters.empty:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        if filters.year_min is not None:
+            mask &= self.years >= filters.year_min
+        if filters.year_max is not None:
+            mask &= (self.years <= filters.year_max) & (self.years != UNKNOWN_YEAR)
+        if filters.is_oa is not None:
+            mask &= self.is_oa == filters.is_oa
+        return mask
+
+
+def _year(doc: Document) -> int:
+    try:
+        return int(doc.metadata.get('PUBLICATION_YEAR') or UNKNOWN_YEAR)
+    except ValueError:
+        return UNKNOWN_YEAR
@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import typing
+from pathlib import Path
+
+import numpy as np
+from langchain.docstore.document import Document
+
+FILE_NAME = 'deleted_rows.npy'
+WORK_IDS_FILE_NAME = 'work_ids.json'
+KEYS_FILE_NAME = 'work_id_keys.npy'
+ROWS_FILE_NAME = 'work_id_rows.npy'
+WORK_ID_KEY = 'OPENALEX_ID'
+_WORK_ID_PATTERN = re.compile(r'^ID: (\S+)')
+
+
+def work_id(doc: Document) -> typing.Optional[str]:
+    """OpenAlex id of an indexed work, documents indexed before it was kept in metadata carry it in the content."""
+    if doc.metadata.get(WORK_ID_KEY):
+        return doc.metadata[WORK_ID_KEY]
+    match = _WORK_ID_PATTERN.match(doc.page_content)
+    return match.group(1) if match else None
+
+
+def find_sorted(keys: np.ndarray, key: bytes) -> typing.Optional[int]:
+    """Position of `key` in an ascending array of byte strings, a binary search only reads the pages on the way."""
+    if not len(keys) or len(key) > keys.dtype.itemsize:
+        return None
+    i = int(keys.searchsorted(np.array(key, dtype=keys.dtype)))
+    return i if i < len(keys) and keys[i] == key else None
+
+
+def unique_works(docs: typing.Sequence[Document]) -> typing.List[Document]:
+    """Keeps the last document of every work, documents without an id are all kept."""
+    last = {work_id(d): i for i, d in enumerate(docs)}
+    return [d for i, d in enumerate(docs) if work_id(d) is None or last[work_id(d)] == i]
+
+
+class WorkIdIndex:
+    """Sorted ids of the live works and their rows, memory-mapped so read-only workers share one copy of them."""
+
+    def __init__(self, keys: np.ndarray, rows: np.ndarray):
+        self._keys = keys
+        self._rows = rows
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        return (path / KEYS_FILE_NAME).exists() and (path / ROWS_FILE_NAME).exists()
+
+    @classmethod
+    def load(cls, path: Path) -> 'WorkIdIndex':
+        return cls(np.load(str(path / KEYS_FILE_NAME), mmap_mode='r'),
+                   np.load(str(path / ROWS_FILE_NAME), mmap_mode='r'))
+
+    @staticmethod
+    def save(path: Path, rows: typing.Dict[str, int]):
+        keys = np.array([_id.encode('utf-8') for _id in rows], dtype=bytes).reshape(-1)
+        order = np.argsort(keys, kind='stable')
+        for name, values in ((KEYS_FILE_NAME, keys[order]),
+                             (ROWS_FILE_NAME, np.fromiter(rows.values(), dtype=np.int64, count=len(rows))[order])):
+            tmp = path / f'{name}.tmp.npy'
+            np.save(str(tmp), values)
+            os.replace(tmp, path / name)
+
+    def row(self, _id: str) -> typing.Optional[int]:
+        i = find_sorted(self._keys, _id.encode('utf-8'))
+        return int(self._rows[i]) if i is not None else None
+
+
+class WorkIdMap:
+    """Maps OpenAlex work ids to the FAISS row holding their current version.
+
+    Upserting or deleting a work tombstones its old row, `live` is the mask searches are restricted to so results
+    never contain the same work twice. Read-only containers load the mask and resolve ids through a `WorkIdIndex`.
+    """
+
+    def __init__(self, work_ids: typing.Optional[typing.Sequence[typing.Optional[str]]] = None, size: int = 0,
+                 deleted_rows: typing.Iterable[int] = (), index: typing.Optional[WorkIdIndex] = None):
+        self._work_ids = list(work_ids) if work_ids is not None else None
+        self._index = index
+        self._live = np.ones(len(self._work_ids) if self._work_ids is not None else size, dtype=bool)
+        self._live[np.asarray(list(deleted_rows), dtype=np.int64)] = False
+        self._rows: typing.Dict[str, int] = {}
+        for row, _id in enumerate(self._work_ids or ()):
+            if _id is None or not self._live[row]:
+                continue
+            if _id in self._rows:
+                self._live[self._rows[_id]] = False
+            self._rows[_id] = row
+
+    @classmethod
+    def load(cls, path: Path, work_ids: typing.Optional[typing.Sequence[typing.Optional[str]]] = None,
+             size: int = 0, index: typing.Optional[WorkIdIndex] = None) -> 'WorkIdMap':
+        deleted_rows = np.load(str(path / FILE_NAME)) if (path / FILE_NAME).exists() else ()
+        return cls(work_ids, size=size, deleted_rows=deleted_rows, index=index)
+
+    @staticmethod
+    def load_work_ids(path: Path) -> typing.Optional[typing.List[typing.Optional[str]]]:
+        if not (path / WORK_IDS_FILE_NAME).exists():
+            return None
+        return json.loads((path / WORK_IDS_FILE_NAME).read_text())
+
+    def save(self, path: Path):
+        tmp = path / f'{FILE_NAME}.tmp.npy'
+        np.save(str(tmp), self.deleted_rows())
+        os.replace(tmp, path / FILE_NAME)
+        if self._work_ids is not None:
+            tmp = path / f'{WORK_IDS_FILE_NAME}.tmp'
+            tmp.write_text(json.dumps(self._work_ids))
+            os.replace(tmp, path / WORK_IDS_FILE_NAME)
+            WorkIdIndex.save(path, self._rows)
+
+    def __len__(self) -> int:
+        return int(self._live.sum())
+
+    def __contains__(self, _id: str) -> bool:
+        return self.row(_id) is not None
+
+    def row(self, _id: str) -> typing.Optional[int]:
+        if self._index is not None:
+            return self._index.row(_id)
+        return self._rows.get(_id)
+
+    @property
+    def live(self) -> np.ndarray:
+        return self._live
+
+    @property
+    def has_deleted(self) -> bool:
+        return not self._live.all()
+
+    def deleted_rows(self) -> np.ndarray:
+        return np.flatnonzero(~self._live)
+
+    def append(self, work_ids: typing.Sequence[typing.Optional[str]]) -> int:
+        """Registers rows appended to the index, returns how many of them replaced an existing work."""
+        replaced = 0
+        start = len(self._live)
+        self._live = np.concatenate([self._live, np.ones(len(work_ids), dtype=bool)])
+        self._work_ids.extend(work_ids)
+        for row, _id in enumerate(work_ids, start):
+            if _id is None:
+                continue
+            if _id in self._rows:
+                self._live[self._rows[_id]] = False
+                replaced += 1
+            self._rows[_id] = row
+        return replaced
+
+    def delete(self, work_ids: typing.Iterable[str]) -> int:
+        deleted = 0
+        for _id in work_ids:
+            row = self._rows.pop(_id, None)
+            if row is not None:
+                self._live[row] = False
+                deleted += 1
+        return deleted
+
+    def compacted(self) -> 'WorkIdMap':
+        """The map after tombstoned rows were physically removed from the index."""
+        return WorkIdMap([self._work_ids[i] for i in np.flatnonzero(self._live)])
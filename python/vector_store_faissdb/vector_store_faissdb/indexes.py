@@ -0,0 +1,110 @@
+import typing
+
+import numpy as np
+from langchain.vectorstores.faiss import dependable_faiss_import
+from loguru import logger
+
+FLAT_INDEX_FACTORY = 'Flat'
+
+
+def build_index(factory: str, vectors: np.ndarray, max_training_vectors: typing.Optional[int] = 100_000):
+    """Creates an index from a FAISS factory string (e.g. `Flat`, `IVF1024,Flat`, `HNSW32`) and trains it if needed.
+
+    Indexes that cannot be trained on the given vectors (e.g. fewer vectors than IVF lists) fall back to a flat index.
+    """
+    faiss = dependable_faiss_import()
+
+    index = faiss.index_factory(vectors.shape[1], factory or FLAT_INDEX_FACTORY, faiss.METRIC_L2)
+    if not index.is_trained:
+        training = vectors
+        if max_training_vectors and len(vectors) > max_training_vectors:
+            rng = np.random.default_rng(0)
+            training = vectors[rng.choice(len(vectors), max_training_vectors, replace=False)]
+        try:
+            index.train(training)
+        except RuntimeError as e:
+            logger.warning(f'Unable to train {factory} index on {len(vectors)} vectors, falling back to flat: {e}')
+            index = faiss.index_factory(vectors.shape[1], FLAT_INDEX_FACTORY, faiss.METRIC_L2)
+
+    return index
+
+
+def search_parameters(index, nprobe: typing.Optional[int] = None, ef_search: typing.Optional[int] = None,
+                      allowed: typing.Optional[np.ndarray] = None):
+    """Per-query search parameters, so tuning one request never changes the shared index state.
+
+    `allowed` is a boolean mask over the rows of the index, evaluated by FAISS while it scans.
+    """
+    faiss = dependable_faiss_import()
+
+    selector = {}
+    if allowed is not None:
+        bitmap = np.packbits(allowed, bitorder='little')
+        selector['sel'] = faiss.IDSelectorBitmap(len(allowed), faiss.swig_ptr(bitmap))
+
+    ivf = faiss.try_extract_index_ivf(index)
+    hnsw = faiss.downcast_index(index)
+    if ivf is not None and (nprobe or selector):
+        params = faiss.SearchParametersIVF(nprobe=int(nprobe or ivf.nprobe), **selector)
+    elif isinstance(hnsw, faiss.IndexHNSW) and (ef_search or selector):
+        params = faiss.SearchParametersHNSW(efSearch=int(ef_search or hnsw.hnsw.efSearch), **selector)
+    elif selector:
+        params = faiss.SearchParameters(**selector)
+    else:
+        return None
+
+    if selector:
+        # the selector only points into the bitmap
+        params.referenced_objects = [selector['sel'], bitmap]
+    return params
+
+
+def search_index(index, vectors: np.ndarray, k: int, nprobe: typing.Optional[int] = None,
+                 ef_search: typing.Optional[int] = None,
+                 allowed: typing.Optional[np.ndarray] = None) -> typing.Tuple[np.ndarray, np.ndarray]:
+    params = search_parameters(index, nprobe=nprobe, ef_search=ef_search, allowed=allowed)
+    if params is None:
+        return index.search(vectors, k)
+    try:
+        return index.search(vectors, k, params=params)
+    except RuntimeError:
+        # e.g. IndexPQ does not take search parameters
+        if allowed is None:
+            raise
+        return _search_post_filtered(index, vectors, k, allowed)
+
+
+def _search_post_filtered(index, vectors: np.ndarray, k: int,
+                          allowed: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+    fetch = k
+    while True:
+        fetch = min(index.ntotal, fetch * 4)
+        scores, indices = index.search(vectors, fetch)
+        keep = (indices >= 0) & allowed[np.clip(indices, 0, None)]
+        if fetch == index.ntotal or (keep.sum(axis=1) >= k).all():
+            break
+
+    found_scores = np.full((len(vectors), k), np.inf, dtype=np.float32)
+    found_indices = np.full((len(vectors), k), -1, dtype=np.int64)
+    for row, row_keep in enumerate(keep):
+        kept = np.flatnonzero(row_keep)[:k]
+        found_scores[row, :len(kept)] = scores[row, kept]
+        found_indices[row, :len(kept)] = indices[row, kept]
+    return found_scores, found_indices
+
+
+def index_memory_bytes(index) -> int:
+    """Approximate resident size of the vector codes and graph/list structures of an index."""
+    faiss = dependable_faiss_import()
+
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return index.ntotal * 8 + index_memory_bytes(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        return index.hnsw.neighbors.size() * 4 + index_memory_bytes(index.storage)
+    if isinstance(index, faiss.IndexIVF):
+        return index.ntotal * (index.code_size + 8) + index_memory_bytes(index.quantizer)
+    try:
+        return index.sa_code_size() * index.ntotal
+    except RuntimeError:
+        return 0
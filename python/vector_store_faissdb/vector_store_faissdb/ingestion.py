@@ -0,0 +1,201 @@
+import collections
+import dataclasses
+import queue
+import threading
+import time
+import typing
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from chatbot_validator.exceptions import ValidatorError
+from langchain.docstore.document import Document
+from loguru import logger
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+@dataclasses.dataclass
+class IngestionJob:
+    id: str
+    texts: typing.List[str]
+    state: str = QUEUED
+    texts_processed: int = 0
+    documents_found: int = 0
+    documents_indexed: int = 0
+    # near-duplicates of other works and works found again, see `CorpusContainer.add_documents`
+    documents_skipped: int = 0
+    errors: typing.List[str] = dataclasses.field(default_factory=list)
+    created_at: float = dataclasses.field(default_factory=time.time)
+    started_at: typing.Optional[float] = None
+    finished_at: typing.Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+    @property
+    def documents_per_sec(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return self.documents_indexed / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'job_id': self.id,
+            'state': self.state,
+            'texts': len(self.texts),
+            'texts_processed': self.texts_processed,
+            'documents_found': self.documents_found,
+            'documents_indexed': self.documents_indexed,
+            'documents_skipped': self.documents_skipped,
+            'documents_per_sec': self.documents_per_sec,
+            'errors': list(self.errors),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class IngestionPipeline:
+    """Background ingestion into a live corpus container.
+
+    Search workers run `CorpusChain` for each queued text, a single indexer thread gathers the resulting documents
+    across jobs into micro-batches so every batch costs one embedding call and one short write-locked append.
+    """
+
+    def __init__(self, container, search_workers: int = 4, batch_size: int = 256, batch_wait_sec: float = 0.5,
+                 save_to_disk: bool = False, max_finished_jobs: int = 1_000):
+        self._container = container
+        self._batch_size = batch_size
+        self._batch_wait_sec = batch_wait_sec
+        self._save_to_disk = save_to_disk
+        self._max_finished_jobs = max_finished_jobs
+
+        self._jobs: typing.Dict[str, IngestionJob] = collections.OrderedDict()
+        # documents of a job that were found but are not indexed yet
+        self._pending: typing.Dict[str, int] = collections.Counter()
+        self._lock = threading.Lock()
+        self._docs: queue.Queue = queue.Queue()
+        self._searchers = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix='ingestion-search')
+        self._stopped = threading.Event()
+        self._indexer = threading.Thread(target=self._index_loop, name='ingestion-indexer', daemon=True)
+        self._indexer.start()
+
+    def submit(self, texts: typing.List[str]) -> IngestionJob:
+        job = IngestionJob(id=uuid.uuid4().hex, texts=list(texts))
+        with self._lock:
+            self._jobs[job.id] = job
+            self._forget_finished_jobs()
+        if not job.texts:
+            self._finish_if_complete(job)
+        for text in job.texts:
+            self._searchers.submit(self._search, job, text)
+        return job
+
+    def get(self, job_id: str) -> typing.Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_depth(self) -> int:
+        # documents found by all jobs that wait for the indexer
+        return self._docs.qsize()
+
+    def stop(self, wait: bool = True):
+        self._searchers.shutdown(wait=wait)
+        self._stopped.set()
+        if wait:
+            self._indexer.join()
+            if self._save_to_disk:
+                self._container.checkpoint()
+
+    def _search(self, job: IngestionJob, text: str):
+        with self._lock:
+            if job.started_at is None:
+                job.state, job.started_at = RUNNING, time.time()
+
+        docs: typing.List[Document] = []
+        try:
+            docs = self._container.documents_for(text)
+        except ValidatorError:
+            logger.warning(f'No documents found for search term: {text[:100]}')
+        except Exception as e:
+            logger.exception(f'Unable to collect documents for: {text[:100]}')
+            with self._lock:
+                job.errors.append(str(e))
+
+        with self._lock:
+            job.texts_processed += 1
+            job.documents_found += len(docs)
+            self._pending[job.id] += len(docs)
+        for doc in docs:
+            self._docs.put((job, doc))
+        self._finish_if_complete(job)
+
+    def _index_loop(self):
+        while not (self._stopped.is_set() and self._docs.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._index_batch(batch)
+
+    def _next_batch(self) -> typing.List[typing.Tuple[IngestionJob, Document]]:
+        try:
+            batch = [self._docs.get(timeout=self._batch_wait_sec)]
+        except queue.Empty:
+            return []
+        # keep collecting until the batch is full or the window closes, whichever comes first
+        deadline = time.monotonic() + self._batch_wait_sec
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._docs.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _index_batch(self, batch: typing.List[typing.Tuple[IngestionJob, Document]]):
+        per_job = collections.Counter(job.id for job, _ in batch)
+        jobs = {job.id: job for job, _ in batch}
+        error = None
+        indexed: typing.Set[int] = set()
+        try:
+            added = self._container.add_documents([doc for _, doc in batch], save_to_disk=self._save_to_disk)
+            indexed = {id(doc) for doc in added}
+        except Exception as e:
+            logger.exception(f'Unable to index a batch of {len(batch)} documents')
+            error = str(e)
+
+        per_job_indexed = collections.Counter(job.id for job, doc in batch if id(doc) in indexed)
+        with self._lock:
+            for job_id, count in per_job.items():
+                self._pending[job_id] -= count
+                if error is None:
+                    jobs[job_id].documents_indexed += per_job_indexed[job_id]
+                    jobs[job_id].documents_skipped += count - per_job_indexed[job_id]
+                else:
+                    jobs[job_id].errors.append(error)
+        for job in jobs.values():
+            self._finish_if_complete(job)
+
+    def _finish_if_complete(self, job: IngestionJob):
+        with self._lock:
+            if job.finished or job.texts_processed < len(job.texts) or self._pending[job.id]:
+                return
+            self._finish_locked(job)
+        logger.info(f'Ingestion job {job.id} {job.state}: {job.documents_indexed} documents indexed')
+
+    def _finish_locked(self, job: IngestionJob):
+        job.state = FAILED if job.errors and not job.documents_indexed else DONE
+        job.finished_at = time.time()
+        job.started_at = job.started_at or job.finished_at
+        self._pending.pop(job.id, None)
+
+    def _forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self._max_finished_jobs)]:
+            del self._jobs[job_id]
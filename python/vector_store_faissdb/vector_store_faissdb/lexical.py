@@ -0,0 +1,245 @@
+import os
+import re
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from langchain.docstore.document import Document
+from vector_store_faissdb.id_map import find_sorted, work_id
+
+# uncompressed, so serving workers memory-map them and share the pages
+ARRAY_NAMES = ('terms', 'offsets', 'rows', 'tfs', 'lengths')
+# a single compressed file, before the postings were memory-mapped
+LEGACY_FILE_NAME = 'lexical_index.npz'
+
+VECTOR = 'vector'
+LEXICAL = 'lexical'
+HYBRID = 'hybrid'
+SEARCH_MODES = (VECTOR, LEXICAL, HYBRID)
+RRF = 'rrf'
+WEIGHTED = 'weighted'
+FUSIONS = (RRF, WEIGHTED)
+# constant of reciprocal rank fusion, dampens the weight of the very first ranks
+RRF_K = 60
+# each leg of a hybrid search contributes this many times `k` candidates to the fusion
+HYBRID_CANDIDATES_FACTOR = 2
+
+# gene names, acronyms and chemical identifiers (IL-6, BRCA1, C6H12O6, 2.5) stay one token, their parts are indexed too
+_TOKEN = re.compile(r'[^\W_]+(?:[-.][^\W_]+)*')
+_PARTS = re.compile(r'[-.]')
+_MAX_TOKEN_CHARS = 40
+# page_content always starts with 'ID: ... TITLE: ... ABSTRACT: ...'
+_STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'it', 'its', 'of',
+    'on', 'or', 'that', 'the', 'this', 'to', 'was', 'were', 'which', 'with', 'id', 'title', 'abstract',
+))
+
+_executor: ThreadPoolExecutor = None
+_executor_lock = threading.Lock()
+
+
+def tokenize(text: str) -> typing.List[str]:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if len(token) > _MAX_TOKEN_CHARS:
+            continue
+        if token not in _STOPWORDS:
+            tokens.append(token)
+        if '-' in token or '.' in token:
+            tokens.extend(p for p in _PARTS.split(token) if p and p not in _STOPWORDS)
+    return tokens
+
+
+def executor() -> ThreadPoolExecutor:
+    """Runs the lexical leg of hybrid searches, apart from the service executor the vector leg already occupies."""
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = int(os.environ.get('LEXICAL_SEARCH_WORKERS', 0)) or min(32, os.cpu_count() + 4)
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lexical-search')
+    return _executor
+
+
+class LexicalIndex:
+    """BM25 over the indexed documents, with postings in FAISS row order so deletes and filters apply as row masks.
+
+    Saved postings are kept as CSR arrays (sorted utf-8 terms, term offsets into rows and term frequencies), loaded
+    memory-mapped. Postings of documents added since the last save are kept in dicts until `save` merges them.
+    """
+
+    def __init__(self, terms: typing.Optional[np.ndarray] = None, offsets: typing.Optional[np.ndarray] = None,
+                 rows: typing.Optional[np.ndarray] = None, tfs: typing.Optional[np.ndarray] = None,
+                 lengths: typing.Optional[np.ndarray] = None, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._terms = terms if terms is not None else _encode([])
+        self._offsets = np.asarray(offsets if offsets is not None else [0], dtype=np.int64)
+        self._rows = np.asarray(rows if rows is not None else [], dtype=np.int32)
+        self._tfs = np.asarray(tfs if tfs is not None else [], dtype=np.float32)
+        self._lengths = np.asarray(lengths if lengths is not None else [], dtype=np.float32)
+        self._pending: typing.Dict[str, typing.Tuple[typing.List[int], typing.List[int]]] = {}
+
+    @classmethod
+    def from_docs(cls, docs: typing.Iterable[Document]) -> 'LexicalIndex':
+        index = cls()
+        index.append(list(docs))
+        return index
+
+    @classmethod
+    def load(cls, path: Path) -> typing.Optional['LexicalIndex']:
+        if all((path / _file_name(name)).exists() for name in ARRAY_NAMES):
+            return cls(*(np.load(str(path / _file_name(name)), mmap_mode='r') for name in ARRAY_NAMES))
+        if not (path / LEGACY_FILE_NAME).exists():
+            return None
+        with np.load(str(path / LEGACY_FILE_NAME)) as saved:
+            terms, offsets = saved['terms'].tolist(), saved['offsets']
+            term_ids = np.repeat(np.arange(len(terms)), np.diff(offsets))
+            return cls(*_csr(terms, term_ids, saved['rows'], saved['tfs']), saved['lengths'])
+
+    def save(self, path: Path):
+        terms, offsets, rows, tfs = self._merged()
+        for name, values in zip(ARRAY_NAMES, (terms, offsets, rows, tfs, self._lengths)):
+            tmp = path / f'{_file_name(name)}.tmp.npy'
+            np.save(str(tmp), values)
+            os.replace(tmp, path / _file_name(name))
+        (path / LEGACY_FILE_NAME).unlink(missing_ok=True)
+        self._terms, self._offsets, self._rows, self._tfs, self._pending = terms, offsets, rows, tfs, {}
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def memory_bytes(self) -> int:
+        pending = sum(len(rows) for rows, _ in self._pending.values()) * 16
+        saved = self._terms.nbytes + self._offsets.nbytes + self._rows.nbytes + self._tfs.nbytes
+        return saved + self._lengths.nbytes + pending
+
+    def append(self, docs: typing.Sequence[Document]):
+        lengths = []
+        for row, doc in enumerate(docs, start=len(self)):
+            tokens = tokenize(doc.page_content)
+            lengths.append(len(tokens))
+            terms, counts = np.unique(tokens, return_counts=True) if tokens else ((), ())
+            for term, count in zip(terms, counts):
+                rows, tfs = self._pending.setdefault(str(term), ([], []))
+                rows.append(row)
+                tfs.append(int(count))
+        self._lengths = np.concatenate([self._lengths, np.array(lengths, dtype=np.float32)])
+
+    def compacted(self, keep: np.ndarray) -> 'LexicalIndex':
+        terms, offsets, rows, tfs = self._merged()
+        renumbered = np.full(len(self), -1, dtype=np.int64)
+        renumbered[keep] = np.arange(len(keep))
+        term_ids = np.repeat(np.arange(len(terms)), np.diff(offsets))
+        kept = renumbered[rows] >= 0
+        counts = np.bincount(term_ids[kept], minlength=len(terms))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return LexicalIndex(terms, offsets, renumbered[rows[kept]], tfs[kept], self._lengths[keep], self.k1, self.b)
+
+    def search(self, query: str, k: int,
+               allowed: typing.Optional[np.ndarray] = None) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """BM25 scores and rows of the best `k` matching rows, best first."""
+        n = len(self)
+        scores = np.zeros(n, dtype=np.float32)
+        if not n:
+            return scores, np.empty(0, dtype=np.int64)
+        average_length = max(float(self._lengths.mean()), 1.0)
+        for term in set(tokenize(query)):
+            rows, tfs = self._postings(term)
+            if not len(rows):
+                continue
+            idf = np.log1p((n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[rows] / average_length)
+            # rows are unique within a term's postings
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        if allowed is not None:
+            scores[~allowed[:n]] = 0
+        matches = np.flatnonzero(scores > 0)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        order = np.argsort(-scores[matches], kind='stable')
+        return scores[matches[order]], matches[order]
+
+    def _postings(self, term: str) -> typing.Tuple[np.ndarray, np.ndarray]:
+        i = find_sorted(self._terms, term.encode('utf-8'))
+        rows = self._rows[self._offsets[i]:self._offsets[i + 1]] if i is not None else self._rows[:0]
+        tfs = self._tfs[self._offsets[i]:self._offsets[i + 1]] if i is not None else self._tfs[:0]
+        pending = self._pending.get(term)
+        if pending is None:
+            return rows, tfs
+        return (
+            np.concatenate([rows, np.array(pending[0], dtype=np.int32)]),
+            np.concatenate([tfs, np.array(pending[1], dtype=np.float32)]),
+        )
+
+    def _merged(self) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """The saved and pending postings as one CSR."""
+        if not self._pending:
+            return self._terms, self._offsets, self._rows, self._tfs
+        terms = [term.decode('utf-8') for term in self._terms.tolist()]
+        term_index = {term: i for i, term in enumerate(terms)}
+        term_ids = [np.repeat(np.arange(len(terms)), np.diff(self._offsets))]
+        rows, tfs = [self._rows], [self._tfs]
+        for term, (term_rows, term_tfs) in self._pending.items():
+            if term not in term_index:
+                term_index[term] = len(terms)
+                terms.append(term)
+            term_ids.append(np.full(len(term_rows), term_index[term]))
+            rows.append(np.array(term_rows, dtype=np.int32))
+            tfs.append(np.array(term_tfs, dtype=np.float32))
+        return _csr(terms, np.concatenate(term_ids), np.concatenate(rows), np.concatenate(tfs))
+
+
+def _file_name(name: str) -> str:
+    return f'lexical_{name}.npy'
+
+
+def _encode(terms: typing.Sequence[str]) -> np.ndarray:
+    return np.array([term.encode('utf-8') for term in terms], dtype=bytes).reshape(-1)
+
+
+def _csr(terms: typing.Sequence[str], term_ids: np.ndarray, rows: np.ndarray,
+         tfs: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Postings grouped by term, with the terms sorted so they are looked up by binary search."""
+    # code point order, the same as the order of the utf-8 bytes
+    order = np.argsort(np.array(terms, dtype=str).reshape(-1), kind='stable')
+    rank = np.empty(len(terms), dtype=np.int64)
+    rank[order] = np.arange(len(terms))
+    term_ids = rank[term_ids.astype(np.int64)]
+    # stable, so rows stay ascending within every term
+    postings = np.argsort(term_ids, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(terms)))]).astype(np.int64)
+    return _encode([terms[i] for i in order]), offsets, rows[postings], tfs[postings]
+
+
+def fuse(dense: typing.Sequence[typing.Tuple[Document, float]], lexical: typing.Sequence[typing.Tuple[Document, float]],
+         k: int, fusion: str = RRF,
+         vector_weight: float = 0.5) -> typing.List[typing.Tuple[Document, float]]:
+    """Merges the vector (L2 distances) and BM25 rankings of one query, fused scores are higher for better matches."""
+    if fusion == RRF:
+        dense_scores = [1.0 / (RRF_K + rank) for rank in range(1, len(dense) + 1)]
+        lexical_scores = [1.0 / (RRF_K + rank) for rank in range(1, len(lexical) + 1)]
+    elif fusion == WEIGHTED:
+        # min-max normalized to [0, 1], distances are negated so that 1 is the best match of both legs
+        dense_scores = _min_max([-score for _, score in dense])
+        lexical_scores = _min_max([score for _, score in lexical])
+    else:
+        raise ValueError(f'Unknown fusion {fusion}, expected one of {", ".join(FUSIONS)}')
+
+    fused: typing.Dict[str, typing.List] = {}
+    for weight, results, scores in ((vector_weight, dense, dense_scores), (1 - vector_weight, lexical, lexical_scores)):
+        for (doc, _), score in zip(results, scores):
+            entry = fused.setdefault(work_id(doc), [doc, 0.0])
+            entry[1] += weight * float(score)
+    return sorted(((doc, score) for doc, score in fused.values()), key=lambda r: -r[1])[:k]
+
+
+def _min_max(scores: typing.List[float]) -> np.ndarray:
+    scores = np.asarray(scores, dtype=np.float32)
+    if not len(scores):
+        return scores
+    spread = scores.max() - scores.min()
+    return (scores - scores.min()) / spread if spread else np.ones_like(scores)
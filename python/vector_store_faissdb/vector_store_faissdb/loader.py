@@ -0,0 +1,80 @@
+import threading
+import time
+import typing
+
+from loguru import logger
+
+PENDING = 'pending'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class LoadProgress:
+    """Where the corpus container is in its startup, reported by `/ready`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = PENDING
+        self.stage: typing.Optional[str] = None
+        self.stages_done: typing.List[str] = []
+        self.error: typing.Optional[str] = None
+        self.started_at: typing.Optional[float] = None
+        self.finished_at: typing.Optional[float] = None
+        self._stage_started_at: typing.Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def start(self):
+        with self._lock:
+            self.state, self.error, self.stages_done = LOADING, None, []
+            self.started_at, self.finished_at = time.time(), None
+
+    def enter(self, stage: str):
+        with self._lock:
+            self._finish_stage()
+            self.stage, self._stage_started_at = stage, time.time()
+        logger.info(f'Loading corpus container: {stage}')
+
+    def succeed(self):
+        with self._lock:
+            self._finish_stage()
+            self.state, self.finished_at = READY, time.time()
+        logger.info(f'Corpus container loaded in {self.finished_at - self.started_at:.1f}s')
+
+    def fail(self, error: Exception):
+        with self._lock:
+            self.state, self.error, self.finished_at = FAILED, str(error), time.time()
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                'state': self.state,
+                'stage': self.stage,
+                'stages_done': list(self.stages_done),
+                'elapsed_sec': end - self.started_at if self.started_at else 0.0,
+                'error': self.error,
+            }
+
+    def _finish_stage(self):
+        if self.stage is not None:
+            self.stages_done.append(self.stage)
+            self.stage = None
+
+
+def load_in_background(load: typing.Callable[[], typing.Any]) -> threading.Thread:
+    """Runs `load` on a daemon thread so the server starts answering liveness checks right away."""
+
+    def run():
+        try:
+            load()
+        except Exception:
+            # `load` records the failure in its progress, requests retry the load lazily
+            logger.exception('Unable to load corpus container in the background')
+
+    thread = threading.Thread(target=run, name='corpus-loader', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,159 @@
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import time
+import typing
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+STAGES = ('embedding', 'search', 'serialization')
+_LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+# requests that are not worth a CloudWatch data point each
+_SILENT_ENDPOINTS = ('/health', '/ready', '/metrics')
+
+REQUEST_LATENCY = Histogram(
+    'vector_store_request_seconds', 'End-to-end request latency', ['endpoint'], buckets=_LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    'vector_store_stage_seconds', 'Latency of the embedding, FAISS search and serialization stages', ['stage'],
+    buckets=_LATENCY_BUCKETS,
+)
+SEARCH_BATCH_SIZE = Histogram(
+    'vector_store_search_batch_size', 'Concurrent similarity searches served by one micro-batch',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+SEARCHES = Counter(
+    'vector_store_searches', 'Similarity searches by how they were answered: searched, coalesced or cached',
+    ['outcome'],
+)
+IN_FLIGHT = Gauge('vector_store_in_flight_requests', 'Requests being served', multiprocess_mode='livesum')
+QUEUED = Gauge('vector_store_queued_requests', 'Requests waiting for admission', multiprocess_mode='livesum')
+SHED_REQUESTS = Counter(
+    'vector_store_shed_requests', 'Requests rejected by admission control, by reason', ['reason'],
+)
+SKIPPED_NEAR_DUPLICATES = Counter(
+    'vector_store_skipped_near_duplicates', 'Works not indexed because they nearly duplicate a kept one',
+)
+CORPUS_SIZE = Gauge('vector_store_corpus_size', 'Searchable works in the index', multiprocess_mode='liveall')
+INDEX_BYTES = Gauge('vector_store_index_bytes', 'Approximate index memory', multiprocess_mode='liveall')
+EMBEDDING_CACHE_REQUESTS = Gauge(
+    'vector_store_embedding_cache_requests', 'Embedding cache lookups by outcome', ['outcome'],
+    multiprocess_mode='liveall',
+)
+EMBEDDING_CACHE_HIT_RATIO = Gauge(
+    'vector_store_embedding_cache_hit_ratio', 'Embedding cache hits over lookups', multiprocess_mode='liveall',
+)
+
+# requests of this process, the event loop is the only writer
+_in_flight = 0
+# stage timings of the current request, for its EMF record
+_request_stages: contextvars.ContextVar[typing.Optional[typing.Dict[str, float]]] = contextvars.ContextVar(
+    'request_stages', default=None,
+)
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(name).observe(elapsed)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+
+
+@contextlib.contextmanager
+def request(endpoint: typing.Callable[[], str]):
+    """Tracks one request, `endpoint` is resolved afterwards because the route is only known once it was served."""
+    global _in_flight
+
+    token = _request_stages.set({})
+    start = time.perf_counter()
+    _in_flight += 1
+    IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        IN_FLIGHT.dec()
+        in_flight, _in_flight = _in_flight, _in_flight - 1
+        elapsed = time.perf_counter() - start
+        name = endpoint()
+        REQUEST_LATENCY.labels(name).observe(elapsed)
+        if emf_enabled() and name not in _SILENT_ENDPOINTS:
+            write_emf(name, elapsed, in_flight, _request_stages.get())
+        _request_stages.reset(token)
+
+
+def update_corpus(footprint: typing.Dict[str, typing.Any], corpus_size: int, cache_stats: dict):
+    CORPUS_SIZE.set(corpus_size)
+    INDEX_BYTES.set(footprint['index_bytes'])
+    for outcome in ('lru_hits', 'disk_hits', 'redis_hits', 'misses'):
+        EMBEDDING_CACHE_REQUESTS.labels(outcome).set(cache_stats.get(outcome, 0))
+    EMBEDDING_CACHE_HIT_RATIO.set(cache_stats.get('hit_ratio', 0.0))
+
+
+def exposition() -> typing.Tuple[bytes, str]:
+    # uvicorn workers are separate processes, with PROMETHEUS_MULTIPROC_DIR set every scrape sums them up
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    # live gauges of a stopped worker would otherwise be summed up until the directory is wiped at the next start
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def emf_enabled() -> bool:
+    return os.environ.get('VECTOR_STORE_EMF', '0') == '1'
+
+
+def write_emf(endpoint: str, elapsed: float, in_flight: int, stages: typing.Optional[typing.Dict[str, float]]):
+    """One CloudWatch embedded metric format record per request, extracted by CloudWatch Logs from stdout."""
+    values = {'RequestLatency': elapsed * 1_000, 'InFlightRequests': in_flight}
+    for name, seconds in (stages or {}).items():
+        values[f'{name.capitalize()}Latency'] = seconds * 1_000
+    _write_emf_record({'Endpoint': endpoint}, values, counts=('InFlightRequests',))
+
+
+def write_admission_emf(queued: int, admitted: int):
+    """Periodic admission record of a worker, written when idle too so autoscaling alarms always have data."""
+    _write_emf_record({}, {'QueuedRequests': queued, 'AdmittedRequests': admitted},
+                      counts=('QueuedRequests', 'AdmittedRequests'))
+
+
+def _write_emf_record(dimensions: typing.Dict[str, str], values: typing.Dict[str, float],
+                      counts: typing.Tuple[str, ...]):
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1_000),
+            'CloudWatchMetrics': [{
+                'Namespace': os.environ.get('VECTOR_STORE_EMF_NAMESPACE', 'ChatbotVectorStore'),
+                'Dimensions': [list(dimensions)],
+                'Metrics': [
+                    {'Name': name, 'Unit': 'Count' if name in counts else 'Milliseconds'}
+                    for name in values
+                ],
+            }],
+        },
+        **dimensions,
+        **values,
+    }
+    sys.stdout.write(json.dumps(record) + '\n')
+    sys.stdout.flush()
@@ -0,0 +1,44 @@
+import typing
+
+import numpy as np
+from langchain.docstore.document import Document
+
+# candidates retrieved per result that MMR chooses from
+MMR_FETCH_FACTOR = 4
+
+
+def mmr(relevance: np.ndarray, vectors: np.ndarray, k: int, lambda_mult: float = 0.5) -> np.ndarray:
+    """Greedy maximal marginal relevance, positions of the `k` candidates picked, in the order they were picked.
+
+    `relevance` is normalized to [0, 1] and traded off against the cosine similarity to the closest pick so far,
+    which is updated with one vectorized max per pick instead of recomputed over all picks.
+    """
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    relevance = np.asarray(relevance, dtype=np.float32)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread else np.ones_like(relevance)
+    unit = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = unit @ unit.T
+
+    picked = [int(np.argmax(relevance))]
+    closest = similarity[picked[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[picked[0]] = False
+    for _ in range(1, k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * closest
+        scores[~available] = -np.inf
+        i = int(np.argmax(scores))
+        picked.append(i)
+        available[i] = False
+        np.maximum(closest, similarity[i], out=closest)
+    return np.array(picked, dtype=np.int64)
+
+
+def relevance_of(results: typing.Sequence[typing.Tuple[Document, float]], distances: bool) -> np.ndarray:
+    """Higher-is-better relevance of search results, vector searches report L2 distances."""
+    scores = np.array([score for _, score in results], dtype=np.float32)
+    return -scores if distances else scores
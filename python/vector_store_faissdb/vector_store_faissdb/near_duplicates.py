@@ -0,0 +1,137 @@
+"""MinHash signatures of indexed abstracts and LSH lookups of the near-duplicates of incoming ones.
+
+Preprints and their published versions, corrections and reprints share most of their word 3-grams, so the Jaccard
+similarity of their shingle sets is high. Signatures are split in `BANDS` bands, two documents become candidates when
+any band matches (likely from a Jaccard similarity of ~0.7 on) and duplicates when their signatures agree on at least
+`threshold` of the values. Translations share no shingles and are not found.
+"""
+import os
+import re
+import typing
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+FILE_NAME = 'minhash_signatures.npy'
+NUM_PERM = 128
+BANDS = 16
+SHINGLE_WORDS = 3
+# shorter texts are too short to tell a duplicate from a shared phrase
+MIN_WORDS = 20
+
+_ID_PREFIX = re.compile(r'^ID: \S+ ')
+_WORDS = re.compile(r'\w+')
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_rng = np.random.default_rng(20_230_601)
+# universal hash permutations, fixed so saved signatures stay comparable
+_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 1 << 63, NUM_PERM // BANDS, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+
+def signature(text: str) -> typing.Optional[np.ndarray]:
+    """MinHash of the word 3-grams of a document's title and abstract, None for documents too short to compare."""
+    # the OpenAlex id differs between versions of a work
+    words = _WORDS.findall(_ID_PREFIX.sub('', text, count=1).lower())
+    if len(words) < MIN_WORDS:
+        return None
+    grams = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+    # hashes and coefficients are below 2 ** 32, products stay within uint64
+    return (((hashes[:, None] * _A + _B) % _PRIME) & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    # wrapping multiply-add, a hash of the values of each band
+    bands = signatures.astype(np.uint64).reshape(len(signatures), BANDS, NUM_PERM // BANDS)
+    return (bands * _BAND_MIX).sum(axis=2)
+
+
+def similar(a: np.ndarray, b: np.ndarray, threshold: float) -> bool:
+    # the share of equal MinHash values estimates the Jaccard similarity
+    return bool(np.count_nonzero(a == b) >= threshold * NUM_PERM)
+
+
+def canonical(signatures: typing.Sequence[typing.Optional[np.ndarray]], threshold: float) -> typing.List[int]:
+    """For every signature, the position of the first one among `signatures` it duplicates (itself if none)."""
+    representatives = list(range(len(signatures)))
+    buckets: typing.Dict[typing.Tuple[int, int], typing.List[int]] = {}
+    comparable = [i for i, s in enumerate(signatures) if s is not None]
+    keys = band_keys(_stack([signatures[i] for i in comparable]))
+    for i, row_keys in zip(comparable, keys.tolist()):
+        band_buckets = [buckets.setdefault((band, key), []) for band, key in enumerate(row_keys)]
+        for j in sorted({j for bucket in band_buckets for j in bucket}):
+            if similar(signatures[i], signatures[j], threshold):
+                representatives[i] = j
+                break
+        else:
+            # only kept documents represent a cluster, so every duplicate maps to a kept one
+            for bucket in band_buckets:
+                bucket.append(i)
+    return representatives
+
+
+def _stack(signatures: typing.Sequence[typing.Optional[np.ndarray]]) -> np.ndarray:
+    # documents without a signature keep their row as an all-max placeholder
+    return np.array([_EMPTY if s is None else s for s in signatures], dtype=np.uint32).reshape(-1, NUM_PERM)
+
+
+class NearDuplicateIndex:
+    """MinHash signatures of the indexed documents in row order, with the LSH band keys of those that have one."""
+
+    def __init__(self, signatures: typing.Optional[np.ndarray] = None, threshold: float = 0.8):
+        self.threshold = threshold
+        self._signatures = signatures if signatures is not None else np.empty((0, NUM_PERM), dtype=np.uint32)
+        # placeholders are left out, they would all collide with each other in every band
+        self._rows = np.flatnonzero((self._signatures != _EMPTY).any(axis=1))
+        self._keys = band_keys(self._signatures[self._rows])
+
+    @classmethod
+    def load(cls, path: Path, threshold: float = 0.8) -> typing.Optional['NearDuplicateIndex']:
+        if not (path / FILE_NAME).exists():
+            return None
+        return cls(np.load(str(path / FILE_NAME)), threshold)
+
+    def save(self, path: Path):
+        tmp = path / f'{FILE_NAME}.tmp.npy'
+        np.save(str(tmp), self._signatures)
+        os.replace(tmp, path / FILE_NAME)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def append(self, signatures: typing.Sequence[typing.Optional[np.ndarray]]):
+        comparable = [i for i, s in enumerate(signatures) if s is not None]
+        self._rows = np.concatenate([self._rows, len(self) + np.asarray(comparable, dtype=np.int64)])
+        self._keys = np.concatenate([self._keys, band_keys(_stack([signatures[i] for i in comparable]))])
+        self._signatures = np.concatenate([self._signatures, _stack(signatures)])
+
+    def compacted(self, keep: np.ndarray) -> 'NearDuplicateIndex':
+        return NearDuplicateIndex(self._signatures[keep], self.threshold)
+
+    def duplicates(self, signatures: typing.Sequence[typing.Optional[np.ndarray]],
+                   allowed: typing.Optional[np.ndarray] = None) -> typing.List[typing.Optional[int]]:
+        """For every signature, an indexed row (among the `allowed` ones) it duplicates or None."""
+        matches: typing.List[typing.Optional[int]] = [None] * len(signatures)
+        comparable = [i for i, s in enumerate(signatures) if s is not None]
+        if not len(self._rows) or not comparable:
+            return matches
+        keys = band_keys(_stack([signatures[i] for i in comparable]))
+        candidates = set()
+        for band in range(BANDS):
+            positions = np.flatnonzero(np.isin(self._keys[:, band], keys[:, band]))
+            if not len(positions):
+                continue
+            by_key: typing.Dict[int, typing.List[int]] = {}
+            for i, key in zip(comparable, keys[:, band].tolist()):
+                by_key.setdefault(key, []).append(i)
+            candidates.update((i, int(self._rows[p])) for p in positions for i in by_key[int(self._keys[p, band])])
+        for i, row in sorted(candidates):
+            if matches[i] is not None or (allowed is not None and not allowed[row]):
+                continue
+            if similar(signatures[i], self._signatures[row], self.threshold):
+                matches[i] = row
+        return matches
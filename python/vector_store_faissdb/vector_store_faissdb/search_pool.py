@@ -0,0 +1,74 @@
+"""Search worker processes that share the read-only index of the front end through mmap.
+
+The front end (a uvicorn worker) keeps taking requests and dispatches their searches to the pool. Every worker process
+opens the snapshot the front end serves read-only, and embeds, searches and serializes on its own GIL. The index codes,
+documents, work ids and BM25 postings are mapped from the snapshot files, so their pages are in the page cache once for
+all processes; only the metadata columns, the tombstone mask and the interpreter itself take memory per process.
+"""
+import asyncio
+import multiprocessing
+import typing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from loguru import logger
+
+# the front end runs threads (executors, watchers), forking it could copy a held lock into the workers
+_MP_CONTEXT = 'spawn'
+
+# the container of each worker process, opened by `_init_worker`
+_container = None
+
+
+def _init_worker(load: typing.Callable[[Path, typing.Optional[str]], typing.Any], local_path: Path,
+                 version: typing.Optional[str]):
+    global _container
+
+    _container = load(local_path, version)
+
+
+def _call(fn: typing.Callable, local_path: Path, version: typing.Optional[str], *args):
+    if (_container.local_path, _container.version) != (local_path, version):
+        # the front end swapped in another snapshot since this worker opened its copy
+        _container.load_snapshot(local_path, version)
+    return fn(_container, *args)
+
+
+class SearchPool:
+    """Runs `fn(container, *args)` in one of `workers` processes, each holding the container `load` opens.
+
+    `load` and `fn` are pickled by reference, they have to be module-level functions. Calls carry the snapshot the
+    front end serves, workers follow its hot swaps before they search.
+    """
+
+    def __init__(self, workers: int, load: typing.Callable[[Path, typing.Optional[str]], typing.Any],
+                 local_path: Path, version: typing.Optional[str] = None):
+        self.workers = workers
+        self._load = load
+        self._executor = self._start(local_path, version)
+
+    def _start(self, local_path: Path, version: typing.Optional[str]) -> ProcessPoolExecutor:
+        logger.info(f'Starting {self.workers} search worker processes on {str(local_path)}')
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(_MP_CONTEXT),
+            initializer=_init_worker,
+            initargs=(self._load, local_path, version),
+        )
+
+    def submit(self, fn: typing.Callable, container, *args) -> Future:
+        return self._executor.submit(_call, fn, container.local_path, container.version, *args)
+
+    async def run(self, fn: typing.Callable, container, *args):
+        try:
+            return await asyncio.wrap_future(self.submit(fn, container, *args))
+        except BrokenProcessPool:
+            # a worker died (e.g. OOM killed), the pool takes no more work, later calls get a new one
+            logger.exception('Search worker process died, restarting the pool')
+            broken, self._executor = self._executor, self._start(container.local_path, container.version)
+            broken.shutdown(wait=False)
+            raise
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
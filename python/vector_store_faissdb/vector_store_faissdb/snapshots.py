@@ -0,0 +1,201 @@
+"""Immutable, versioned copies of a saved store and the manifest that points read-only replicas at one of them.
+
+    <root>/manifest.json             {"version": ..., "path": "snapshots/<version>", "created_at": ...}
+    <root>/snapshots/<version>/      index.faiss, docstore, work ids, metadata columns, ...
+    <root>/snapshots/<version>/files.json   size and sha256 of every file, for fetchers to verify their copies
+
+    python -m vector_store_faissdb.snapshots <root> <saved store>
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import typing
+import uuid
+from pathlib import Path
+
+from loguru import logger
+from vector_store_faissdb.docstore import LOCK_FILE_NAME as DOCSTORE_LOCK_FILE_NAME
+from vector_store_faissdb.wal import (
+    CHECKPOINT_FILE_NAME,
+    COMMITTED_DIR_NAME,
+)
+from vector_store_faissdb.wal import FILE_NAME as WAL_FILE_NAME
+from vector_store_faissdb.wal import STAGING_DIR_NAME, WriteAheadLog
+
+MANIFEST_FILE_NAME = 'manifest.json'
+FILES_FILE_NAME = 'files.json'
+SNAPSHOTS_DIR = 'snapshots'
+_CHUNK_BYTES = 8 * 2 ** 20
+# write-ahead state, checkpoints in progress and lock files only matter to the writer, replicas serve checkpoints
+_EXCLUDED_FILES = (WAL_FILE_NAME, CHECKPOINT_FILE_NAME, STAGING_DIR_NAME, COMMITTED_DIR_NAME, DOCSTORE_LOCK_FILE_NAME)
+
+
+class SnapshotFile(typing.NamedTuple):
+    name: str
+    size: int
+    sha256: str
+
+
+class Manifest(typing.NamedTuple):
+    version: str
+    path: str
+    created_at: float
+
+    def resolve(self, root: Path) -> Path:
+        return root / self.path
+
+
+def read_manifest(root: Path) -> typing.Optional[Manifest]:
+    try:
+        with open(root / MANIFEST_FILE_NAME) as f:
+            return Manifest(**json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_files(snapshot: Path) -> typing.List[SnapshotFile]:
+    with open(snapshot / FILES_FILE_NAME) as f:
+        return [SnapshotFile(**entry) for entry in json.load(f)]
+
+
+def write_files(snapshot: Path, files: typing.Optional[typing.List[SnapshotFile]] = None):
+    if files is None:
+        files = [
+            SnapshotFile(p.name, p.stat().st_size, sha256(p))
+            for p in sorted(snapshot.iterdir()) if p.is_file() and p.name != FILES_FILE_NAME
+        ]
+    with open(snapshot / FILES_FILE_NAME, 'w') as f:
+        json.dump([file._asdict() for file in files], f)
+
+
+def write_manifest(root: Path, manifest: Manifest):
+    tmp = root / f'{MANIFEST_FILE_NAME}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest._asdict(), f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, root / MANIFEST_FILE_NAME)
+
+
+def live_path(root: Path) -> typing.Tuple[Path, typing.Optional[str]]:
+    """The directory to serve and its version, stores without a manifest are served in place."""
+    manifest = read_manifest(root)
+    if manifest is None:
+        return root, None
+    return manifest.resolve(root), manifest.version
+
+
+def new_version() -> str:
+    # sortable by creation time, the suffix keeps two publishes within a second apart
+    return f'{time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())}-{uuid.uuid4().hex[:8]}'
+
+
+def publish(root: Path, source: Path, version: typing.Optional[str] = None, keep: int = 3) -> Manifest:
+    """Copies a checkpointed store into a new snapshot directory and points the manifest at it."""
+    if WriteAheadLog.exists(source):
+        logger.warning(f'Write-ahead log at {str(source)} is not part of the snapshot, checkpoint the store first')
+
+    version = version or new_version()
+    target = root / SNAPSHOTS_DIR / version
+    if target.exists():
+        raise FileExistsError(f'Snapshot {version} already exists at {str(target)}')
+
+    # copied next to its final name and renamed, replicas never see a partial snapshot
+    tmp = root / SNAPSHOTS_DIR / f'.{version}.tmp'
+    shutil.copytree(source, tmp, ignore=shutil.ignore_patterns(*_EXCLUDED_FILES))
+    write_files(tmp)
+    os.replace(tmp, target)
+    # copytree keeps the source's mtime, prune orders snapshots by the time they were published
+    os.utime(target)
+
+    manifest = Manifest(version=version, path=f'{SNAPSHOTS_DIR}/{version}', created_at=time.time())
+    write_manifest(root, manifest)
+    logger.info(f'Published corpus snapshot {version} at {str(target)}')
+
+    prune(root, keep)
+    return manifest
+
+
+def prune(root: Path, keep: int):
+    """Deletes all but the `keep` newest snapshots, replicas that lag a few versions behind still find theirs."""
+    manifest = read_manifest(root)
+    snapshots = sorted(
+        (p for p in (root / SNAPSHOTS_DIR).iterdir() if p.is_dir() and not p.name.startswith('.')),
+        key=lambda p: p.stat().st_mtime,
+    )
+    for path in snapshots[:-keep] if keep else []:
+        if manifest and path.name == manifest.version:
+            continue
+        shutil.rmtree(path)
+        logger.info(f'Deleted corpus snapshot {path.name}')
+
+
+class SnapshotWatcher:
+    """Polls the manifest and hands new versions to `swap`, a failed version is not retried until it changes.
+
+    With a `source` (see `fetcher`) the remote manifest is polled instead of the one under `root`.
+    """
+
+    def __init__(self, root: Path, current_version: typing.Callable[[], typing.Optional[str]],
+                 swap: typing.Callable[[Manifest], None], interval_sec: float = 30.0, source=None):
+        self.root = root
+        self.source = source
+        self.interval_sec = interval_sec
+        self._current_version = current_version
+        self._swap = swap
+        self._failed_version: typing.Optional[str] = None
+        self._stopped = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='snapshot-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def check(self) -> bool:
+        """Swaps in the manifest's snapshot if it is not the one being served, True if it did."""
+        manifest = self.source.read_manifest() if self.source else read_manifest(self.root)
+        if manifest is None or manifest.version in (self._current_version(), self._failed_version):
+            return False
+        try:
+            self._swap(manifest)
+            return True
+        except Exception:
+            logger.exception(f'Unable to swap in corpus snapshot {manifest.version}')
+            self._failed_version = manifest.version
+            return False
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_sec):
+            self.check()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('root', type=Path, help='directory holding the manifest and the snapshots')
+    parser.add_argument('source', type=Path, help='checkpointed store to publish')
+    parser.add_argument('--version', help='defaults to the current UTC time')
+    parser.add_argument('--keep', type=int, default=3, help='snapshots to keep, including the new one')
+    args = parser.parse_args(argv)
+
+    print(publish(args.root, args.source, version=args.version, keep=args.keep).version)
+
+
+if __name__ == '__main__':
+    main()
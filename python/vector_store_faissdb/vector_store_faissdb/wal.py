@@ -0,0 +1,173 @@
+import json
+import os
+import shutil
+import struct
+import typing
+import zlib
+from pathlib import Path
+
+import numpy as np
+from langchain.docstore.document import Document
+from loguru import logger
+
+FILE_NAME = 'wal.log'
+CHECKPOINT_FILE_NAME = 'checkpoint.json'
+# checkpoints are written here first and committed by renaming the directory to COMMITTED_DIR_NAME
+STAGING_DIR_NAME = '.checkpoint.tmp'
+COMMITTED_DIR_NAME = '.checkpoint'
+ADD = 0
+DELETE = 1
+# crc32 of the payload, operation, sequence number, rows, dimension, length of the JSON part of the payload
+_HEADER = struct.Struct('<IBQIII')
+
+
+class WalRecord(typing.NamedTuple):
+    seq: int
+    op: int
+    vectors: np.ndarray
+    # added documents for ADD records, removed work ids for DELETE records
+    docs: typing.List[Document]
+    work_ids: typing.List[str]
+
+
+class WriteAheadLog:
+    """Append-only log of the changes made since the last checkpoint.
+
+    Records are numbered and every checkpoint stores the last number it includes, so records that already made it
+    into a checkpoint are skipped on replay. A torn record at the tail (crash mid-append) fails its checksum and is cut
+    off.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._file = path / FILE_NAME
+        self.seq = 0
+        # rows appended since the last checkpoint
+        self.rows = 0
+        # adds and deletes logged since the last checkpoint
+        self.records = 0
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        return (path / FILE_NAME).exists() and bool((path / FILE_NAME).stat().st_size)
+
+    def append(self, vectors: np.ndarray, docs: typing.List[Document]):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        encoded = json.dumps([{'page_content': d.page_content, 'metadata': d.metadata} for d in docs]).encode('utf-8')
+        self._write(ADD, vectors, encoded)
+        self.rows += len(docs)
+
+    def delete(self, work_ids: typing.List[str]):
+        self._write(DELETE, np.empty((0, 0), dtype=np.float32), json.dumps(list(work_ids)).encode('utf-8'))
+
+    def replay(self) -> typing.Iterator[WalRecord]:
+        self.seq = self._checkpoint_seq()
+        self.rows = 0
+        self.records = 0
+        if not self._file.exists():
+            return
+        with open(self._file, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        while offset < len(data):
+            read = self._read_record(data, offset)
+            if read is None:
+                logger.warning(f'Truncating torn write-ahead log record at byte {offset} of {str(self._file)}')
+                with open(self._file, 'r+b') as f:
+                    f.truncate(offset)
+                break
+            offset, record = read
+            if record.seq <= self.seq:
+                # the checkpoint was written but the log was not reset
+                continue
+            self.seq = record.seq
+            self.rows += len(record.docs)
+            self.records += 1
+            yield record
+
+    def write_checkpoint(self, path: Path):
+        """Records in the checkpoint being written at `path` that it holds every logged change."""
+        (path / CHECKPOINT_FILE_NAME).write_text(json.dumps({'seq': self.seq}))
+
+    def reset(self):
+        """Empties the log, once the checkpoint holding its changes is in place."""
+        with open(self._file, 'wb') as f:
+            os.fsync(f.fileno())
+        self.rows = 0
+        self.records = 0
+
+    def _checkpoint_seq(self) -> int:
+        if not (self._path / CHECKPOINT_FILE_NAME).exists():
+            return 0
+        return json.loads((self._path / CHECKPOINT_FILE_NAME).read_text())['seq']
+
+    def _write(self, op: int, vectors: np.ndarray, encoded: bytes):
+        payload = vectors.tobytes() + encoded
+        header = _HEADER.pack(zlib.crc32(payload), op, self.seq + 1, vectors.shape[0], vectors.shape[1], len(encoded))
+        with open(self._file, 'ab') as f:
+            f.write(header + payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self.seq += 1
+        self.records += 1
+
+    @staticmethod
+    def _read_record(data: bytes, offset: int) -> typing.Optional[typing.Tuple[int, WalRecord]]:
+        if offset + _HEADER.size > len(data):
+            return None
+        crc, op, seq, rows, dim, encoded_bytes = _HEADER.unpack_from(data, offset)
+        begin = offset + _HEADER.size
+        end = begin + rows * dim * 4 + encoded_bytes
+        if end > len(data) or zlib.crc32(data[begin:end]) != crc:
+            return None
+        vectors = np.frombuffer(data, dtype=np.float32, count=rows * dim, offset=begin).reshape(rows, dim)
+        decoded = json.loads(data[begin + rows * dim * 4: end])
+        if op == DELETE:
+            return end, WalRecord(seq, op, vectors, [], decoded)
+        return end, WalRecord(seq, op, vectors, [Document(**d) for d in decoded], [])
+
+
+def staging_dir(path: Path) -> Path:
+    """An empty directory to write the next checkpoint of the store at `path` to, see `commit`."""
+    staging = path / STAGING_DIR_NAME
+    # left behind by a checkpoint that crashed before it was committed
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    return staging
+
+
+def commit(path: Path):
+    """Commits the staged checkpoint and moves its files in place of the previous ones.
+
+    Renaming the staging directory is the commit point: a crash before it leaves the previous checkpoint and the full
+    log, a crash after it leaves a committed checkpoint that `recover` finishes moving in place.
+    """
+    staging = path / STAGING_DIR_NAME
+    for file in staging.iterdir():
+        _fsync(file)
+    _fsync(staging)
+    os.replace(staging, path / COMMITTED_DIR_NAME)
+    _fsync(path)
+    recover(path)
+
+
+def recover(path: Path):
+    """Finishes a committed checkpoint and drops an uncommitted one, before anything reads the store at `path`."""
+    shutil.rmtree(path / STAGING_DIR_NAME, ignore_errors=True)
+    committed = path / COMMITTED_DIR_NAME
+    if not committed.exists():
+        return
+    for file in committed.iterdir():
+        # replaced files stay readable through the mappings of searches that still hold them
+        os.replace(file, path / file.name)
+    _fsync(path)
+    committed.rmdir()
+
+
+def _fsync(path: Path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -1,5 +1,6 @@
 import typing
 
+import msgpack
 import requests
 from chatbot_cloud_util.base_validator import BaseCorpusContainer
 from chatbot_cloud_util.factory import llm, open_ai_key
@@ -11,6 +12,8 @@ from vector_store_faissdb import CorpusContainer
 
 class RemoteCorpusContainerProxy(BaseCorpusContainer):
     __default_requests_timeout_sec = 300
+    # search results are large, msgpack and compression keep transfer and parsing cheap
+    __accept_headers = {'Accept': 'application/x-msgpack, application/json;q=0.9', 'Accept-Encoding': 'gzip'}
 
     def __init__(self,
                  *args,
@@ -31,10 +34,28 @@ class RemoteCorpusContainerProxy(BaseCorpusContainer):
     def _get_json(self, rel_url, **kwargs):
         res = self._session.get(
             f'{self._remote_url}{rel_url}',
+            headers=self.__accept_headers,
             timeout=self._requests_timeout_sec or self.__default_requests_timeout_sec,
             **kwargs
         )
         res.raise_for_status()
+        return self._decode(res)
+
+    def _post_json(self, rel_url, payload, **kwargs):
+        res = self._session.post(
+            f'{self._remote_url}{rel_url}',
+            json=payload,
+            headers=self.__accept_headers,
+            timeout=self._requests_timeout_sec or self.__default_requests_timeout_sec,
+            **kwargs
+        )
+        res.raise_for_status()
+        return self._decode(res)
+
+    @staticmethod
+    def _decode(res: requests.Response):
+        if res.headers.get('Content-Type', '').startswith('application/x-msgpack'):
+            return msgpack.unpackb(res.content, raw=False)
         return res.json()
 
     def size_of_corpus(self):
@@ -47,6 +68,13 @@ class RemoteCorpusContainerProxy(BaseCorpusContainer):
         p.setdefault('maximum_nearest_neighbors', maximum_nearest_neighbors)
         return self._get_json('/similarity_search', params=p, **kwargs)
 
+    def search_batch(self, queries: typing.List[str], maximum_nearest_neighbors: int = 20, *args,
+                     payload: dict = None, **kwargs):
+        p = payload or {}
+        p.setdefault('queries', list(queries))
+        p.setdefault('maximum_nearest_neighbors', maximum_nearest_neighbors)
+        return self._post_json('/similarity_search/batch', p, **kwargs)
+
 
 class CompatibleRemoteCorpusContainerProxy(RemoteCorpusContainerProxy, VectorStore):
     def add_texts(self, *args, **kwargs):
@@ -73,6 +101,13 @@ class CompatibleRemoteCorpusContainerProxy(RemoteCorpusContainerProxy, VectorSto
         res = super().search(*args, **kwargs)
         return [(Document(page_content=c['content'], metadata=c['metadata']), c['score']) for c in res]
 
+    def search_batch(self, *args, **kwargs):
+        res = super().search_batch(*args, **kwargs)
+        return [
+            [(Document(page_content=c['content'], metadata=c['metadata']), c['score']) for c in context]
+            for context in res
+        ]
+
 
 class CompatibleLocalCorpusContainerProxy(CorpusContainer, VectorStore):
     def add_texts(self, *args, **kwargs):
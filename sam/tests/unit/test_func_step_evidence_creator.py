@@ -70,6 +70,18 @@ def search_data():
             '10': 'https://doi.org/10.5194/hess-15-1291-2011',
             '11': 'https://doi.org/10.3390/rs2041057',
         },
+        'publication_year': {
+            '1': 2012,
+            '2': 2007,
+            '3': 2006,
+            '4': 2018,
+            '6': 2008,
+            '7': 2013,
+            '8': 2009,
+            '9': 2003,
+            '10': 1987,
+            '11': 2015,
+        },
     }
 
 